@@ -0,0 +1,209 @@
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Seconds during which a cached response is used without revalidating it by default, so that re-running a crawl
+# that stopped halfway costs almost nothing
+MAX_AGE = 3600
+
+# A single cached response, see ResponseCache.get
+CacheEntry = collections.namedtuple("CacheEntry", ["url", "body", "etag", "last_modified", "fetched"])
+
+
+class ResponseCache:
+    """An on-disk cache of the pages fetched from the call for papers site.
+
+    Responses are keyed by url and stored as files in a directory, alongside a small sqlite index holding their ETag
+    and Last-Modified headers so that a Fetcher can revalidate them with conditional requests.  The cache is bounded
+    by max_bytes, the least recently used responses are evicted first.  In offline mode a Fetcher answers every request
+    from the cache and never touches the network.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        the directory the cache is stored in
+
+    max_bytes : int
+        the maximum total size of the cached bodies, in bytes
+
+    max_age : float
+        seconds during which a cached response is used without revalidating it
+
+    offline : bool
+        if True, requests are only answered from the cache
+
+    size : int
+        the current total size of the cached bodies, in bytes
+
+    Methods
+    -------
+    get : CacheEntry
+        the cached response for a url, or None
+
+    put : None
+        stores a response
+
+    revalidated : None
+        records that the cached response for a url was confirmed to be current
+
+    is_fresh : bool
+        whether a cached response can be used without revalidating it
+
+    clear : None
+        removes every cached response
+    """
+
+    def __init__(self, path, max_bytes=256 * 2 ** 20, max_age=MAX_AGE, offline=False):
+        """
+        Parameters
+        ----------
+        path : str
+            the directory the cache is stored in, created if it does not exist
+
+        max_bytes : int
+            the maximum total size of the cached bodies, in bytes
+
+        max_age : float
+            seconds during which a cached response is used without revalidating it, an hour by default; 0 always
+            revalidates, e.g. for a refresh that must see listing pages as they are now
+
+        offline : bool
+            if True, requests are only answered from the cache
+        """
+
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+
+        os.makedirs(os.path.join(self.path, "bodies"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, key TEXT, etag TEXT, "
+                             "last_modified TEXT, size INTEGER, fetched REAL, used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+
+        self.size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __contains__(self, url):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM responses WHERE url = ?", (url,)).fetchone() is not None
+
+    def _file(self, key):
+        return os.path.join(self.path, "bodies", key)
+
+    def get(self, url):
+        """Returns the cached response for url as a CacheEntry, or None if there is none."""
+
+        with self._lock:
+            row = self._db.execute("SELECT key, etag, last_modified, fetched, size FROM responses WHERE url = ?",
+                                   (url,)).fetchone()
+            if row is None:
+                return None
+
+            key, etag, last_modified, fetched, size = row
+            try:
+                with open(self._file(key), encoding="utf-8") as fh:
+                    body = fh.read()
+            except FileNotFoundError:
+                # The body went missing, e.g. removed by hand, so the entry is dropped
+                self._delete(url, key)
+                self._db.commit()
+                self.size -= size
+                return None
+
+            with self._db:
+                self._db.execute("UPDATE responses SET used = ? WHERE url = ?", (time.time(), url))
+
+        return CacheEntry(url, body, etag, last_modified, fetched)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Stores body as the response for url, evicting the least recently used responses if necessary.
+
+        Parameters
+        ----------
+        url : str
+            the url that was fetched
+
+        body : str
+            the text of the response
+
+        etag : str, optional
+            the response's ETag header
+
+        last_modified : str, optional
+            the response's Last-Modified header
+        """
+
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        data = body.encode("utf-8")
+
+        with self._lock:
+            # Writing to a temporary file first means a crash never leaves a truncated body behind
+            tmp = self._file(key) + ".tmp." + str(threading.get_ident())
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, self._file(key))
+
+            old = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            now = time.time()
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (url, key, etag, last_modified, len(data), now, now))
+            self.size += len(data) - (old[0] if old else 0)
+
+            self._evict()
+
+    def revalidated(self, url):
+        """Records that the cached response for url was confirmed to be current by the site."""
+
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET fetched = ?, used = ? WHERE url = ?", (now, now, url))
+
+    def is_fresh(self, entry):
+        """Returns whether entry can be used without revalidating it."""
+
+        return self.offline or time.time() - entry.fetched < self.max_age
+
+    def clear(self):
+        """Removes every cached response."""
+
+        with self._lock:
+            for url, key in self._db.execute("SELECT url, key FROM responses").fetchall():
+                self._delete(url, key)
+            self._db.commit()
+            self.size = 0
+
+    def _delete(self, url, key):
+        """Removes a response from the index and its body from disk, the caller holds the lock and commits."""
+
+        self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Removes the least recently used responses until the cache fits in max_bytes, the caller holds the lock."""
+
+        if self.size <= self.max_bytes:
+            return
+
+        for url, key, size in self._db.execute("SELECT url, key, size FROM responses ORDER BY used").fetchall():
+            self._delete(url, key)
+            self.size -= size
+            if self.size <= self.max_bytes:
+                break
+        self._db.commit()
@@ -1,42 +1,97 @@
+import collections
 import datetime
-from time import sleep
+import functools
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import lxml.etree
+import numpy as np
+
+from . import Parse, Render, Stats
+from .Fetch import Fetcher, shared_fetcher
+from .Index import HashedIndex, LsaIndex, NeighborIndex, QueryCache, TfidfIndex
+from .Text import Normalizer, STOPWORDS, NLTK_STOPWORDS, CUSTOM_STOPWORDS
+
+# Pages are parsed with lxml, see Parse; BeautifulSoup, requests, IPython and scikit-learn are only imported by the
+# methods that need them, so that loading a saved instance and querying it stays fast; nltk data is checked for when
+# first needed, see Text.ensure_resources
+
+# Root of the call for papers site, links found in listings are relative to it
+SITE_URL = "https://call-for-papers.sas.upenn.edu"
+
+# Listing of every call on the site, missing only the page number
+LISTING_URL = SITE_URL + "/category/all&page="
+
+# Version of the directory layout written by CallInstance.save, increased whenever the layout changes
+SNAPSHOT_VERSION = 1
+
+# File of a snapshot directory naming the version directory that holds the current snapshot, see CallInstance.save
+CURRENT_SNAPSHOT = "CURRENT"
+
+# Files of a snapshot, written at the top of the snapshot directory before it held version directories
+SNAPSHOT_FILES = frozenset(["manifest.json", "calls.jsonl", "vocabulary.json", "idf.npy", "indices.npy", "indptr.npy",
+                            "counts.npy", "tfidf.npy", "hashed.json", "document_frequency.npy", "lsa.json",
+                            "components.npy", "embeddings.npy", "neighbors.json", "neighbor_ids.npy",
+                            "neighbor_scores.npy"])
 
-import sklearn.feature_extraction.text as sci_text
-from scipy.spatial.distance import cdist
-from IPython.display import Markdown
+# Used in the Call.parse_due_date function to associate a month name with the corresponding integer
+MONTH_DICT = dict(January=1, February=2, March=3, April=4, May=5, June=6, July=7, August=8, September=9, October=10,
+                  November=11, December=12)
 
-from bs4 import BeautifulSoup
-import requests
-import lxml.html
+# Dates recognized by parse_date: "Month DD, YYYY" (the site's form, after the weekday), "DD Month YYYY" and
+# "YYYY-MM-DD"; months may be abbreviated and days may carry an ordinal suffix
+MONTH_FIRST = re.compile(r"\b([A-Za-z]{3,})\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})\b")
+DAY_FIRST = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]{3,})\.?,?\s+(\d{4})\b")
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
 
-import nltk
 
-nltk.download("wordnet")
+def _month(name):
+    """Returns the number of the month name or abbreviation name, or None if it is not one."""
 
-# Used in the Call.parse_due_date function to associate a month name with the corresponding integer
-MONTH_DICT = dict(January=1, February=2, March=3, April=4, May=5, June=6, July=7, August=8, September=9, October=10,
-                  November=11, December=12)
+    name = name.capitalize()
+    for month, number in MONTH_DICT.items():
+        if month.startswith(name):
+            return number
+    return None
+
+
+def parse_date(text):
+    """Returns the first date found in text as a datetime.date, or None if there is none.
 
-# Setting custom stopwords for nltk processes
-NLTK_STOPWORDS = ["i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself",
-                  "yourselves", "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself",
-                  "they", "them", "their", "theirs", "themselves", "what", "which", "who", "whom", "this", "that",
-                  "these", "those", "am", "is", "are", "was", "were", "be", "been", "being", "have", "has", "had",
-                  "having", "do", "does", "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because", "as",
-                  "until", "while", "of", "at", "by", "for", "with", "about", "against", "between", "into", "through",
-                  "during", "before", "after", "above", "below", "to", "from", "up", "down", "in", "out", "on", "off",
-                  "over", "under", "again", "further", "then", "once", "here", "there", "when", "where", "why", "how",
-                  "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not",
-                  "only", "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should",
-                  "now"]
+    Unlike a fixed split of the site's "Weekday, Month DD, YYYY" form, slight changes to the format (a missing weekday,
+    an abbreviated month, extra whitespace, an ISO date) still give a date, and text that holds no valid date gives
+    None rather than raising.
 
-# Determined somewhat un-scientifically
-CUSTOM_STOPWORDS = ["journal", "publish", "deadline", "open", "access", "submission", "scope", "article", "papers",
-                    "please", "abstract", "submit", "word", "literature", "new", "ha", "study", "panel", "question",
-                    "work", "include", "also", "proposal", "submitted", "topic", "welcome", "limited", "various",
-                    "theme", "send", "address", "author", "conference"]
+    Parameters
+    ----------
+    text : str
+        the text to look for a date in, may be None
+    """
+
+    if not text:
+        return None
+
+    for pattern, order in ((MONTH_FIRST, (3, 1, 2)), (DAY_FIRST, (3, 2, 1)), (ISO_DATE, (1, 2, 3))):
+        for match in pattern.finditer(text):
+            year, month, day = (match.group(group) for group in order)
+            month = int(month) if month.isdigit() else _month(month)
+            if month is None:
+                continue
 
-STOPWORDS = NLTK_STOPWORDS + CUSTOM_STOPWORDS
+            try:
+                return datetime.date(int(year), month, int(day))
+            except ValueError:
+                continue
+
+    return None
 
 
 class Call:
@@ -45,12 +100,20 @@ class Call:
     Holds parsed attributes of a call and provides methods for their access and manipulation.  Intended mostly for use
     within the CallInstance class.
 
+    Calls are kept compact, since an instance may hold thousands of them: attributes live in __slots__, the parse tree
+    of the listing is not kept (only its html, and only if asked for), category names are interned, and when the
+    description is the beginning of long_desc it is stored as a length rather than a second copy of the text.
+
     ...
 
     Attributes
     ----------
     article : BeautifulSoup
-        a BeautifulSoup object containing the call's search page
+        a BeautifulSoup object containing the call's search page, re-parsed from html on access; None unless the call
+        was made with keep_html
+
+    html : str
+        the html of the call's search page, None unless the call was made with keep_html
 
     source : str
         the source of the call, often a conference or journal
@@ -67,6 +130,9 @@ class Call:
     deadline : str
         a string of the form "Weekday, Month DD, YYYY"
 
+    due_date : datetime.date or None
+        the deadline, parsed once when the call is made; None if deadline holds no recognizable date
+
     description : str
         the description provided for the call
 
@@ -87,73 +153,200 @@ class Call:
     parse_due_date : datetime.date
         returns a representation of the string attribute deadline as a datetime.date object
 
+    is_overdue : bool
+        whether the deadline has passed
+
     compute_idf : sparse matrix
         returns a tfidf array relative to the passed transformer
 
     get_long_desc_keywords : list of str
         keywords from the call's long description, sets the long_desc_keywords
+
+    parse_page : None
+        sets the attributes found on the call's individual page from its html
+
+    to_record : dict
+        the call's parsed attributes as a json-serializable dict
+
+    from_record : Call
+        rebuilds a call from the output of to_record
     """
 
-    def __init__(self, article):
+    __slots__ = ("html", "source", "source_link", "updated", "contact", "deadline", "due_date", "_description",
+                 "long_desc", "categories", "contact_email", "long_desc_keywords")
+
+    # Attributes kept by to_record, article and html are left out
+    RECORD_FIELDS = ("source", "source_link", "updated", "contact", "deadline", "description", "long_desc",
+                     "categories", "contact_email", "long_desc_keywords")
+
+    def __init__(self, article, base_url=SITE_URL, fetch=True, keep_html=False, fetcher=None):
         """
         Parameters
         ----------
-        article : BeautifulSoup
-            article element containing details on the call
+        article : lxml.html.HtmlElement or BeautifulSoup
+            article element containing details on the call, as returned by Parse.listing_articles
+
+        base_url : str
+            url of the page the article was found on, used to resolve the link to the call's individual page
+
+        fetch : bool
+            if False, the call's individual page is not requested and long_desc, categories and contact_email stay None
+            until parse_page is called
+
+        keep_html : bool
+            if True, the html of article is kept in the html attribute
+
+        fetcher : Fetcher, optional
+            used to request the call's individual page if fetch is True, see Fetch.shared_fetcher if not provided
+
+        Raises
+        ------
+        Fetch.FetchError
+            If fetch is True and the call's individual page could not be fetched
         """
 
         # To be set later when a CallInstance Object is initialized
         self.long_desc_keywords = None
 
-        # Using BeautifulSoup to retrieve each aspect of the call
-        self.article = article
-        self.source = article.header.h2.a.get_text()
-        self.source_link = "https://call-for-papers.sas.upenn.edu" + article.header.h2.a.get('href')
-        self.updated = article.find(class_='field-name-field-cfp-updated'). \
-            find(class_='field-items').div.span.get_text()
-        self.contact = article.find(class_='field-name-field-cfp-contact-name'). \
-            find(class_='field-items').div.get_text()
-        self.deadline = article.find(class_='field-name-field-cfp-due-date'). \
-            find(class_='field-items').div.span.get_text()
-        self.description = article.find(class_='field-name-field-cfp-content'). \
-            find(class_='field-items').div.get_text()
-
-        # Using BeautifulSoup to access the call's individual page
-        html = requests.get(self.source_link)
-        soup = BeautifulSoup(html.text, 'lxml')
-
-        # Getting additional attributes from the call's individual page
-        self.long_desc = soup.find(class_="field-name-field-cfp-content").get_text()
-        self.categories = [div.get_text() for div in soup.find(class_="field-name-field-cfp-categories")
-            .div.find_all('div')]
-        self.contact_email = soup.find(class_="field-type-email").a.get('href')
+        if isinstance(article, lxml.etree.ElementBase):
+            # Only the elements holding each field are visited, see Parse.listing_fields
+            fields = Parse.listing_fields(article)
+            self.html = Parse.to_html(article) if keep_html else None
+            self.source = fields["source"]
+            self.source_link = urljoin(base_url, fields["href"])
+            self.updated = fields["updated"]
+            self.contact = fields["contact"]
+            self.deadline = fields["deadline"]
+            self._description = fields["description"]
+        else:
+            # Using BeautifulSoup to retrieve each aspect of the call, the article itself is not kept
+            self.html = str(article) if keep_html else None
+            self.source = article.header.h2.a.get_text()
+            self.source_link = urljoin(base_url, article.header.h2.a.get('href'))
+            self.updated = article.find(class_='field-name-field-cfp-updated'). \
+                find(class_='field-items').div.span.get_text()
+            self.contact = article.find(class_='field-name-field-cfp-contact-name'). \
+                find(class_='field-items').div.get_text()
+            self.deadline = article.find(class_='field-name-field-cfp-due-date'). \
+                find(class_='field-items').div.span.get_text()
+            self._description = article.find(class_='field-name-field-cfp-content'). \
+                find(class_='field-items').div.get_text()
+        self.due_date = self.parse_due_date()
+
+        # Set by parse_page from the call's individual page
+        self.long_desc = None
+        self.categories = None
+        self.contact_email = None
+
+        if fetch:
+            self.parse_page((fetcher or shared_fetcher()).get(self.source_link))
+
+    @property
+    def article(self):
+        if self.html is None:
+            return None
+
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(self.html, 'lxml').article
+
+    @property
+    def description(self):
+        # An int is the length of the prefix of long_desc the description is made of
+        if isinstance(self._description, int):
+            return self.long_desc[:self._description]
+        return self._description
+
+    @description.setter
+    def description(self, description):
+        self._description = description
+        self._share_description()
+
+    def _share_description(self):
+        """Stores the description as a length if it is the beginning of long_desc, rather than a copy of the text."""
+
+        description = self._description
+        if isinstance(description, str) and self.long_desc and self.long_desc.startswith(description):
+            self._description = len(description)
+
+    def parse_page(self, html):
+        """Sets the attributes found on the call's individual page.
+
+        Parameters
+        ----------
+        html : str
+            the html of the page found at source_link
+        """
+
+        fields = Parse.detail_fields(html)
+
+        self.long_desc = fields["long_desc"]
+        self.categories = [sys.intern(category) for category in fields["categories"]]
+        self.contact_email = fields["contact_email"]
+
+        self._share_description()
+
+    def to_record(self):
+        """Returns the call's parsed attributes as a json-serializable dict."""
+
+        return {field: getattr(self, field) for field in self.RECORD_FIELDS}
+
+    @classmethod
+    def from_record(cls, record):
+        """Returns a Call rebuilt from the output of to_record, without making any requests.
+
+        The html and article attributes of the rebuilt call are None.
+        """
+
+        call = cls.__new__(cls)
+        call.html = None
+        for field in cls.RECORD_FIELDS:
+            if field != "description":
+                setattr(call, field, record.get(field))
+        if call.categories is not None:
+            call.categories = [sys.intern(category) for category in call.categories]
+
+        call.description = record.get("description")
+        call.due_date = call.parse_due_date()
+
+        return call
 
     def parse_due_date(self):
         """Returns a representation of the string attribute deadline as a datetime.date object.
 
-        To understand this function, recall that self.deadline has the form:
+        Recall that self.deadline usually has the form:
             "Weekday, Month DD, YYYY"
+        Other forms are handled by parse_date, and None is returned if deadline holds no recognizable date.
         """
 
-        split_deadline = self.deadline.split(',')
-        month_day = split_deadline[1].split(' ')
+        return parse_date(self.deadline)
+
+    def is_overdue(self, today=None):
+        """Returns whether the deadline is before today, a call whose deadline is unknown is never overdue.
 
-        month = MONTH_DICT[month_day[1]]
-        day = int(month_day[2])
-        year = int(split_deadline[2][1:])
+        Parameters
+        ----------
+        today : datetime.date, optional
+            the date to compare the deadline with, the current date if not provided
+        """
 
-        return datetime.date(year, month, day)
+        return self.due_date is not None and self.due_date < (today or datetime.date.today())
 
-    def get_long_desc_keywords(self, tokenizer, lemmatizer):
+    def get_long_desc_keywords(self, tokenizer=None, lemmatizer=None, normalizer=None):
         """Returns a list of keywords in the description, parsed using the nltk library.
 
         Parameters
         ----------
-        tokenizer : nltk tokenizer
-            must have a tokenize() method, used to split the title string
+        tokenizer : nltk tokenizer, optional
+            must have a tokenize() method, used to split the description; the default of Text.Normalizer if not provided
+
+        lemmatizer : nltk lemmatizer, optional
+            must have a lemmatize() method, used to reduce the strings to stems; the default of Text.Normalizer if not
+            provided
 
-        lemmatizer : nltk lemmatizer
-            must have a lemmatizer() method, used to reduce the strings to stems
+        normalizer : Normalizer, optional
+            used to tokenize and lemmatize the description instead of tokenizer and lemmatizer, see Text.Normalizer;
+            sharing one between calls is much faster than making one per call
 
         Returns
         -------
@@ -161,14 +354,10 @@ class Call:
             a list of lemmatized, tokenized strings filtered through STOPWORDS
         """
 
-        words = []
-        for word in tokenizer.tokenize(self.long_desc):
-            stem = lemmatizer.lemmatize(word.lower())
-            if stem not in words and stem not in STOPWORDS and stem.isalpha():
-                words.append(stem)
+        normalizer = normalizer or Normalizer(tokenizer=tokenizer, lemmatizer=lemmatizer)
 
-        self.long_desc_keywords = words
-        return words
+        self.long_desc_keywords = normalizer.keywords(self.long_desc)
+        return self.long_desc_keywords
 
 
 class CallRec:
@@ -209,6 +398,13 @@ class CallRec:
         self.criteria = criteria
         self.rec_info = rec_info
 
+    def show(self, show_full_desc=True, truncate=None):
+        """Returns a markdown representation of the recommendation, see RecList.show."""
+
+        from IPython.display import Markdown
+
+        return Markdown(Render.render([self], "markdown", show_full_desc, truncate))
+
 
 class RecList:
     """A list of call recommendations stored as CallRec Objects.
@@ -216,39 +412,405 @@ class RecList:
     Mainly intended as a wrapper class for the show method, which gives a markdown representation of the list for use
     with IPython's display functionality.
 
+    A RecList returned by a recommender is ranked lazily: only the top_k most relevant calls are selected up front,
+    and a CallRec is only built once its position in the ranking is asked for, through recs or page.
+
     Attributes
     ----------
     recs : list of CallRec
-        the list of recommendations
+        the list of recommendations, limited to the top_k most relevant if top_k is set
+
+    top_k : int or None
+        the number of recommendations in recs, all of them if None
+
+    total : int
+        the number of recommendations in the full ranking, which may be paged through beyond top_k
 
     Methods
     -------
     show : IPython.Markdown
-        returns a markdown representation of the recommendation list
+        returns a markdown representation of the recommendation list, or an html one or plain records
+
+    render : str
+        the representation show displays, as a str
+
+    page : list of CallRec
+        returns the recommendations at a range of positions in the full ranking
     """
 
     def __init__(self, recs):
-        self.recs = sorted(recs, key=lambda rec: rec.relevancy, reverse=True)
+        self.top_k = None
+        self._recs = sorted(recs, key=lambda rec: rec.relevancy, reverse=True)
+        self.total = len(self._recs)
+
+        # Output of render, by parameters
+        self._rendered = {}
+
+        # Set by ranked for lazily built lists
+        self._ids = None
+
+    @classmethod
+    def ranked(cls, ids, relevancies, make_rec, top_k=None):
+        """Returns a RecList that ranks ids by relevancy and builds their CallRec objects on demand.
 
-    def show(self, show_only_open=True, show_full_desc=True):
-        """Returns a markdown representation of the recommendation list."""
+        Parameters
+        ----------
+        ids : numpy.ndarray of int
+            the indices of the recommended calls, in the order of CallInstance.calls
+
+        relevancies : numpy.ndarray of float
+            the relevancy of each of ids
+
+        make_rec : callable
+            called with an index and its relevancy to build its CallRec
+
+        top_k : int, optional
+            the number of recommendations in recs, all of them if not provided
+        """
+
+        rec_list = cls([])
+        rec_list.top_k = top_k
+        rec_list.total = len(ids)
+        rec_list._recs = None
+        rec_list._ids = ids
+        rec_list._relevancies = relevancies
+        rec_list._make_rec = make_rec
+        rec_list._order = np.empty(0, dtype=np.intp)
+        rec_list._built = {}
+
+        return rec_list
+
+    @property
+    def recs(self):
+        if self._recs is None:
+            self._recs = self.page(0, self.total if self.top_k is None else self.top_k)
+        return self._recs
+
+    @recs.setter
+    def recs(self, recs):
+        self._recs = recs
+        self._rendered = {}
+
+    def page(self, start, stop):
+        """Returns the recommendations at positions start to stop (exclusive) of the full ranking."""
+
+        if self._ids is None:
+            return self._recs[start:stop]
+
+        stop = min(stop, self.total)
+        order = self._ranking(stop)
+        return [self._rec(position) for position in order[start:stop]]
+
+    def _ranking(self, n):
+        """Returns the positions in ids of at least the n most relevant recommendations, most relevant first.
+
+        Ties are broken by the order of ids, as a stable sort of the whole list would; only the top n are selected and
+        sorted unless the whole ranking is needed.
+        """
 
-        if show_only_open:
-            recs = [rec for rec in self.recs if rec.call.parse_due_date() > datetime.date.today()]
+        if len(self._order) >= n:
+            return self._order
+
+        relevancies = self._relevancies
+        if n < self.total:
+            # The n-th highest relevancy, everything above it is kept along with the first ties at it
+            kth = -np.partition(-relevancies, n - 1)[n - 1]
+            above = np.flatnonzero(relevancies > kth)
+            tied = np.flatnonzero(relevancies == kth)[:n - len(above)]
+            chosen = np.sort(np.concatenate([above, tied]))
+            self._order = chosen[np.argsort(-relevancies[chosen], kind='stable')]
         else:
-            recs = self.recs
+            self._order = np.argsort(-relevancies, kind='stable')
 
-        markdown = ""
-        for rec in recs:
-            item = rec.call
-            markdown += "### " + item.source + "\n" \
-                        + "relevancy: " + str(float(rec.relevancy))[:4] \
-                        + " | deadline: " + item.deadline + " | updated: " + item.updated \
-                        + "\n\n" + item.description + "\n\n" \
-                        + "\n\n" + "[contact email](" + item.contact_email + ") | " \
-                        + "[call page](" + item.source_link + ")" + "\n\n"
+        return self._order
 
-        return Markdown(markdown)
+    def _rec(self, position):
+        """Returns the CallRec for position in ids, building it if necessary."""
+
+        if position not in self._built:
+            self._built[position] = self._make_rec(self._ids[position], self._relevancies[position])
+        return self._built[position]
+
+    def show(self, show_only_open=True, show_full_desc=True, limit=None, offset=0, truncate=None, fmt="markdown"):
+        """Returns a representation of the recommendation list for use with IPython's display, markdown by default.
+
+        Each call is rendered once and cached (see Render.FragmentCache), and the output for a set of parameters is
+        kept, so showing a list again costs nothing.  Only the recommendations shown are built.
+
+        ...
+
+        Parameters
+        ----------
+        show_only_open : bool
+            if True, overdue calls are left out, see Call.is_overdue
+
+        show_full_desc : bool
+            if False, descriptions are left out
+
+        limit : int, optional
+            the maximum number of recommendations shown, all of them if not provided
+
+        offset : int
+            the number of recommendations skipped before the first one shown, for showing a list page by page
+
+        truncate : int, optional
+            the maximum number of characters of each description shown, all of them if not provided
+
+        fmt : str
+            "markdown", "html" or "records", see Render.render
+
+        Returns
+        -------
+        rendered : IPython.display.Markdown, IPython.display.HTML or list of dict
+            the recommendations, as a list of plain records if fmt is "records"
+        """
+
+        rendered = self.render(show_only_open, show_full_desc, limit, offset, truncate, fmt)
+        if fmt == "records":
+            return rendered
+
+        from IPython.display import HTML, Markdown
+
+        return Markdown(rendered) if fmt == "markdown" else HTML(rendered)
+
+    def render(self, show_only_open=True, show_full_desc=True, limit=None, offset=0, truncate=None, fmt="markdown"):
+        """Returns the recommendation list rendered to a str, or to a list of dicts if fmt is "records", see show."""
+
+        today = datetime.date.today()
+        key = (show_only_open and today, show_full_desc, limit, offset, truncate, fmt)
+        if key in self._rendered:
+            return self._rendered[key]
+
+        rendered = Render.render(self._shown(show_only_open, today, limit, offset), fmt, show_full_desc, truncate)
+
+        # Records are mutable, so only text is kept
+        if fmt != "records":
+            self._rendered[key] = rendered
+
+        return rendered
+
+    def _shown(self, show_only_open, today, limit, offset):
+        """Returns the recommendations in recs that show displays, building only as many as needed."""
+
+        count = len(self._recs) if self._recs is not None else \
+            self.total if self.top_k is None else min(self.top_k, self.total)
+
+        shown = []
+        skipped = 0
+        for start in range(0, count, 256):
+            stop = min(start + 256, count)
+            block = self._recs[start:stop] if self._recs is not None else self.page(start, stop)
+            for rec in block:
+                if show_only_open and rec.call.is_overdue(today):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+
+                shown.append(rec)
+                if limit is not None and len(shown) >= limit:
+                    return shown
+
+        return shown
+
+
+def iter_calls(scope="default", n=0, fetcher=None, base_url=None, stats=None):
+    """Yields the calls on the site one by one, as soon as each call's individual page has been parsed.
+
+    Calls are yielded in the order they are listed on the site, which is the order of CallInstance.calls.  Nothing is
+    kept once a call has been yielded, so the calls can be stored elsewhere as they arrive, and stopping early (e.g.
+    with itertools.islice or a break) cancels the requests for the pages that are no longer needed.  Pass the calls
+    to CallInstance.from_calls to build an instance from them.
+
+    A call whose individual page cannot be fetched or parsed is skipped and recorded in fetcher.stats.failed, while a
+    listing page that cannot be fetched ends the crawl with a Fetch.FetchError, since the calls it lists are unknown.
+
+    ...
+
+    Parameters
+    ----------
+    scope : str
+        see CallInstance
+
+    n : int
+        see CallInstance
+
+    fetcher : Fetcher, optional
+        used to request the site's pages, see CallInstance; a Fetcher with the default politeness policy, counting its
+        requests in stats, is created (and closed once the generator is finished) if none is provided
+
+    base_url : str, optional
+        the listing url of the site, missing only the page number; LISTING_URL if not provided
+
+    stats : Stats.Instrumentation, optional
+        where the time spent fetching and parsing listing pages, waiting on individual pages and parsing them is
+        recorded, along with counts of calls listed, parsed and failed; nothing is recorded if not provided
+
+    Returns
+    -------
+    calls : generator of Call
+        the calls within scope, with their individual pages parsed
+
+    Raises
+    ------
+    RuntimeError
+        If scope expects n and none is provided
+    """
+
+    # Ensures scope and helper parameters are passed appropriately
+    if scope in ['pages', 'calls', 'overdue'] and not n:
+        raise RuntimeError("Scope expects n to be passed to constructor but none was found.")
+
+    return _scrape(scope, n, fetcher, base_url or LISTING_URL, stats or Stats.disabled)
+
+
+def _listing(fetcher, base_url, page, stats=Stats.disabled):
+    """Returns the calls found on listing page number page, without their individual pages.
+
+    Articles missing one of the fields of a call are skipped and recorded in fetcher.stats.failed, by the url of the
+    page followed by their position on it.
+    """
+
+    url = base_url + str(page)
+    with stats.stage("fetch.listing"):
+        html = fetcher.get(url)
+
+    calls = []
+    with stats.stage("parse.listing"):
+        for position, article in enumerate(Parse.listing_articles(html), 1):
+            try:
+                calls.append(Call(article, base_url=url, fetch=False))
+            except Parse.ParseError as error:
+                fetcher.stats.fail(url + "#" + str(position), str(error))
+                stats.count("calls.failed")
+    stats.count("calls.listed", len(calls))
+
+    return calls
+
+
+def _scrape(scope, n, fetcher, base_url, stats):
+    """Yields the Call objects within scope, in the order they are listed on the site, see iter_calls.
+
+    Listing pages are fetched by a thread of their own and parsed here, while each call's individual page is handed to
+    fetcher to be requested in the background.  Whether scope has been reached only depends on the listing pages, so
+    the next listing page can be fetched while the previous page's calls are still being fetched, and calls are
+    yielded as their pages arrive in the meantime.
+    """
+
+    if fetcher is None:
+        with Fetcher(stats=stats) as fetcher:
+            yield from _scrape(scope, n, fetcher, base_url, stats)
+        return
+
+    # Calls waiting on their individual page, paired with the Future that will provide it
+    pending = collections.deque()
+
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="papers-listing") as listings:
+            page = 0
+            calls = 0
+            overdue_ctr = 0
+            while True:
+                listing = listings.submit(_listing, fetcher, base_url, page, stats)
+
+                # Hands over the calls whose pages arrive while the listing page is being fetched
+                while pending and not listing.done():
+                    with stats.stage("scrape.wait"):
+                        futures.wait([listing, pending[0][1]], return_when=futures.FIRST_COMPLETED)
+                    yield from _arrived(pending, fetcher.stats, stats)
+
+                # For the 'default' scope, keeps track of whether a non-overdue call has been found on the current page
+                has_not_overdue = False
+                scope_reached = False
+
+                for call in listing.result():
+                    pending.append((call, fetcher.submit(call.source_link)))
+
+                    # Checks whether the call is overdue, updates appropriate variables
+                    if call.is_overdue():
+                        overdue_ctr += 1
+                    else:
+                        has_not_overdue = True
+
+                    # Call is finished, so increment calls
+                    calls += 1
+
+                    # Checks whether calls or date conditions have been reached
+                    if (scope == 'calls' and n == calls) or (scope == 'overdue' and overdue_ctr == n):
+                        scope_reached = True
+                        break
+
+                if scope_reached:
+                    break
+
+                # Page is finished, so increment page
+                page += 1
+
+                # Checks whether pages condition has been reached
+                if scope == 'pages' and n == page:
+                    break
+
+                # Checks whether default condition has been reached
+                if scope == 'default' and not has_not_overdue:
+                    break
+
+        while pending:
+            with stats.stage("scrape.wait"):
+                futures.wait([pending[0][1]])
+            yield from _arrived(pending, fetcher.stats, stats)
+    finally:
+        # Pages of calls that were never yielded are not needed anymore, e.g. if the caller stopped early
+        for call, future in pending:
+            future.cancel()
+
+
+def _arrived(pending, crawl_stats, stats):
+    """Parses and yields the calls at the head of pending whose individual pages have arrived, in order."""
+
+    while pending and pending[0][1].done():
+        call, future = pending.popleft()
+        if _parsed(call, future, crawl_stats, stats):
+            yield call
+
+
+def _parsed(call, future, crawl_stats, stats=Stats.disabled):
+    """Parses the individual page of call held by future, returns False and records it in crawl_stats if that failed."""
+
+    try:
+        with stats.stage("parse.detail"):
+            call.parse_page(future.result())
+    except RuntimeError as error:
+        # Raised by the Fetcher for a page that could not be fetched and by Parse for one without the expected markup
+        crawl_stats.fail(call.source_link, str(error))
+        stats.count("calls.failed")
+        return False
+
+    stats.count("calls.parsed")
+    return True
+
+
+def _query_stage(name):
+    """Decorates a recommender of CallInstance so that each call to it is timed as stage name of its stats."""
+
+    def decorate(recommend):
+        @functools.wraps(recommend)
+        def timed(self, *args, **kwargs):
+            with self.stats.stage(name):
+                return recommend(self, *args, **kwargs)
+
+        return timed
+
+    return decorate
+
+
+def _current_snapshot(path):
+    """Returns the version directory named by the CURRENT file of snapshot directory path, None if it has none."""
+
+    try:
+        with open(os.path.join(path, CURRENT_SNAPSHOT), encoding="utf-8") as fh:
+            return fh.read().strip()
+    except FileNotFoundError:
+        return None
 
 
 class CallInstance:
@@ -274,8 +836,46 @@ class CallInstance:
     transformer : nltk TfidfTransformer
         used to transform vectorized lists into tfidf arrays
 
+    normalizer : Normalizer
+        used to turn descriptions and queries into keywords, see Text.Normalizer
+
+    instance_tfidf : scipy.sparse.csr_matrix
+        L2-normalized tfidf rows of each call, in the order of calls; a numpy.ndarray if the instance is dense
+
+    crawl_stats : Fetch.CrawlStats or None
+        requests, retries, bytes and failed urls of the fetcher that last scraped or refreshed the instance, None if
+        it was built from calls or a snapshot
+
+    query_cache : Index.QueryCache
+        the scores of recent queries, see relevance; its hits and misses tell how well it is sized
+
+    neighbors : Index.NeighborIndex or None
+        the most similar calls to each call, see similar_calls; None until computed
+
+    stats : Stats.Instrumentation
+        timers and counters of each stage of scraping, fitting and querying the instance, disabled unless one was
+        provided or it is enabled
+
     Methods
     -------
+    from_calls : CallInstance
+        builds an instance from any iterable of calls, such as the output of iter_calls
+
+    refresh : list of Call
+        adds calls that are new or were updated since the instance was scraped, without re-scraping the rest
+
+    save : None
+        writes a snapshot of the instance to a directory
+
+    load : CallInstance
+        reads a snapshot written by save, without scraping the site
+
+    calls_due : list of Call
+        the calls due within a range of dates, found in a sorted deadline index
+
+    category_counts : dict of str to int
+        the number of calls in each category, among every call or the recommendations of a RecList
+
     keyword_recommend : list of CallRec
         recommends papers based on a list of keywords, see README for algorithm and implementation details
 
@@ -284,12 +884,31 @@ class CallInstance:
 
     abstract_recommend : list of CallRec
         recommends papers based on an abstract, see README for algorithm and implementation details
+
+    batch_recommend : list of RecList
+        recommends papers for many keyword lists, titles or abstracts at once
+
+    similar_calls : list of CallRec
+        recommends the calls most similar to one of the instance's calls
+
+    duplicate_calls : list of tuple
+        the pairs of calls so similar that one is likely a repost of the other
     """
 
+    # Recommenders available to batch_recommend
+    REC_TYPES = ("keyword", "title", "abstract")
+
     # URL for call-for-papers, same for all instances
-    BASE_URL = "https://call-for-papers.sas.upenn.edu/category/all&page="
+    BASE_URL = LISTING_URL
+
+    # Number of query results kept by query_cache, each one up to a float for every call
+    QUERY_CACHE_SIZE = 128
 
-    def __init__(self, scope="default", n=0):
+    # Number of neighbors computed for each call when similar_calls is first used, if n_neighbors was not provided
+    N_NEIGHBORS = 20
+
+    def __init__(self, scope="default", n=0, fetcher=None, base_url=None, dense=False, normalizer=None,
+                 n_features=None, n_components=None, stats=None, n_neighbors=None):
         """
         Parameters
         ----------
@@ -302,92 +921,612 @@ class CallInstance:
         n : int
             determines behavior of scope, see above
 
+        fetcher : Fetcher, optional
+            used to request the site's pages, see Fetch.Fetcher; a Fetcher with the default politeness policy, counting
+            its requests in stats, is created (and closed once scraping is finished) if none is provided
+
+        base_url : str, optional
+            replaces BASE_URL for this instance, useful for scraping a local copy of the site
+
+        dense : bool
+            if True, the tfidf matrix is stored as a dense array rather than a sparse one; only worth it for a handful
+            of pages, since a dense matrix holds a float for every call and every word in the vocabulary
+
+        normalizer : Normalizer, optional
+            used to turn descriptions and queries into keywords, see Text.Normalizer; set its processes to spread the
+            preprocessing of large corpora over several processes
+
+        n_features : int, optional
+            if provided, keywords are hashed into this many columns (see Index.HashedIndex) rather than kept in a
+            vocabulary, which bounds the memory used by the model; 2 ** 20 is plenty for the site
+
+        n_components : int, optional
+            if provided, calls are scored in a semantic space of this many dimensions (see Index.LsaIndex) rather than
+            by the terms they share with a query; a few hundred suits the site
+
+        stats : Stats.Instrumentation, optional
+            where the stages of building and querying the instance are timed and counted, e.g. to find out whether a
+            slow build is spent on the network, parsing or normalizing; nothing is recorded if not provided
+
+        n_neighbors : int, optional
+            if provided, the n_neighbors most similar calls to each call are computed when the model is fit and kept
+            up to date by refresh (see similar_calls); otherwise N_NEIGHBORS of them are computed when first needed
+
         Raises
         ------
         RuntimeError
-            If scope expects n and none is provided
+            If scope expects n and none is provided, or if both n_features and n_components are provided
         """
 
-        # Will be fit later
-        self.transformer = sci_text.TfidfTransformer(smooth_idf=True, use_idf=True)
+        if base_url:
+            self.BASE_URL = base_url
 
-        # Ensures scope and helper parameters are passed appropriately
-        if scope in ['pages', 'calls', 'overdue'] and not n:
-            raise RuntimeError("Scope expects n to be passed to constructor but none was found.")
-
-        # Creates the empty list self.calls
-        self.calls = []
+        self.normalizer = normalizer or Normalizer()
+        self.stats = stats or Stats.Instrumentation(enabled=False)
 
         # Adds appropriate Call objects to self.calls, accounting for scope
-        page = 0
-        calls = 0
-        overdue_ctr = 0
+        with self.stats.stage("scrape"):
+            if fetcher is None:
+                with Fetcher(stats=self.stats) as fetcher:
+                    self.calls = list(iter_calls(scope, n, fetcher, self.BASE_URL, self.stats))
+            else:
+                self.calls = list(iter_calls(scope, n, fetcher, self.BASE_URL, self.stats))
+        self.crawl_stats = fetcher.stats
+
+        # Preparing and fitting the tfidf model for later use with recommendations
+        self._fit(dense, n_features, n_components=n_components, n_neighbors=n_neighbors)
+
+    @classmethod
+    def from_calls(cls, calls, base_url=None, dense=False, normalizer=None, n_features=None, chunk_size=1024,
+                   n_components=None, stats=None, n_neighbors=None):
+        """Returns a CallInstance made of calls instead of scraping the site.
+
+        Calls may come from iter_calls, including a part of its output (e.g. itertools.islice(iter_calls(), 200) to
+        start recommending before the crawl is over), or from storage through Call.from_record.  Their keywords are
+        recomputed with normalizer.  With n_features, calls are normalized and indexed chunk_size at a time as they
+        are consumed, so no list of keyword strings for the whole corpus is ever built.
+
+        Parameters
+        ----------
+        calls : iterable of Call
+            the calls of the instance, in the order they are listed on the site; consumed once
+
+        base_url : str, optional
+            replaces BASE_URL for the instance, used by refresh
+
+        dense : bool
+            see constructor
+
+        normalizer : Normalizer, optional
+            see constructor
+
+        n_features : int, optional
+            see constructor
+
+        chunk_size : int
+            the number of calls normalized and indexed together if n_features is provided
+
+        n_components : int, optional
+            see constructor
+
+        stats : Stats.Instrumentation, optional
+            see constructor
+
+        n_neighbors : int, optional
+            see constructor
+
+        Returns
+        -------
+        instance : CallInstance
+            an instance holding calls, with its tfidf model fit to them
+
+        Raises
+        ------
+        RuntimeError
+            If one of calls has not had its individual page parsed, or if both n_features and n_components are provided
+        """
+
+        instance = cls.__new__(cls)
+        if base_url:
+            instance.BASE_URL = base_url
+
+        instance.normalizer = normalizer or Normalizer()
+        instance.stats = stats or Stats.Instrumentation(enabled=False)
+        instance.crawl_stats = None
+        if n_features and not n_components:
+            # Calls are added to the instance as the index consumes their keywords
+            instance.calls = []
+            instance._fit(dense, n_features, instance._ingest(calls, chunk_size), n_neighbors=n_neighbors)
+        else:
+            instance.calls = list(calls)
+            if any(call.long_desc is None for call in instance.calls):
+                raise RuntimeError("CallInstance.from_calls expects calls whose individual page has been parsed.")
+            instance._fit(dense, n_features, n_components=n_components, n_neighbors=n_neighbors)
+
+        return instance
+
+    def _ingest(self, calls, chunk_size):
+        """Yields the keyword strings of calls chunk_size calls at a time, appending each chunk to self.calls."""
+
+        calls = iter(calls)
         while True:
+            chunk = list(itertools.islice(calls, chunk_size))
+            if not chunk:
+                return
+            if any(call.long_desc is None for call in chunk):
+                raise RuntimeError("CallInstance.from_calls expects calls whose individual page has been parsed.")
+
+            self.calls.extend(chunk)
+            yield from self._desc_lists(chunk)
+
+    def _fit(self, dense, n_features=None, docs=None, n_components=None, n_neighbors=None):
+        """Fits a new tfidf model to docs, the keywords of calls if not provided, see constructor for the index modes.
 
-            # For the 'default' scope, keeps track of whether a non-overdue call has been found on the current page
-            has_not_overdue = False
+        Raises
+        ------
+        RuntimeError
+            If both n_features and n_components are provided
+        """
 
-            # Performs the actual request
-            url = self.BASE_URL + str(page)
-            html = requests.get(url)
-            soup = BeautifulSoup(html.text, 'lxml')
+        if n_features and n_components:
+            raise RuntimeError("CallInstance expects either n_features or n_components but both were found.")
 
-            for div in soup('div'):
-                if 'views-row' in div.get('class', []):
+        if n_components:
+            self._index = LsaIndex(n_components, dense=dense)
+        elif n_features:
+            self._index = HashedIndex(n_features, dense=dense)
+        else:
+            self._index = TfidfIndex(dense=dense)
 
-                    self.calls.append(Call(div.article))
-                    sleep(1)
+        docs = self._desc_lists(self.calls) if docs is None else docs
+        with self.stats.stage("fit"):
+            self._index.fit(docs)
+        self._index_filters()
+        self.query_cache = QueryCache(self.QUERY_CACHE_SIZE)
 
-                    # Checks whether the call is overdue, updates appropriate variables
+        self.neighbors = None
+        if n_neighbors:
+            self._neighbor_index(n_neighbors)
 
-                    if self.calls[calls].parse_due_date() < datetime.date.today():
-                        overdue_ctr += 1
-                    else:
-                        has_not_overdue = True
+    def _neighbor_index(self, k=None):
+        """Returns neighbors, computing them if k is provided, if they were not computed yet or if they are out of date.
 
-                    # Call is finished, so increment calls
-                    calls += 1
+        They are computed with k neighbors per call, or as many as before if k is not provided (N_NEIGHBORS at first).
+        """
 
-                # Checks whether calls or date conditions have been reached
-                if scope == 'calls' and n == calls:
-                    break
-                if scope == 'overdue' and overdue_ctr == n:
-                    break
+        neighbors = self.neighbors
+        if k or neighbors is None or neighbors.version != self._index.version:
+            neighbors = NeighborIndex(k or (neighbors.k if neighbors else self.N_NEIGHBORS))
+            with self.stats.stage("neighbors"):
+                neighbors.build(self._index)
+            self.neighbors = neighbors
 
-            # Checks again to break out of outer loop
-            if scope == 'calls' and n == calls:
-                break
-            if scope == 'overdue' and overdue_ctr == n:
+        return neighbors
+
+    def _index_filters(self):
+        """Builds the sorted deadline index and the category index used to filter calls, see _filter_mask."""
+
+        # Unknown deadlines are stored as 0, before the ordinal of any date
+        self._due = np.array([call.due_date.toordinal() if call.due_date else 0 for call in self.calls], dtype=np.int64)
+        self._due_order = np.argsort(self._due, kind='stable')
+        self._due_sorted = self._due[self._due_order]
+
+        # The calls in each category, in increasing order
+        category_ids = collections.defaultdict(list)
+        for i, call in enumerate(self.calls):
+            for category in set(call.categories or ()):
+                category_ids[category].append(i)
+        self._category_ids = {category: np.array(ids, dtype=np.intp) for category, ids in category_ids.items()}
+
+        # The index of each call, for recommenders taking a call
+        self._positions = {call.source_link: i for i, call in enumerate(self.calls)}
+
+    def _deadline_mask(self, open_only=False, due_after=None, due_before=None):
+        """Returns a boolean array selecting the calls whose deadline passes the filters, or None if none are set.
+
+        The calls are found with two binary searches in the sorted deadline index.  Calls whose deadline is unknown
+        are open, as Call.is_overdue has it, but never pass due_after or due_before.
+
+        Parameters
+        ----------
+        open_only : bool
+            if True, only open calls are selected, those that are not overdue (see Call.is_overdue)
+
+        due_after : datetime.date, optional
+            only calls due on or after due_after are selected
+
+        due_before : datetime.date, optional
+            only calls due on or before due_before are selected
+        """
+
+        if not open_only and due_after is None and due_before is None:
+            return None
+
+        first = 1
+        if open_only:
+            first = max(first, datetime.date.today().toordinal())
+        if due_after is not None:
+            first = max(first, due_after.toordinal())
+        last = due_before.toordinal() if due_before is not None else np.iinfo(np.int64).max
+
+        start = np.searchsorted(self._due_sorted, first, side='left')
+        stop = np.searchsorted(self._due_sorted, last, side='right')
+
+        mask = np.zeros(len(self.calls), dtype=bool)
+        mask[self._due_order[start:stop]] = True
+
+        # Unknown deadlines are stored as 0, at the start of the index
+        if due_after is None and due_before is None:
+            mask[self._due_order[:np.searchsorted(self._due_sorted, 0, side='right')]] = True
+
+        return mask
+
+    def _category_mask(self, categories=None, category_match="any", exclude_categories=None):
+        """Returns a boolean array selecting the calls whose categories pass the filters, or None if none are set.
+
+        Parameters
+        ----------
+        categories : str or list of str, optional
+            the categories calls are selected from, see category_match
+
+        category_match : str
+            * any : calls in at least one of categories are selected
+            * all : only calls in every one of categories are selected
+
+        exclude_categories : str or list of str, optional
+            calls in any of these categories are never selected
+
+        Raises
+        ------
+        RuntimeError
+            If category_match is neither "any" nor "all"
+        """
+
+        if categories is None and exclude_categories is None:
+            return None
+        if category_match not in ("any", "all"):
+            raise RuntimeError("Category_match expects any or all but " + str(category_match) + " was found.")
+
+        none = np.empty(0, dtype=np.intp)
+        if categories is not None:
+            categories = {categories} if isinstance(categories, str) else set(categories)
+
+            # Counts how many of the categories each call is in
+            hits = np.zeros(len(self.calls), dtype=np.int32)
+            for category in categories:
+                hits[self._category_ids.get(category, none)] += 1
+            mask = hits > 0 if category_match == "any" else hits == len(categories)
+        else:
+            mask = np.ones(len(self.calls), dtype=bool)
+
+        if exclude_categories is not None:
+            for category in [exclude_categories] if isinstance(exclude_categories, str) else exclude_categories:
+                mask[self._category_ids.get(category, none)] = False
+
+        return mask
+
+    def _filter_mask(self, open_only=False, due_after=None, due_before=None, categories=None, category_match="any",
+                     exclude_categories=None):
+        """Returns a boolean array selecting the calls that pass every filter, or None if none are set.
+
+        See _deadline_mask and _category_mask for the filters.
+        """
+
+        masks = [mask for mask in (self._deadline_mask(open_only, due_after, due_before),
+                                   self._category_mask(categories, category_match, exclude_categories))
+                 if mask is not None]
+        if not masks:
+            return None
+
+        return masks[0] & masks[1] if len(masks) == 2 else masks[0]
+
+    @staticmethod
+    def _filter_key(open_only=False, due_after=None, due_before=None, categories=None, category_match="any",
+                    exclude_categories=None):
+        """Returns a hashable form of the arguments of _filter_mask, used to cache the results of filtered queries."""
+
+        def names(value):
+            return None if value is None else frozenset([value] if isinstance(value, str) else value)
+
+        # Which calls are open depends on the day
+        return (datetime.date.today() if open_only else None, due_after, due_before, names(categories),
+                category_match if categories is not None else None, names(exclude_categories))
+
+    def category_counts(self, rec_list=None):
+        """Returns the number of calls in each category, among the recommendations of rec_list or among every call.
+
+        Parameters
+        ----------
+        rec_list : RecList, optional
+            a list returned by a recommender, whose full ranking is counted (RecList.total calls, not only recs); every
+            call is counted if not provided
+
+        Returns
+        -------
+        counts : dict of str to int
+            the number of calls in each category that has any, most common first
+        """
+
+        if rec_list is None:
+            counts = {category: len(ids) for category, ids in self._category_ids.items()}
+        elif rec_list._ids is None:
+            counts = collections.Counter(category for rec in rec_list.recs
+                                         for category in set(rec.call.categories or ()))
+        else:
+            selected = np.zeros(len(self.calls), dtype=bool)
+            selected[rec_list._ids] = True
+            counts = {category: int(np.count_nonzero(selected[ids])) for category, ids in self._category_ids.items()}
+
+        return dict(sorted(((category, count) for category, count in counts.items() if count),
+                           key=lambda item: (-item[1], item[0])))
+
+    def calls_due(self, open_only=False, due_after=None, due_before=None):
+        """Returns the calls whose deadline passes the filters, soonest deadline first.
+
+        Parameters
+        ----------
+        open_only : bool
+            if True, only calls that are not overdue (see Call.is_overdue) are returned
+
+        due_after : datetime.date, optional
+            only calls due on or after due_after are returned
+
+        due_before : datetime.date, optional
+            only calls due on or before due_before are returned
+
+        Returns
+        -------
+        calls : list of Call
+            the calls within the filters, ordered by deadline and then by their order in calls; calls whose deadline
+            is unknown are left out
+        """
+
+        mask = self._deadline_mask(open_only, due_after, due_before)
+        mask = self._due > 0 if mask is None else mask & (self._due > 0)
+
+        return [self.calls[i] for i in self._due_order if mask[i]]
+
+    @property
+    def vectorizer(self):
+        return self._index.vectorizer
+
+    @property
+    def transformer(self):
+        return self._index.transformer
+
+    @property
+    def instance_tfidf(self):
+        return self._index.matrix
+
+    def _desc_lists(self, calls):
+        """Returns the keywords of each call's long description as a space separated string, setting them on calls."""
+
+        with self.stats.stage("keywords"):
+            keywords = self.normalizer.batch([call.long_desc for call in calls], stats=self.stats)
+        for call, words in zip(calls, keywords):
+            call.long_desc_keywords = words
+        self.stats.count("calls.normalized", len(calls))
+        self.stats.count("keywords", sum(len(words) for words in keywords))
+
+        return [' '.join(words) for words in keywords]
+
+    def refresh(self, drop_overdue=False, fetcher=None, max_pages=None):
+        """Adds the calls that are new or were updated since the instance was scraped.
+
+        Listing pages are read newest first until a call with a known source_link and updated time is reached, so only a
+        handful of requests are needed when little has changed.  Only the individual pages of new or updated calls are
+        fetched, and the tfidf model is updated with their keywords rather than refit from scratch.  Calls whose page
+        cannot be fetched or parsed are skipped and recorded in crawl_stats.failed.
+
+        ...
+
+        Parameters
+        ----------
+        drop_overdue : bool
+            if True, calls whose deadline has passed are removed from the instance
+
+        fetcher : Fetcher, optional
+            used to request the site's pages, see constructor
+
+        max_pages : int, optional
+            the maximum number of listing pages to read, unlimited if not provided
+
+        Returns
+        -------
+        calls : list of Call
+            the new or updated calls, in the order they are listed on the site
+        """
+
+        known = {call.source_link: call.updated for call in self.calls}
+
+        if fetcher is None:
+            with Fetcher(stats=self.stats) as fetcher:
+                return self.refresh(drop_overdue, fetcher, max_pages)
+
+        # Reads listing pages until reaching a call that has not changed since it was scraped
+        pending = []
+        page = 0
+        up_to_date = False
+        while not up_to_date and (max_pages is None or page < max_pages):
+            listing = _listing(fetcher, self.BASE_URL, page, self.stats)
+            if not listing:
                 break
 
-            # Page is finished, so increment page
+            for call in listing:
+                if known.get(call.source_link) == call.updated:
+                    up_to_date = True
+                    break
+                pending.append((call, fetcher.submit(call.source_link)))
+
             page += 1
 
-            # Checks whether pages condition has been reached
-            if scope == 'pages' and n == page:
-                break
+        # Calls whose page could not be fetched or parsed are skipped, keeping their older version if there is one
+        new_calls = [call for call, future in pending if _parsed(call, future, fetcher.stats, self.stats)]
+        self.crawl_stats = fetcher.stats
+
+        # Older versions of updated calls are replaced, overdue calls are removed if asked
+        replaced = {call.source_link for call in new_calls}
+        today = datetime.date.today()
+        keep = [i for i, call in enumerate(self.calls) if call.source_link not in replaced
+                and not (drop_overdue and call.is_overdue(today))]
+        if drop_overdue:
+            new_calls = [call for call in new_calls if not call.is_overdue(today)]
+
+        # Nothing changed, so the model, its version and the query cache are left as they are
+        if not new_calls and len(keep) == len(self.calls):
+            return new_calls
+
+        docs = self._desc_lists(new_calls)
+        with self.stats.stage("update"):
+            self._index.update(keep, docs)
+        self.calls = new_calls + [self.calls[i] for i in keep]
+        self._index_filters()
+
+        # Neighbor lists are updated with the new calls rather than computed again
+        if self.neighbors is not None:
+            with self.stats.stage("neighbors"):
+                self.neighbors.update(self._index, keep, len(new_calls))
+
+        return new_calls
+
+    def save(self, path):
+        """Writes a snapshot of the instance to the directory path, replacing any snapshot already there.
+
+        The snapshot holds a manifest.json with the snapshot version, the calls as json lines in calls.jsonl (see
+        Call.to_record), the fitted tfidf model (see Index.TfidfIndex.save) and the neighbor lists if they were computed
+        (see Index.NeighborIndex.save).  It is written to a new version directory inside path, which is published by
+        replacing the CURRENT file naming it in a single atomic step, so a process loading the snapshot meanwhile reads
+        every file from either the old version or the new one.  The previous version is kept for processes that were
+        still reading it, older ones are removed.
 
-            # Checks whether default condition has been reached
-            if scope == 'default' and not has_not_overdue:
-                break
+        Parameters
+        ----------
+        path : str
+            the directory to write the snapshot to
+        """
+
+        path = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(path, exist_ok=True)
+        previous = _current_snapshot(path)
+
+        tmp = tempfile.mkdtemp(prefix=".snapshot-", dir=path)
+        version = None
+        try:
+            with open(os.path.join(tmp, "calls.jsonl"), "w", encoding="utf-8") as fh:
+                for call in self.calls:
+                    fh.write(json.dumps(call.to_record()) + "\n")
+
+            self._index.save(tmp)
+            if self.neighbors is not None:
+                self.neighbors.save(tmp)
+
+            manifest = dict(version=SNAPSHOT_VERSION, base_url=self.BASE_URL, calls=len(self.calls),
+                            index=type(self._index).__name__,
+                            created=datetime.datetime.now().isoformat(timespec="seconds"))
+            with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as fh:
+                json.dump(manifest, fh, indent=2)
+
+            # Only complete versions are named v-*, so pruning never removes one being written by another process
+            version = "v-" + datetime.datetime.now().strftime("%Y%m%d%H%M%S") + os.path.basename(tmp)[len(".snapshot"):]
+            os.rename(tmp, os.path.join(path, version))
+
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path, prefix=".current-", delete=False) as fh:
+                fh.write(version)
+            os.replace(fh.name, os.path.join(path, CURRENT_SNAPSHOT))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if version is not None and _current_snapshot(path) != version:
+                shutil.rmtree(os.path.join(path, version), ignore_errors=True)
+            raise
+
+        # Removes older versions, and the files of a snapshot written before versions existed
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            if name.startswith("v-") and name not in (version, previous):
+                shutil.rmtree(entry, ignore_errors=True)
+            elif name in SNAPSHOT_FILES and os.path.isfile(entry):
+                os.remove(entry)
+
+    @classmethod
+    def load(cls, path, mmap=True, dense=False):
+        """Reads a snapshot written by save, without scraping the site.
+
+        Parameters
+        ----------
+        path : str
+            the directory the snapshot was written to
 
-            # In line with the site's robots.txt
-            sleep(10)
+        mmap : bool
+            if True, the tfidf matrix is memory-mapped read-only rather than read into memory, so that several
+            processes can share one snapshot
 
-        # Preparing and fitting the TfidfTransformer for later use with recommendations
-        self.vectorizer = sci_text.CountVectorizer()
-        tokenizer = nltk.tokenize.toktok.ToktokTokenizer()
-        lemmatizer = nltk.WordNetLemmatizer()
+        dense : bool
+            if True, the tfidf matrix is read into a dense array, see constructor
 
-        desc_lists = [' '.join(call.get_long_desc_keywords(tokenizer, lemmatizer)) for call in self.calls]
-        desc_lists_vec = self.vectorizer.fit_transform(desc_lists)
+        Returns
+        -------
+        instance : CallInstance
+            the instance the snapshot was taken of, with calls rebuilt by Call.from_record
+
+        Raises
+        ------
+        RuntimeError
+            If the snapshot was written by an unsupported version
+        """
 
-        self.instance_tfidf = self.transformer.fit_transform(desc_lists_vec).toarray()
+        # The version is resolved once, so that every file is read from it whatever is saved meanwhile; if a later
+        # save removed it before it was read, the version current by then is read instead
+        path = os.path.expanduser(path)
+        while True:
+            current = _current_snapshot(path)
+            try:
+                return cls._read(path if current is None else os.path.join(path, current), mmap, dense)
+            except FileNotFoundError:
+                if current is None or _current_snapshot(path) == current:
+                    raise
+
+    @classmethod
+    def _read(cls, path, mmap, dense):
+        """Reads the snapshot in version directory path, see load."""
+
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise RuntimeError("Snapshot version " + str(manifest.get("version")) + " is not supported, expected " +
+                               str(SNAPSHOT_VERSION) + ".")
+
+        instance = cls.__new__(cls)
+        instance.normalizer = Normalizer()
+        instance.stats = Stats.Instrumentation(enabled=False)
+        instance.crawl_stats = None
+        if manifest["base_url"] != cls.BASE_URL:
+            instance.BASE_URL = manifest["base_url"]
+
+        with open(os.path.join(path, "calls.jsonl"), encoding="utf-8") as fh:
+            instance.calls = [Call.from_record(json.loads(line)) for line in fh]
+
+        # Snapshots written before other index modes existed do not name their index
+        index_class = {index.__name__: index for index in (TfidfIndex, HashedIndex, LsaIndex)}[
+            manifest.get("index", "TfidfIndex")]
+        instance._index = index_class.load(path, mmap=mmap, dense=dense)
+        instance._index_filters()
+        instance.query_cache = QueryCache(instance.QUERY_CACHE_SIZE)
+
+        # Snapshots only hold neighbor lists if they had been computed, otherwise they are computed when first needed
+        # rather than here, so that loading stays quick
+        instance.neighbors = None
+        if os.path.exists(os.path.join(path, "neighbors.json")):
+            instance.neighbors = NeighborIndex.load(path, instance._index.version)
+
+        return instance
 
     def relevance(self, words):
         """Computes the relevance of a set of words with the entire set of calls as a reference.
 
-        Only intended for use by the various recommender methods.
+        Only intended for use by the various recommender methods.  Scores are kept in query_cache, keyed by the terms
+        of words the model knows regardless of their order, so that repeated queries are not scored again until the
+        model is refit or refreshed.
 
         Parameters
         ----------
@@ -396,21 +1535,76 @@ class CallInstance:
 
         Returns
         -------
-        rec_index : list of float
-            base relevance (the higher the better) for
+        rec_index : numpy.ndarray of float
+            base relevance (the higher the better) for each call, in the order of calls; read-only, since it is shared
+            with later queries for the same terms
         """
 
-        words_str = [' '.join(words)]
-        words_tfidf = self.transformer.transform(self.vectorizer.transform(words_str)).toarray()
-        rec_index = cdist(words_tfidf, self.instance_tfidf, 'cosine')
+        return self._scored(words)[1]
+
+    def _scored(self, words, filters=(), prune=False):
+        """Returns the calls that pass filters and their relevance to words, from query_cache if possible.
+
+        Calls left out by the filters are not scored at all.
+
+        Parameters
+        ----------
+        words : list of str
+            the keywords to be compared against each call
 
-        return [(1 / item - 1) * 10 if item else 0 for item in rec_index[0]]
+        filters : tuple
+            the arguments of _filter_mask, no filtering if empty
 
-    def keyword_recommend(self, keywords, min_relevancy=0.3):
+        prune : bool
+            if True, only the calls containing at least one of words are scored, see Index.TfidfIndex.match
+
+        Returns
+        -------
+        ids : numpy.ndarray of int or None
+            the indices of the scored calls in increasing order, None if every call was scored
+
+        rec_index : numpy.ndarray of float
+            base relevance of each of ids, or of every call
+        """
+
+        doc = ' '.join(words)
+        version = self._index.version
+        key = (prune, self._index.terms(doc), self._filter_key(*filters))
+        result = self.query_cache.get(key, version)
+        if result is not None:
+            return result
+
+        with self.stats.stage("score"):
+            mask = self._filter_mask(*filters)
+            if prune:
+                ids, similarity = self._index.match(doc)
+                if mask is not None:
+                    ids, similarity = ids[mask[ids]], similarity[mask[ids]]
+            else:
+                # Cosine distance of the words to each call, computed as a sparse product of normalized rows
+                ids = None if mask is None else np.flatnonzero(mask)
+                similarity = self._index.similarity([doc], ids)[0]
+
+            result = (ids, self._relevancy(1 - similarity))
+        self.query_cache.put(key, version, result)
+
+        return result
+
+    @staticmethod
+    def _relevancy(distances):
+        """Maps cosine distances to relevancy scores, an exact match gets a score of 0."""
+
+        with np.errstate(divide='ignore'):
+            return np.where(distances != 0, (1 / distances - 1) * 10, 0)
+
+    @_query_stage("query.keyword")
+    def keyword_recommend(self, keywords, min_relevancy=0.3, top_k=None, open_only=False, due_after=None,
+                          due_before=None, categories=None, category_match="any", exclude_categories=None):
         """Recommends papers based on a list of keywords.
 
         The basic algorithm here is scikit-learn's tf-idf model.  The model is automatically fit to the set of calls
-        when a CallInstance Object is initialized.
+        when a CallInstance Object is initialized.  Only the calls containing at least one of the keywords are scored,
+        found through the inverted index of the model (see Index.TfidfIndex.postings).
 
         ...
 
@@ -422,6 +1616,32 @@ class CallInstance:
         min_relevancy : float
             the minimum relevancy required for a call to appear in the results
 
+        top_k : int, optional
+            the maximum number of recommendations in the returned list's recs, the rest of the ranking can still be
+            reached through RecList.page; unlimited if not provided
+
+        open_only : bool
+            if True, only calls that are not overdue (see Call.is_overdue) are recommended, which keeps calls whose
+            deadline is unknown
+
+        due_after : datetime.date, optional
+            if provided, only calls due on or after due_after are recommended
+
+        due_before : datetime.date, optional
+            if provided, only calls due on or before due_before are recommended; due_after and due_before leave out
+            calls whose deadline is unknown
+
+        categories : str or list of str, optional
+            if provided, only calls in these categories are recommended, see category_match
+
+        category_match : str
+            * any : calls in at least one of categories are recommended
+            * all : only calls in every one of categories are recommended
+
+        exclude_categories : str or list of str, optional
+            if provided, calls in any of these categories are never recommended; deadline and category filters are
+            applied before scoring, so the calls they leave out are never scored
+
         Returns
         -------
         rec_list : list of CallRec
@@ -436,32 +1656,16 @@ class CallInstance:
             identifies the keywords shared by the call
         """
 
-        # A list of CallRec Objects, to be returned by the function
-        rec_list = []
-
-        # Associates each call with a relevance score
-        index_zip = zip(self.calls, self.relevance(keywords))
+        # Calls sharing no keyword have a relevancy of 0, so only the calls in the keywords' postings are scored
+        filters = (open_only, due_after, due_before, categories, category_match, exclude_categories)
+        ids, rel_index = self._scored(keywords, filters, prune=min_relevancy >= 0)
 
-        # Finds sufficiently relevant calls and places the resulting CallRec object in rec_list
-        for call, rel in index_zip:
-            if rel > min_relevancy:
+        # Finds sufficiently relevant calls and places the resulting CallRec objects in a RecList
+        return self._rec_list(rel_index, keywords, keywords, "keyword", min_relevancy, top_k, ids)
 
-                # Determines shared words for the CallRec's rec_info attribute
-                shared_words = [word for word in keywords if word in call.long_desc_keywords]
-                if len(shared_words) == 1:
-                    ret_str = "Based on your search for keyword " + shared_words[0] + "."
-                elif len(shared_words) > 1:
-                    ret_str = "Based on your search for keywords " + ', '.join(shared_words[:-1]) + ' and ' + \
-                              shared_words[-1] + '.'
-                else:
-                    ret_str = "No information about this recommendation is available."
-
-                rec = CallRec(call, rel, "keyword", keywords, ret_str)
-                rec_list.append(rec)
-
-        return RecList(rec_list)
-
-    def abstract_recommend(self, abstract, min_relevancy=0.3):
+    @_query_stage("query.abstract")
+    def abstract_recommend(self, abstract, min_relevancy=0.3, top_k=None, open_only=False, due_after=None,
+                           due_before=None, categories=None, category_match="any", exclude_categories=None):
         """Recommends papers based on an abstract.
 
         The basic algorithm here is scikit-learn's tf-idf model.  The model is automatically fit to the set of calls
@@ -477,6 +1681,16 @@ class CallInstance:
         min_relevancy : float
             the minimum relevancy required for a call to appear in the results
 
+        top_k : int, optional
+            the maximum number of recommendations in the returned list's recs, the rest of the ranking can still be
+            reached through RecList.page; unlimited if not provided
+
+        open_only, due_after, due_before : optional
+            deadline filters, see keyword_recommend
+
+        categories, category_match, exclude_categories : optional
+            category filters, see keyword_recommend
+
         Returns
         -------
         rec_list : list of CallRec
@@ -491,32 +1705,17 @@ class CallInstance:
             brief summary of the abstract used to perform the search
         """
 
-        # A list of CallRec Objects, to be returned by the function
-        rec_list = []
-
-        # Associates each call with a relevance score
-        words = []
-        tokenizer = nltk.tokenize.toktok.ToktokTokenizer()
-        lemmatizer = nltk.WordNetLemmatizer()
-        for word in tokenizer.tokenize(abstract):
-            stem = lemmatizer.lemmatize(word.lower())
-            if stem not in words and stem not in STOPWORDS and stem.isalpha():
-                words.append(stem)
-
-        index_zip = zip(self.calls, self.relevance(words))
+        # Associates each call that passes the filters with a relevance score
+        words = self._query_words(abstract, "abstract")
+        filters = (open_only, due_after, due_before, categories, category_match, exclude_categories)
+        ids, rel_index = self._scored(words, filters)
 
-        # Finds sufficiently relevant calls and places the resulting CallRec object in rec_list
-        for call, rel in index_zip:
-            if rel > min_relevancy:
-                # Makes a brief summary
-                ret_str = "Based on the abstract beginning \"" + " ".join(abstract.split()[:6]) + "..." + "\""
+        # Finds sufficiently relevant calls and places the resulting CallRec objects in a RecList
+        return self._rec_list(rel_index, abstract, words, "abstract", min_relevancy, top_k, ids)
 
-                rec = CallRec(call, rel, "abstract", words, ret_str)
-                rec_list.append(rec)
-
-        return RecList(rec_list)
-
-    def title_recommend(self, title, min_relevancy=0.3):
+    @_query_stage("query.title")
+    def title_recommend(self, title, min_relevancy=0.3, top_k=None, open_only=False, due_after=None,
+                        due_before=None, categories=None, category_match="any", exclude_categories=None):
         """Recommends papers based on a title.
 
         The basic algorithm here is scikit-learn's tf-idf model.  The model is automatically fit to the set of calls
@@ -533,6 +1732,16 @@ class CallInstance:
         min_relevancy : float
             the minimum relevancy required for a call to appear in the results
 
+        top_k : int, optional
+            the maximum number of recommendations in the returned list's recs, the rest of the ranking can still be
+            reached through RecList.page; unlimited if not provided
+
+        open_only, due_after, due_before : optional
+            deadline filters, see keyword_recommend
+
+        categories, category_match, exclude_categories : optional
+            category filters, see keyword_recommend
+
         Returns
         -------
         rec_list : list of CallRec
@@ -547,24 +1756,277 @@ class CallInstance:
             brief summary of the abstract used to perform the search
         """
 
-        # A list of CallRec Objects, to be returned by the function
-        rec_list = []
+        # Associates each call that passes the filters with a relevance score
+        words = self._query_words(title, "title")
+        filters = (open_only, due_after, due_before, categories, category_match, exclude_categories)
+        ids, rel_index = self._scored(words, filters)
+
+        # Finds sufficiently relevant calls and places the resulting CallRec objects in a RecList
+        return self._rec_list(rel_index, title, words, "title", min_relevancy, top_k, ids)
+
+    @_query_stage("query.batch")
+    def batch_recommend(self, queries, kind="keyword", top_k=None, min_relevancy=0.3, n_jobs=1, chunk_size=256,
+                        open_only=False, due_after=None, due_before=None, categories=None, category_match="any",
+                        exclude_categories=None):
+        """Recommends papers for many queries at once.
+
+        Equivalent to calling keyword_recommend, title_recommend or abstract_recommend on each query, but the queries
+        are normalized together (see Text.Normalizer.batch) and scored against every call with one sparse matrix
+        product per chunk of queries.
+
+        ...
+
+        Parameters
+        ----------
+        queries : list
+            the queries, each a list of str for "keyword" or a str for "title" and "abstract"
+
+        kind : str
+            "keyword", "title" or "abstract", the recommender each query is treated with
+
+        top_k : int, optional
+            the maximum number of recommendations in each returned list's recs, unlimited if not provided
+
+        min_relevancy : float
+            the minimum relevancy required for a call to appear in the results
+
+        n_jobs : int
+            the number of threads chunks of queries are scored on
+
+        chunk_size : int
+            the number of queries scored together, bounds the memory used by the dense chunk of scores
+
+        open_only, due_after, due_before : optional
+            deadline filters, see keyword_recommend
+
+        categories, category_match, exclude_categories : optional
+            category filters, see keyword_recommend
+
+        Returns
+        -------
+        rec_lists : list of RecList
+            one RecList per query, in the order of queries, see the recommender for kind for CallRec specifications
+
+        Raises
+        ------
+        RuntimeError
+            If kind is not a known recommender
+        """
+
+        if kind not in self.REC_TYPES:
+            raise RuntimeError("Kind expects one of " + ", ".join(self.REC_TYPES) + " but " + str(kind) + " was found.")
+
+        if kind == "keyword":
+            words = [list(query) for query in queries]
+        else:
+            words = self.normalizer.batch(queries, lemmatize=(kind == "abstract"))
+
+        # Only the calls that pass the filters are scored
+        filters = (open_only, due_after, due_before, categories, category_match, exclude_categories)
+        mask = self._filter_mask(*filters)
+        rows = None if mask is None else np.flatnonzero(mask)
+        filter_key = self._filter_key(*filters)
+        version = self._index.version
+
+        def recommend_chunk(start):
+            chunk = [' '.join(item) for item in words[start:start + chunk_size]]
+
+            # Queries found in query_cache are not scored again, the others are scored together
+            keys = [(False, self._index.terms(doc), filter_key) for doc in chunk]
+            results = [self.query_cache.get(key, version) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                rel_index = self._relevancy(1 - self._index.similarity([chunk[i] for i in missing], rows))
+                for i, rel in zip(missing, rel_index):
+                    # Copied, so that a cached row does not keep the whole chunk of scores alive
+                    results[i] = (rows, rel.copy())
+                    self.query_cache.put(keys[i], version, results[i])
+
+            return [self._rec_list(rel, queries[start + i], words[start + i], kind, min_relevancy, top_k, ids)
+                    for i, (ids, rel) in enumerate(results)]
+
+        starts = range(0, len(queries), chunk_size)
+        if n_jobs > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                chunks = list(pool.map(recommend_chunk, starts))
+        else:
+            chunks = [recommend_chunk(start) for start in starts]
+
+        return [rec_list for chunk in chunks for rec_list in chunk]
+
+    def _position(self, call):
+        """Returns the index in calls of call, which may be given as a Call or as its index.
+
+        Raises
+        ------
+        RuntimeError
+            If call is neither an index of calls nor a call of the instance
+        """
+
+        if isinstance(call, (int, np.integer)):
+            if -len(self.calls) <= call < len(self.calls):
+                return int(call) % len(self.calls)
+        elif isinstance(call, Call) and call.source_link in self._positions:
+            return self._positions[call.source_link]
+
+        raise RuntimeError("Call expects a call of the instance or its index but " + repr(call)[:100] + " was found.")
+
+    @_query_stage("query.similar")
+    def similar_calls(self, call, top_k=10, min_relevancy=0.3, open_only=False, due_after=None, due_before=None,
+                      categories=None, category_match="any", exclude_categories=None):
+        """Recommends the calls most similar to one of the instance's calls.
+
+        The calls most similar to each call are computed once, a block of calls at a time, and kept in neighbors (see
+        Index.NeighborIndex), so a query only reads a list rather than scoring every call.  The lists are computed
+        the first time they are needed unless n_neighbors was provided, and updated by refresh.  If the filters leave
+        fewer than top_k of a call's neighbors, or top_k is more than the lists hold, the call's row is scored
+        against every call instead.
+
+        Reposts of call, whose similarity rounds to 1, get a relevancy of 0 like exact matches in the other
+        recommenders; see duplicate_calls to find them.
+
+        ...
+
+        Parameters
+        ----------
+        call : Call or int
+            one of the instance's calls, or its index in calls
+
+        top_k : int, optional
+            the maximum number of recommendations in the returned list's recs; unlimited if None
+
+        min_relevancy : float
+            the minimum relevancy required for a call to appear in the results
+
+        open_only, due_after, due_before : optional
+            deadline filters, see keyword_recommend
+
+        categories, category_match, exclude_categories : optional
+            category filters, see keyword_recommend
+
+        Returns
+        -------
+        rec_list : list of CallRec
+            a list of calls with relevancy greater than min_relevancy and containing additional information (see below)
+
+        Raises
+        ------
+        RuntimeError
+            If call is neither one of the instance's calls nor an index of calls
+
+        CallRec Specifications
+        ----------------------
+        criteria : Call
+            the call similar calls were asked for
+
+        rec_info : str
+            names the call similar calls were asked for
+        """
+
+        row = self._position(call)
+        neighbors = self._neighbor_index()
+        mask = self._filter_mask(open_only, due_after, due_before, categories, category_match, exclude_categories)
+
+        ids, similarity = neighbors.neighbors(row)
+        if mask is not None:
+            ids, similarity = ids[mask[ids]], similarity[mask[ids]]
+
+        # The list may have left out calls that would be recommended, which scoring the call's row finds
+        complete = neighbors.k >= len(self.calls) - 1
+        if not complete and (top_k is None or len(ids) < top_k):
+            similarity = np.asarray(self._index.row_similarity([row])[0], dtype=np.float64)
+            ids = np.flatnonzero(mask if mask is not None else np.ones(len(self.calls), dtype=bool))
+            ids = ids[ids != row]
+            similarity = similarity[ids]
+
+        order = np.argsort(ids)
+        rel_index = self._relevancy(1 - np.round(similarity[order], 6))
+        query = self.calls[row]
+
+        return self._rec_list(rel_index, query, query, "similar", min_relevancy, top_k, ids[order])
+
+    def duplicate_calls(self, threshold=0.9):
+        """Returns the pairs of calls whose descriptions are so similar that one is likely a repost of the other.
+
+        Pairs are read from neighbors (see similar_calls), computed if they were not yet.
+
+        Parameters
+        ----------
+        threshold : float
+            the minimum cosine similarity of the keywords of two calls for them to be paired
+
+        Returns
+        -------
+        pairs : list of tuple
+            (call, other_call, similarity) for each pair, most similar first, call being listed before other_call
+        """
+
+        first, second, similarity = self._neighbor_index().pairs(threshold)
+
+        return [(self.calls[i], self.calls[j], float(score)) for i, j, score in zip(first, second, similarity)]
+
+    def _query_words(self, query, rec_type):
+        """Returns the words of query that are compared against each call by the recommender for rec_type.
+
+        Keywords are used as given, titles are tokenized and abstracts are tokenized and lemmatized; in the last two
+        cases duplicates and STOPWORDS are left out.
+        """
+
+        if rec_type == "keyword":
+            return list(query)
+
+        return self.normalizer.keywords(query, lemmatize=(rec_type == "abstract"))
+
+    @staticmethod
+    def _rec_info(query, rec_type, shared_words=None):
+        """Returns a string explaining why a call was recommended for query, see the recommenders for details."""
+
+        if rec_type == "abstract":
+            return "Based on the abstract beginning \"" + " ".join(query.split()[:6]) + "..." + "\""
+        if rec_type == "title":
+            return "Based on the abstract beginning title " + query + "."
+        if rec_type == "similar":
+            return "Based on its similarity to the call " + query.source + "."
+
+        if len(shared_words) == 1:
+            return "Based on your search for keyword " + shared_words[0] + "."
+        elif len(shared_words) > 1:
+            return "Based on your search for keywords " + ', '.join(shared_words[:-1]) + ' and ' + shared_words[-1] + '.'
+
+        return "No information about this recommendation is available."
+
+    def _shared_words(self, keywords):
+        """Returns a function giving the keywords found in the call at an index, read from the tfidf matrix.
+
+        Keywords are single lemmatized words, like the keywords of each call, so a keyword is found in a call exactly
+        when the call has a weight for it.  The matrix is the one the index has now (see Index.TfidfIndex.contains),
+        so a RecList built before a refresh keeps reporting the words of its own calls, and each call's row is only
+        read once the call is looked at.
+        """
+
+        contains = self._index.contains(keywords)
+
+        def shared_words(i):
+            return [word for word, found in zip(keywords, contains(i)) if found]
+
+        return shared_words
+
+    def _rec_list(self, rel_index, query, words, rec_type, min_relevancy, top_k=None, ids=None):
+        """Returns a RecList ranking the calls with relevancy greater than min_relevancy.
+
+        Only the top_k most relevant calls are selected up front, and their CallRec objects and rec_info strings are
+        built when the list is first looked at rather than here.  If ids is provided, rel_index only holds the
+        relevancy of the calls at ids, which must be in increasing order.
+        """
 
-        # Associates each call with a relevance score
-        words = []
-        tokenizer = nltk.tokenize.toktok.ToktokTokenizer()
-        for word in tokenizer.tokenize(title):
-            if word not in words and word not in STOPWORDS and word.isalpha():
-                words.append(word)
+        calls = self.calls
+        shared_words = self._shared_words(list(words)) if rec_type == "keyword" else lambda i: None
 
-        index_zip = zip(self.calls, self.relevance(words))
+        def make_rec(i, rel):
+            return CallRec(calls[i], rel, rec_type, words, self._rec_info(query, rec_type, shared_words(i)))
 
-        # Finds sufficiently relevant calls and places the resulting CallRec object in rec_list
-        for call, rel in index_zip:
-            if rel > min_relevancy:
-                # Makes a brief summary
-                ret_str = "Based on the abstract beginning title " + title + "."
-                rec = CallRec(call, rel, "title", words, ret_str)
-                rec_list.append(rec)
+        if ids is None:
+            ids = np.arange(len(rel_index))
 
-        return RecList(rec_list)
+        relevant = rel_index > min_relevancy
+        return RecList.ranked(ids[relevant], rel_index[relevant], make_rec, top_k)
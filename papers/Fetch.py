@@ -0,0 +1,572 @@
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from . import Stats
+
+# Requests per second allowed to each host by default, in line with the site's robots.txt (Crawl-delay: 10)
+CRAWL_RATE = 0.1
+
+
+class FetchError(RuntimeError):
+    """Raised when a page could not be fetched, after any retries allowed by the RetryPolicy.
+
+    ...
+
+    Attributes
+    ----------
+    url : str
+        the url that could not be fetched
+
+    status : int or None
+        the status code of the last response, None if no response was received
+    """
+
+    def __init__(self, url, reason, status=None):
+        super().__init__("Could not fetch " + url + ": " + reason + ".")
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    """A thread-safe token bucket used to space out requests to a single host.
+
+    Tokens are added at a constant rate up to a maximum of burst, and each request consumes one token.  Requests made
+    while the bucket is empty block until a token becomes available.
+
+    ...
+
+    Attributes
+    ----------
+    rate : float
+        tokens added per second
+
+    burst : int
+        the maximum number of tokens the bucket can hold
+
+    Methods
+    -------
+    acquire : None
+        blocks until a token is available, then consumes it
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            # Sleeping outside the lock lets other threads refill and check the bucket in the meantime
+            time.sleep(wait)
+
+
+class Politeness:
+    """A politeness policy governing how a Fetcher is allowed to access a site.
+
+    ...
+
+    Attributes
+    ----------
+    rate : float or None
+        requests per second allowed to each host, None disables rate limiting
+
+    burst : int
+        the number of requests to a host that may be made back to back before rate applies
+
+    max_in_flight : int
+        the maximum number of requests that may be open at once, across all hosts
+    """
+
+    def __init__(self, rate=CRAWL_RATE, burst=1, max_in_flight=4):
+        """
+        Parameters
+        ----------
+        rate : float or None
+            requests per second allowed to each host, None disables rate limiting; CRAWL_RATE by default, the crawl
+            delay the site's robots.txt asks for, which only a local copy of the site should be crawled faster than
+
+        burst : int
+            the number of requests to a host that may be made back to back before rate applies
+
+        max_in_flight : int
+            the maximum number of requests that may be open at once, across all hosts
+
+        Raises
+        ------
+        RuntimeError
+            If rate, burst or max_in_flight are not positive
+        """
+
+        if (rate is not None and rate <= 0) or burst < 1 or max_in_flight < 1:
+            raise RuntimeError("Politeness expects a positive rate, burst and max_in_flight.")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+
+
+class RetryPolicy:
+    """How a Fetcher times out and retries requests.
+
+    Connection errors, timeouts and responses with a status in retry_statuses are retried up to retries times.  Before
+    each retry the Fetcher waits as long as the site asked in a Retry-After header, or otherwise a random delay of up
+    to backoff * 2 ** attempt seconds (exponential backoff with full jitter, so that workers do not retry in step).
+
+    ...
+
+    Attributes
+    ----------
+    retries : int
+        the number of times a request is retried before giving up
+
+    backoff : float
+        the delay cap, in seconds, of the first retry, doubled for each later one
+
+    max_backoff : float
+        the maximum delay between attempts; a site asking to wait longer than this is given up on
+
+    timeout : float or tuple of float
+        seconds to wait for a connection and for the response, see requests.get
+
+    retry_statuses : tuple of int
+        the status codes that are retried, any other error status fails at once
+
+    Methods
+    -------
+    delay : float
+        seconds to wait before a retry
+    """
+
+    def __init__(self, retries=4, backoff=0.5, max_backoff=60.0, timeout=(10.0, 30.0),
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        """
+        Parameters
+        ----------
+        retries : int
+            the number of times a request is retried before giving up, 0 disables retries
+
+        backoff : float
+            the delay cap, in seconds, of the first retry, doubled for each later one
+
+        max_backoff : float
+            the maximum delay between attempts, in seconds
+
+        timeout : float or tuple of float
+            seconds to wait for a connection and for the response, or a (connect, read) pair
+
+        retry_statuses : tuple of int
+            the status codes that are retried
+
+        Raises
+        ------
+        RuntimeError
+            If retries, backoff or max_backoff are negative
+        """
+
+        if retries < 0 or backoff < 0 or max_backoff < 0:
+            raise RuntimeError("RetryPolicy expects non-negative retries, backoff and max_backoff.")
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retry_statuses = tuple(retry_statuses)
+
+    def delay(self, attempt, retry_after=None):
+        """Returns the seconds to wait before retry number attempt (starting at 0), retry_after if the site sent one."""
+
+        if retry_after is not None:
+            return retry_after
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def retry_after(value):
+    """Returns the seconds to wait asked for by a Retry-After header, given in seconds or as a date, or None."""
+
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, moment.timestamp() - time.time())
+
+
+class CrawlStats:
+    """What a Fetcher has done so far, updated by every request and safe to read while a crawl is running.
+
+    ...
+
+    Attributes
+    ----------
+    requests : int
+        the number of requests sent to the site, retries included
+
+    retries : int
+        the number of requests that were attempts at a failed request
+
+    bytes : int
+        the number of bytes received from the site, compressed if the site compressed them
+
+    cached : int
+        the number of pages answered from the ResponseCache without downloading them again
+
+    request_seconds : float
+        time spent waiting on the site for responses, summed over every worker
+
+    wait_seconds : float
+        time spent sleeping, on the politeness policy's rate limit or between retries, summed over every worker
+
+    failed : dict of str to str
+        the reason each url that could not be fetched or parsed failed, by url
+
+    Methods
+    -------
+    add : None
+        adds to the counts
+
+    fail : None
+        records a url that could not be fetched or parsed
+
+    as_dict : dict
+        the counts as a json-serializable dict
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.bytes = 0
+        self.cached = 0
+        self.request_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.failed = {}
+
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled or copied, the copy gets a lock of its own
+        with self._lock:
+            state = self.__dict__.copy()
+            state["failed"] = dict(self.failed)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, requests=0, retries=0, bytes=0, cached=0, request_seconds=0.0, wait_seconds=0.0):
+        """Adds to the counts."""
+
+        with self._lock:
+            self.requests += requests
+            self.retries += retries
+            self.bytes += bytes
+            self.cached += cached
+            self.request_seconds += request_seconds
+            self.wait_seconds += wait_seconds
+
+    def fail(self, url, reason):
+        """Records that url could not be fetched or parsed, for the reason given."""
+
+        with self._lock:
+            self.failed[url] = reason
+
+    def as_dict(self):
+        """Returns the counts as a json-serializable dict."""
+
+        with self._lock:
+            return dict(requests=self.requests, retries=self.retries, bytes=self.bytes, cached=self.cached,
+                        request_seconds=self.request_seconds, wait_seconds=self.wait_seconds, failed=dict(self.failed))
+
+
+def _received(response):
+    """Returns the number of bytes a response took on the wire, its Content-Length if the site sent one."""
+
+    length = response.headers.get("Content-Length")
+
+    return int(length) if length and length.isdigit() else len(response.content)
+
+
+class Fetcher:
+    """Fetches pages for a CallInstance, concurrently and in line with a politeness policy.
+
+    Listing pages are usually fetched with get, which blocks, while individual call pages are handed to submit so that
+    a small pool of workers can fetch them while the next listing page is being parsed.  Every request waits on a
+    per-host TokenBucket and on a shared limit of requests in flight.
+
+    If a ResponseCache is provided (see Cache.ResponseCache), cached pages are revalidated with conditional requests
+    and fresh ones are returned without touching the network or waiting on the politeness policy.
+
+    Requests go through a single requests.Session, which keeps connections to the site alive and pooled across
+    workers and accepts compressed responses.  Failed requests are retried according to a RetryPolicy, each attempt
+    waiting on the politeness policy again, and a page that still cannot be fetched raises a FetchError rather than
+    handing an error page to the parser.  Counts of requests, retries and bytes are kept in stats, and added to the
+    counters of instrumentation if one is provided, alongside the stages of a CallInstance.
+
+    ...
+
+    Attributes
+    ----------
+    politeness : Politeness
+        the policy used to space out and limit requests
+
+    workers : int
+        the number of worker threads used by submit
+
+    cache : ResponseCache or None
+        the cache responses are stored in and answered from
+
+    retry : RetryPolicy
+        the policy used to time out and retry requests
+
+    stats : CrawlStats
+        what the fetcher has done so far, including the urls that failed
+
+    instrumentation : Stats.Instrumentation
+        where the requests, retries, bytes received and cached pages are counted, see Stats
+
+    session : requests.Session
+        the session requests are sent through, created on first use unless one was provided
+
+    Methods
+    -------
+    get : str
+        fetches a url and returns the text of the response, blocking until it is available
+
+    submit : concurrent.futures.Future
+        schedules a url to be fetched by a worker, the future's result is the text of the response
+
+    close : None
+        waits for scheduled requests to finish and shuts down the workers
+    """
+
+    def __init__(self, politeness=None, workers=None, cache=None, retry=None, session=None, stats=None):
+        """
+        Parameters
+        ----------
+        politeness : Politeness, optional
+            the policy used to space out and limit requests, Politeness() if none is provided
+
+        workers : int, optional
+            the number of worker threads used by submit, defaults to politeness.max_in_flight
+
+        cache : ResponseCache, optional
+            the cache responses are stored in and answered from, nothing is cached if none is provided
+
+        retry : RetryPolicy, optional
+            the policy used to time out and retry requests, RetryPolicy() if none is provided
+
+        session : requests.Session, optional
+            the session requests are sent through, e.g. one shared by several fetchers or with extra headers; a pooled
+            session is created on first use (and closed with the fetcher) if none is provided
+
+        stats : Stats.Instrumentation, optional
+            where the "requests", "retries", "bytes" and "cached" counters are added to, nothing is counted there if
+            not provided
+        """
+
+        self.politeness = politeness or Politeness()
+        self.workers = workers or self.politeness.max_in_flight
+        self.cache = cache
+        self.retry = retry or RetryPolicy()
+        self.stats = CrawlStats()
+        self.instrumentation = stats or Stats.disabled
+
+        self._session = session
+        self._owns_session = session is None
+        self._session_lock = threading.Lock()
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.politeness.max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="papers-fetch")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _add(self, **counts):
+        """Adds to stats, see CrawlStats.add, and to the counters of instrumentation."""
+
+        self.stats.add(**counts)
+        for name in ("requests", "retries", "bytes", "cached"):
+            if counts.get(name):
+                self.instrumentation.count(name, counts[name])
+
+    def _bucket(self, url):
+        """Returns the TokenBucket for the host of url, creating it if necessary."""
+
+        host = urlsplit(url).netloc
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.politeness.rate, self.politeness.burst)
+            return self._buckets[host]
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                # Keeps a connection alive for each request allowed in flight, retries are left to _request
+                adapter = HTTPAdapter(pool_maxsize=self.politeness.max_in_flight, max_retries=0)
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+                self._session.headers["Accept-Encoding"] = "gzip, deflate"
+
+            return self._session
+
+    def _request(self, url, headers=None):
+        """Performs a request once the politeness policy allows it, retrying it as the RetryPolicy allows.
+
+        Raises
+        ------
+        FetchError
+            If every attempt failed with a connection error, a timeout or a status in retry_statuses, or at once if the
+            request failed in a way retrying cannot fix, such as an invalid url, a redirect loop or a body that cannot
+            be decoded
+        """
+
+        import requests
+
+        session = self.session
+        attempt = 0
+        while True:
+            if self.politeness.rate is not None:
+                start = time.perf_counter()
+                self._bucket(url).acquire()
+                self._add(wait_seconds=time.perf_counter() - start)
+
+            wait = None
+            try:
+                with self._in_flight:
+                    start = time.perf_counter()
+                    try:
+                        response = session.get(url, headers=headers, timeout=self.retry.timeout)
+                    finally:
+                        self._add(requests=1, request_seconds=time.perf_counter() - start)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+                reason, status = type(error).__name__, None
+            except requests.RequestException as error:
+                raise FetchError(url, type(error).__name__) from error
+            else:
+                self._add(bytes=_received(response))
+                if response.status_code not in self.retry.retry_statuses:
+                    return response
+
+                reason, status = "HTTP " + str(response.status_code), response.status_code
+                wait = retry_after(response.headers.get("Retry-After"))
+
+            # A site asking to wait longer than max_backoff is given up on rather than waited for
+            if attempt >= self.retry.retries or (wait is not None and wait > self.retry.max_backoff):
+                raise FetchError(url, reason, status)
+
+            delay = self.retry.delay(attempt, wait)
+            time.sleep(delay)
+            attempt += 1
+            self._add(retries=1, wait_seconds=delay)
+
+    @staticmethod
+    def _checked(url, response):
+        """Returns response if it holds a page, raising a FetchError with its status otherwise."""
+
+        if response.status_code >= 400:
+            raise FetchError(url, "HTTP " + str(response.status_code), response.status_code)
+
+        return response
+
+    def get(self, url):
+        """Fetches url and returns the text of the response, blocking until it is available.
+
+        Raises
+        ------
+        FetchError
+            If the page could not be fetched, see RetryPolicy, or if the cache is offline and holds no response for url
+        """
+
+        if self.cache is None:
+            return self._checked(url, self._request(url)).text
+
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self._add(cached=1)
+            return entry.body
+        if self.cache.offline:
+            raise FetchError(url, "the cache is offline and holds no response for it")
+
+        # Asks the site to only send the page again if it changed since it was cached
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._request(url, headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated(url)
+            self._add(cached=1)
+            return entry.body
+
+        self._checked(url, response)
+        self.cache.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.text
+
+    def submit(self, url):
+        """Schedules url to be fetched by a worker and returns a Future for the text of the response."""
+
+        return self._pool.submit(self.get, url)
+
+    def close(self):
+        """Waits for scheduled requests to finish and shuts down the workers, and the session if it was created here."""
+
+        self._pool.shutdown(wait=True)
+        if self._owns_session and self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+# Used by calls that fetch their own page, see shared_fetcher
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_fetcher():
+    """Returns a Fetcher with the default policies shared by everything that is not handed one, created on first use."""
+
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Fetcher()
+
+        return _shared
@@ -0,0 +1,1055 @@
+import collections
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+import scipy.sparse as sp
+
+# The tokens kept by scikit-learn's CountVectorizer by default, used to vectorize queries without importing it
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Source of TfidfIndex.version, shared by every index so that no two fitted models ever have the same version
+_versions = itertools.count(1)
+
+# Statistics of a QueryCache, in the form of functools.lru_cache's cache_info
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class TfidfIndex:
+    """The tf-idf model a CallInstance uses to score calls against a query.
+
+    Holds the vocabulary and idf weights of the model along with the term counts of every call, so that calls can be
+    added and removed later without re-tokenizing the rest of the corpus.  Each row of the index corresponds to one
+    call, in the order of CallInstance.calls.
+
+    The vocabulary is built by scikit-learn's CountVectorizer when the index is fit, but queries are vectorized and
+    weighted here, the same way CountVectorizer and TfidfTransformer would, so that an index loaded from disk can be
+    queried without importing scikit-learn.
+
+    ...
+
+    Attributes
+    ----------
+    vocabulary : dict of str to int
+        the column of each term
+
+    idf : numpy.ndarray
+        the idf weight of each term, computed as TfidfTransformer(smooth_idf=True) would
+
+    vectorizer : sklearn CountVectorizer
+        a CountVectorizer with the index's vocabulary, built when first accessed
+
+    transformer : sklearn TfidfTransformer
+        a TfidfTransformer with the index's idf weights, built when first accessed
+
+    counts : scipy.sparse.csr_matrix
+        term counts of each call, one row per call
+
+    matrix : scipy.sparse.csr_matrix or numpy.ndarray
+        L2-normalized tfidf rows of each call, one row per call, dense only if asked for
+
+    postings : scipy.sparse.csc_matrix
+        the tfidf matrix by term, an inverted index whose columns list the calls containing each term along with their
+        weights, built when first accessed
+
+    dense : bool
+        whether matrix is stored as a dense array
+
+    version : int
+        changes whenever the model or matrices change, and is never shared with another index
+
+    Methods
+    -------
+    fit : None
+        fits the model to a list of documents, replacing the current one
+
+    update : None
+        removes rows from the index and adds documents to it without refitting the vocabulary from scratch
+
+    transform : scipy.sparse matrix
+        tfidf rows of a list of documents, relative to the fitted model
+
+    similarity : numpy.ndarray
+        cosine similarity of a list of documents with every call
+
+    row_similarity : numpy.ndarray
+        cosine similarity of some of the calls with every call
+
+    terms : tuple of str
+        the terms of a document the model knows, in sorted order
+
+    match : tuple of numpy.ndarray
+        the calls sharing a term with a document and their cosine similarity with it, read from the postings
+
+    containing : scipy.sparse.csr_matrix
+        which of a list of terms each call contains
+
+    contains : function
+        which of a list of terms the call at a row contains, as the index is now
+
+    save : None
+        writes the fitted model and matrices to a directory
+
+    load : TfidfIndex
+        reads an index written by save, optionally memory-mapping its matrices
+    """
+
+    def __init__(self, dense=False):
+        """
+        Parameters
+        ----------
+        dense : bool
+            if True, matrix is stored as a dense array, which is only worth it for tiny corpora
+        """
+
+        self.dense = dense
+        self.vocabulary = {}
+        self.idf = None
+
+        self.counts = None
+        self.matrix = None
+
+        self.version = next(_versions)
+
+        self._postings = None
+        self._vectorizer = None
+        self._transformer = None
+
+    def __len__(self):
+        return self.counts.shape[0] if self.counts is not None else 0
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            import sklearn.feature_extraction.text as sci_text
+
+            self._vectorizer = sci_text.CountVectorizer()
+            self._vectorizer.vocabulary_ = self.vocabulary
+        return self._vectorizer
+
+    @property
+    def transformer(self):
+        if self._transformer is None:
+            import sklearn.feature_extraction.text as sci_text
+
+            self._transformer = sci_text.TfidfTransformer(smooth_idf=True, use_idf=True)
+            self._transformer.idf_ = self.idf
+        return self._transformer
+
+    @property
+    def postings(self):
+        if self._postings is None:
+            self._postings = sp.csc_matrix(self.matrix)
+        return self._postings
+
+    def fit(self, docs):
+        """Fits the model to docs, a list of space separated keyword strings, replacing the current one."""
+
+        import sklearn.feature_extraction.text as sci_text
+
+        self._vectorizer = sci_text.CountVectorizer()
+        self.counts = self._vectorizer.fit_transform(docs).tocsr()
+        self.vocabulary = self._vectorizer.vocabulary_
+        self._reweight()
+
+    def update(self, keep, docs):
+        """Removes rows from the index and adds documents to it.
+
+        Only docs are tokenized; terms new to the vocabulary are appended to it and terms no longer used by any call are
+        dropped, so that scores are the same as if the model had been fit from scratch.  The idf weights depend on the
+        whole corpus and are recomputed from the stored counts.
+
+        Parameters
+        ----------
+        keep : list of int
+            the rows to keep, in their new order
+
+        docs : list of str
+            space separated keyword strings to add, placed before the kept rows to follow the site's newest first order
+        """
+
+        vocabulary = self.vocabulary
+        for doc in docs:
+            for term in TOKEN_PATTERN.findall(doc.lower()):
+                if term not in vocabulary:
+                    vocabulary[term] = len(vocabulary)
+
+        old = self.counts[keep]
+        old = sp.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], len(vocabulary)))
+        counts = sp.vstack([self._count(docs), old]).tocsr()
+
+        # Drops the terms that no call uses anymore
+        used = np.flatnonzero(counts.getnnz(axis=0))
+        if len(used) < len(vocabulary):
+            columns = {column: new for new, column in enumerate(used)}
+            self.vocabulary = {term: columns[column] for term, column in vocabulary.items() if column in columns}
+            counts = counts[:, used]
+
+        if self._vectorizer is not None:
+            self._vectorizer.vocabulary_ = self.vocabulary
+
+        self.counts = counts
+        self._reweight()
+
+    def _columns(self):
+        """Returns a function mapping a term to its column, or to None if the model does not know it."""
+
+        return self.vocabulary.get
+
+    def _count(self, docs):
+        """Returns the term counts of docs as CountVectorizer.transform would, ignoring terms not in the vocabulary."""
+
+        column_of = self._columns()
+        indptr = [0]
+        indices = []
+        data = []
+        for doc in docs:
+            doc_counts = {}
+            for term in TOKEN_PATTERN.findall(doc.lower()):
+                column = column_of(term)
+                if column is not None:
+                    doc_counts[column] = doc_counts.get(column, 0) + 1
+
+            indices.extend(doc_counts)
+            data.extend(doc_counts.values())
+            indptr.append(len(indices))
+
+        counts = sp.csr_matrix((np.asarray(data, dtype=np.int64), np.asarray(indices, dtype=np.int32), indptr),
+                               shape=(len(docs), self._width()))
+        counts.sort_indices()
+
+        return counts
+
+    def _width(self):
+        """Returns the number of columns of the model."""
+
+        return len(self.vocabulary)
+
+    def _document_frequency(self):
+        """Returns the number of calls containing each term."""
+
+        return np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+
+    def _weigh(self, counts):
+        """Returns the L2-normalized tfidf rows of counts, as TfidfTransformer.transform would."""
+
+        # Scaled in place rather than multiplied by a diagonal matrix, which would be n_features long for a HashedIndex
+        weighted = sp.csr_matrix(counts, dtype=np.float64, copy=True)
+        weighted.data *= self.idf[weighted.indices]
+
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        weighted.data /= np.repeat(norms, np.diff(weighted.indptr))
+
+        return weighted
+
+    def _reweight(self):
+        """Recomputes the idf weights and the tfidf matrix from the stored counts."""
+
+        # Smoothed idf, as if a document containing every term once had been added
+        document_frequency = self._document_frequency()
+        self.idf = np.log((self.counts.shape[0] + 1) / (document_frequency + 1)) + 1
+        if self._transformer is not None:
+            self._transformer.idf_ = self.idf
+
+        self.matrix = self._weigh(self.counts)
+        if self.dense:
+            self.matrix = self.matrix.toarray()
+        self._postings = None
+        self.version = next(_versions)
+
+    def terms(self, doc):
+        """Returns the terms of doc that are in the vocabulary, repeats included, in sorted order.
+
+        The tfidf row of doc only depends on these, so two documents with the same terms score every call the same.
+        """
+
+        vocabulary = self.vocabulary
+        return tuple(sorted(term for term in TOKEN_PATTERN.findall(doc.lower()) if term in vocabulary))
+
+    def transform(self, docs):
+        """Returns the tfidf rows of docs, a list of space separated keyword strings, relative to the fitted model."""
+
+        return self._weigh(self._count(docs))
+
+    def similarity(self, docs, rows=None):
+        """Returns the cosine similarity of each of docs with every call, as an array of shape (len(docs), len(self)).
+
+        Both the calls' rows and the rows of docs are L2-normalized, so cosine similarity is their dot product and a
+        sparse matrix product is all it takes.  If rows is provided, only the calls at rows are scored and the array
+        has a column per entry of rows.
+        """
+
+        queries = self.transform(docs)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if self.dense:
+            return queries @ matrix.T
+
+        return (queries @ matrix.T).toarray()
+
+    def row_similarity(self, rows):
+        """Returns the cosine similarity of the calls at rows with every call, an array with a row per entry of rows.
+
+        Computed as a sparse product with the postings, so the cost depends on how many calls share terms with rows.
+        """
+
+        if self.dense:
+            return self.matrix[rows] @ self.matrix.T
+
+        return (self.matrix[rows] @ self.postings.T).toarray()
+
+    def match(self, doc):
+        """Returns the calls sharing at least one term with doc and their cosine similarity with it.
+
+        Only the postings of doc's terms are read, so the cost depends on how many calls contain them rather than on the
+        size of the corpus.  Calls left out have a similarity of 0.
+
+        Parameters
+        ----------
+        doc : str
+            a space separated keyword string
+
+        Returns
+        -------
+        ids : numpy.ndarray of int
+            the rows of the calls sharing a term with doc, in increasing order
+
+        similarity : numpy.ndarray of float
+            the cosine similarity of doc with each of ids
+        """
+
+        query = self.transform([doc])
+        hits = self.postings[:, query.indices]
+        ids = np.unique(hits.indices)
+
+        return ids, (hits @ query.data)[ids]
+
+    def containing(self, terms):
+        """Returns a csr matrix with a row per call and a column per term, nonzero where the call contains the term.
+
+        Terms missing from the vocabulary get an empty column.
+        """
+
+        known = [i for i, term in enumerate(terms) if term in self.vocabulary]
+        found = self.postings[:, [self.vocabulary[terms[i]] for i in known]].tocoo()
+
+        return sp.csr_matrix((found.data, (found.row, np.asarray(known, dtype=np.intp)[found.col])),
+                             shape=(len(self), len(terms)))
+
+    def contains(self, terms):
+        """Returns a function giving, for a row, whether the call at that row contains each of terms.
+
+        The columns of terms and the tfidf matrix are read when contains is called, and update replaces rather than
+        modifies the matrix, so the function keeps answering for the index as it was, even once it is updated and
+        rows have moved.  Each row is only looked at when asked for.
+        """
+
+        column_of = self._columns()
+        columns = [column_of(term) for term in terms]
+        matrix = self.matrix
+
+        def contained(row):
+            if self.dense:
+                return [column is not None and matrix[row, column] != 0 for column in columns]
+
+            found = set(matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist())
+            return [column in found for column in columns]
+
+        return contained
+
+    def save(self, path):
+        """Writes the fitted model and matrices to the directory path.
+
+        The vocabulary is stored as a json list ordered by column and the idf weights as a .npy file.  Both matrices are
+        stored in raw CSR layout, as .npy files of their data, indices and indptr arrays; since the tfidf array is the
+        normalized, weighted counts array, the two share their indices and indptr.
+        """
+
+        terms = [None] * len(self.vocabulary)
+        for term, column in self.vocabulary.items():
+            terms[column] = term
+
+        with open(os.path.join(path, "vocabulary.json"), "w", encoding="utf-8") as fh:
+            json.dump(terms, fh)
+
+        self._save_matrices(path)
+
+    def _save_matrices(self, path):
+        """Writes the idf weights and both matrices to the directory path, see save."""
+
+        tfidf = sp.csr_matrix(self.matrix)
+        counts = self.counts.tocsr()
+        counts.sort_indices()
+        tfidf.sort_indices()
+
+        np.save(os.path.join(path, "idf.npy"), self.idf)
+        np.save(os.path.join(path, "indices.npy"), counts.indices)
+        np.save(os.path.join(path, "indptr.npy"), counts.indptr)
+        np.save(os.path.join(path, "counts.npy"), counts.data)
+        np.save(os.path.join(path, "tfidf.npy"), tfidf.data)
+
+    @classmethod
+    def load(cls, path, mmap=True, dense=False):
+        """Reads an index written by save from the directory path.
+
+        Parameters
+        ----------
+        path : str
+            the directory the index was saved in
+
+        mmap : bool
+            if True, the matrices are memory-mapped read-only instead of read into memory, so that several processes
+            loading the same index share its pages
+
+        dense : bool
+            if True, the tfidf matrix is read into a dense array, see constructor
+
+        Returns
+        -------
+        index : TfidfIndex
+            the loaded index
+        """
+
+        with open(os.path.join(path, "vocabulary.json"), encoding="utf-8") as fh:
+            terms = json.load(fh)
+
+        index = cls(dense=dense)
+        index.vocabulary = {term: column for column, term in enumerate(terms)}
+        index._load_matrices(path, mmap)
+
+        return index
+
+    def _load_matrices(self, path, mmap=True):
+        """Reads the idf weights and both matrices written by _save_matrices, see load."""
+
+        mode = "r" if mmap else None
+        self.idf = np.load(os.path.join(path, "idf.npy"))
+
+        indices = np.load(os.path.join(path, "indices.npy"), mmap_mode=mode)
+        indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode=mode)
+        shape = (len(indptr) - 1, self._width())
+        self.counts = sp.csr_matrix((np.load(os.path.join(path, "counts.npy"), mmap_mode=mode), indices, indptr),
+                                    shape=shape, copy=False)
+        self.matrix = sp.csr_matrix((np.load(os.path.join(path, "tfidf.npy"), mmap_mode=mode), indices, indptr),
+                                    shape=shape, copy=False)
+        if self.dense:
+            self.matrix = self.matrix.toarray()
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _hash(term):
+    """Returns a hash of term that, unlike hash, is the same in every process."""
+
+    return zlib.crc32(term.encode("utf-8"))
+
+
+class HashedIndex(TfidfIndex):
+    """A TfidfIndex whose terms are hashed into a fixed number of columns instead of being kept in a vocabulary.
+
+    Memory used by the model is bounded by n_features whatever the size of the corpus, and the document frequency of
+    each column is accumulated as documents come in, so the index can be fit to a stream of documents a chunk at a
+    time and updated without rebuilding anything.  Terms that hash to the same column are counted together, which is
+    rare as long as n_features is well above the number of distinct terms of the corpus.
+
+    Columns no call uses are left out of queries, the way terms missing from a vocabulary are, so scores match a
+    TfidfIndex fit to the same documents unless terms collide.  Hashed terms cannot be turned back into words, so
+    there is no vocabulary, vectorizer or transformer.
+
+    ...
+
+    Attributes
+    ----------
+    n_features : int
+        the number of columns terms are hashed into
+
+    document_frequency : numpy.ndarray of int
+        the number of calls containing a term of each column
+
+    Methods
+    -------
+    fit : None
+        fits the model to any iterable of documents, consumed a chunk at a time
+    """
+
+    def __init__(self, n_features=2 ** 20, dense=False):
+        """
+        Parameters
+        ----------
+        n_features : int
+            the number of columns terms are hashed into
+
+        dense : bool
+            see TfidfIndex
+        """
+
+        super().__init__(dense=dense)
+        self.n_features = n_features
+        self.document_frequency = np.zeros(n_features, dtype=np.int64)
+
+    @property
+    def vectorizer(self):
+        raise RuntimeError("HashedIndex hashes its terms and has no vectorizer.")
+
+    @property
+    def transformer(self):
+        raise RuntimeError("HashedIndex hashes its terms and has no transformer.")
+
+    def fit(self, docs, chunk_size=1024):
+        """Fits the model to docs, any iterable of space separated keyword strings, consumed chunk_size at a time."""
+
+        docs = iter(docs)
+        document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        parts = [sp.csr_matrix((0, self.n_features), dtype=np.int64)]
+        while True:
+            chunk = list(itertools.islice(docs, chunk_size))
+            if not chunk:
+                break
+
+            counts = self._count(chunk)
+            document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+            parts.append(counts)
+
+        self.document_frequency = document_frequency
+        self.counts = sp.vstack(parts).tocsr()
+        self._reweight()
+
+    def update(self, keep, docs):
+        """Removes rows from the index and adds documents to it, see TfidfIndex.update.
+
+        Only the document frequencies of the removed rows and of docs are counted, nothing is refit.
+        """
+
+        removed = np.ones(len(self), dtype=bool)
+        removed[keep] = False
+        added = self._count(docs)
+
+        document_frequency = self.document_frequency - np.bincount(self.counts[removed].indices,
+                                                                   minlength=self.n_features)
+        self.document_frequency = document_frequency + np.bincount(added.indices, minlength=self.n_features)
+        self.counts = sp.vstack([added, self.counts[keep]]).tocsr()
+        self._reweight()
+
+    def _columns(self):
+        n_features = self.n_features
+
+        return lambda term: _hash(term) % n_features
+
+    def _width(self):
+        return self.n_features
+
+    def _document_frequency(self):
+        return self.document_frequency
+
+    def terms(self, doc):
+        """Returns the terms of doc that hash to a column some call uses, repeats included, in sorted order."""
+
+        column_of = self._columns()
+        document_frequency = self.document_frequency
+
+        return tuple(sorted(term for term in TOKEN_PATTERN.findall(doc.lower()) if document_frequency[column_of(term)]))
+
+    def transform(self, docs):
+        """Returns the tfidf rows of docs, leaving out the columns no call uses."""
+
+        counts = self._count(docs)
+        counts.data[self.document_frequency[counts.indices] == 0] = 0
+        counts.eliminate_zeros()
+
+        return self._weigh(counts)
+
+    def containing(self, terms):
+        """Returns a csr matrix with a row per call and a column per term, nonzero where the call contains the term.
+
+        A call is reported as containing a term if it contains any term hashing to the same column.
+        """
+
+        column_of = self._columns()
+        found = self.postings[:, [column_of(term) for term in terms]].tocoo()
+
+        return sp.csr_matrix((found.data, (found.row, found.col)), shape=(len(self), len(terms)))
+
+    def save(self, path):
+        """Writes the fitted model and matrices to the directory path, see TfidfIndex.save.
+
+        n_features is stored in hashed.json and the document frequencies as a .npy file, in place of the vocabulary.
+        """
+
+        with open(os.path.join(path, "hashed.json"), "w", encoding="utf-8") as fh:
+            json.dump(dict(n_features=self.n_features), fh)
+
+        np.save(os.path.join(path, "document_frequency.npy"), self.document_frequency)
+        self._save_matrices(path)
+
+    @classmethod
+    def load(cls, path, mmap=True, dense=False):
+        """Reads an index written by save from the directory path, see TfidfIndex.load."""
+
+        with open(os.path.join(path, "hashed.json"), encoding="utf-8") as fh:
+            settings = json.load(fh)
+
+        index = cls(settings["n_features"], dense=dense)
+        index.document_frequency = np.load(os.path.join(path, "document_frequency.npy"))
+        index._load_matrices(path, mmap)
+
+        return index
+
+
+class LsaIndex(TfidfIndex):
+    """A TfidfIndex scoring calls in a low-rank semantic space (latent semantic analysis) rather than by shared terms.
+
+    The tfidf matrix is projected onto its top n_components singular vectors (a truncated SVD), and each call is kept
+    as a unit length float32 embedding, one row of a contiguous array.  A query is weighted as usual, projected the
+    same way and scored against every call with a single dense matrix-vector product, whose cost depends on
+    n_components rather than on the vocabulary.  Calls sharing no term with a query can still score well when they use
+    related terms, so short titles find more than their exact lemmas.
+
+    The tfidf matrix is kept alongside the embeddings for update and for the terms calls share with a query.  The
+    projection is computed by scikit-learn when the index is fit or updated, but loading and querying only use numpy.
+
+    ...
+
+    Attributes
+    ----------
+    n_components : int
+        the number of dimensions of the semantic space, fewer if the corpus is too small
+
+    components : numpy.ndarray of float32
+        the projection, one row per dimension and a column per term
+
+    embeddings : numpy.ndarray of float32
+        the unit length embedding of each call, one row per call
+
+    Methods
+    -------
+    embed : numpy.ndarray
+        unit length embeddings of a list of documents
+    """
+
+    def __init__(self, n_components=256, dense=False):
+        """
+        Parameters
+        ----------
+        n_components : int
+            the number of dimensions of the semantic space
+
+        dense : bool
+            see TfidfIndex
+        """
+
+        super().__init__(dense=dense)
+        self.n_components = n_components
+        self.components = None
+        self.embeddings = None
+
+    def _reweight(self):
+        """Recomputes the idf weights, the tfidf matrix and the projection from the stored counts."""
+
+        super()._reweight()
+
+        # A truncated SVD has at most one dimension fewer than the smaller side of the matrix
+        n_components = max(1, min(self.n_components, min(self.matrix.shape) - 1))
+        if not min(self.matrix.shape):
+            self.components = np.zeros((n_components, self.matrix.shape[1]), dtype=np.float32)
+            self.embeddings = np.zeros((self.matrix.shape[0], n_components), dtype=np.float32)
+            return
+
+        from sklearn.utils.extmath import randomized_svd
+
+        u, sigma, vt = randomized_svd(sp.csr_matrix(self.matrix), n_components, random_state=0)
+        self.components = np.ascontiguousarray(vt, dtype=np.float32)
+        self.embeddings = self._normalized(u * sigma)
+
+    @staticmethod
+    def _normalized(vectors):
+        """Returns vectors scaled to unit length as a contiguous float32 array, rows of zeros are left as they are."""
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+
+        return np.ascontiguousarray(vectors / norms)
+
+    def embed(self, docs):
+        """Returns the unit length embeddings of docs, a list of space separated keyword strings."""
+
+        return self._normalized(self.transform(docs) @ self.components.T)
+
+    def similarity(self, docs, rows=None):
+        """Returns the cosine similarity of each of docs with every call in the semantic space, see TfidfIndex."""
+
+        embeddings = self.embeddings if rows is None else self.embeddings[rows]
+
+        return (self.embed(docs) @ embeddings.T).astype(np.float64)
+
+    def row_similarity(self, rows):
+        """Returns the cosine similarity of the calls at rows with every call in the semantic space, see TfidfIndex."""
+
+        return self.embeddings[rows] @ self.embeddings.T
+
+    def match(self, doc):
+        """Returns every call and its similarity with doc, since calls sharing no term with doc are scored too."""
+
+        return np.arange(len(self)), self.similarity([doc])[0]
+
+    def save(self, path):
+        """Writes the fitted model and matrices to the directory path, see TfidfIndex.save.
+
+        The projection and the embeddings are stored as .npy files, n_components in lsa.json.
+        """
+
+        super().save(path)
+        with open(os.path.join(path, "lsa.json"), "w", encoding="utf-8") as fh:
+            json.dump(dict(n_components=self.n_components), fh)
+
+        np.save(os.path.join(path, "components.npy"), self.components)
+        np.save(os.path.join(path, "embeddings.npy"), self.embeddings)
+
+    @classmethod
+    def load(cls, path, mmap=True, dense=False):
+        """Reads an index written by save from the directory path, memory-mapping the embeddings too if mmap is True."""
+
+        index = super().load(path, mmap=mmap, dense=dense)
+        with open(os.path.join(path, "lsa.json"), encoding="utf-8") as fh:
+            index.n_components = json.load(fh)["n_components"]
+
+        index.components = np.load(os.path.join(path, "components.npy"))
+        index.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None)
+
+        return index
+
+
+class NeighborIndex:
+    """The k most similar calls to each call of a TfidfIndex, along with their cosine similarity.
+
+    Computing the similarity of every call with every other call takes a matrix the size of the corpus squared, so it
+    is computed a block of rows at a time (see TfidfIndex.row_similarity), each block holding at most block_bytes of
+    scores, and only the k best of each row are kept.  Memory is bounded by block_bytes whatever the size of the
+    corpus, and the lists take 8 bytes per call and neighbor.
+
+    Lists can be updated as calls are added and removed (see update): the new calls' lists are computed against every
+    call, and each kept call's list is merged with the new calls that are more similar than its current neighbors.
+    Scores between kept calls are not recomputed, so they keep the idf weights they were computed with until build is
+    called again.
+
+    ...
+
+    Attributes
+    ----------
+    k : int
+        the number of neighbors kept for each call
+
+    block_bytes : int
+        the size of the blocks of scores computed at once
+
+    ids : numpy.ndarray of int32
+        the neighbors of each call, best first, one row per call; -1 where a call has fewer than k neighbors
+
+    scores : numpy.ndarray of float32
+        the cosine similarity of each of ids with its call, -inf where ids is -1
+
+    version : int or None
+        the version of the index the lists were computed or last updated from, see TfidfIndex.version
+
+    Methods
+    -------
+    build : None
+        computes the lists of every call of an index
+
+    update : None
+        removes calls from the lists and adds new ones, without computing the lists of the other calls again
+
+    neighbors : tuple of numpy.ndarray
+        the neighbors of one call and their similarity with it
+
+    pairs : tuple of numpy.ndarray
+        every pair of calls at least as similar as a threshold, e.g. to find calls that were posted twice
+
+    save : None
+        writes the lists to a directory
+
+    load : NeighborIndex
+        reads lists written by save
+    """
+
+    def __init__(self, k=20, block_bytes=2 ** 26):
+        """
+        Parameters
+        ----------
+        k : int
+            the number of neighbors kept for each call
+
+        block_bytes : int
+            the size of the blocks of scores computed at once, bounds the memory used while computing lists
+        """
+
+        self.k = k
+        self.block_bytes = block_bytes
+        self.ids = np.empty((0, k), dtype=np.int32)
+        self.scores = np.empty((0, k), dtype=np.float32)
+        self.version = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _blocks(self, index, rows):
+        """Yields the position in rows of each block of rows and the similarity of its calls with every call.
+
+        The similarity of each call with itself is set to -inf, so a call is never its own neighbor.
+        """
+
+        rows = np.asarray(rows, dtype=np.intp)
+        block = max(1, self.block_bytes // (8 * max(len(index), 1)))
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            similarity = np.asarray(index.row_similarity(chunk), dtype=np.float32)
+            similarity[np.arange(len(chunk)), chunk] = -np.inf
+            yield start, similarity
+
+    def _best(self, ids, scores):
+        """Returns the k best of scores in each row and their ids, best first, padded with -1 and -inf."""
+
+        if scores.shape[1] > self.k:
+            best = np.argpartition(-scores, self.k - 1, axis=1)[:, :self.k]
+            ids, scores = np.take_along_axis(ids, best, axis=1), np.take_along_axis(scores, best, axis=1)
+        elif scores.shape[1] < self.k:
+            padding = self.k - scores.shape[1]
+            ids = np.pad(ids, ((0, 0), (0, padding)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, padding)), constant_values=-np.inf)
+
+        order = np.argsort(-scores, axis=1, kind="stable")
+        ids, scores = np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+        ids = np.where(np.isneginf(scores), -1, ids)
+
+        return ids.astype(np.int32), scores.astype(np.float32)
+
+    def _lists(self, index, rows):
+        """Returns the lists of the calls at rows, computed against every call of index."""
+
+        ids = np.empty((len(rows), self.k), dtype=np.int32)
+        scores = np.empty((len(rows), self.k), dtype=np.float32)
+        columns = np.arange(len(index), dtype=np.int32)
+        for start, similarity in self._blocks(index, rows):
+            stop = start + len(similarity)
+            ids[start:stop], scores[start:stop] = self._best(np.broadcast_to(columns, similarity.shape), similarity)
+
+        return ids, scores
+
+    def build(self, index):
+        """Computes the lists of every call of index, replacing the current ones."""
+
+        self.ids, self.scores = self._lists(index, np.arange(len(index)))
+        self.version = index.version
+
+    def update(self, index, keep, n_new):
+        """Removes calls from the lists and adds new ones, after the same change was made to index with its update.
+
+        Parameters
+        ----------
+        index : TfidfIndex
+            the index once updated, whose first n_new rows are the new calls and whose other rows are the kept ones
+
+        keep : list of int
+            the rows of the calls kept, in their new order, as passed to TfidfIndex.update
+
+        n_new : int
+            the number of calls added
+        """
+
+        keep = np.asarray(keep, dtype=np.intp)
+
+        # Kept neighbors are renumbered, removed ones leave a hole in the lists holding them; the extra last position
+        # keeps the existing holes, whose id of -1 reads it
+        position = np.full(len(self.ids) + 1, -1, dtype=np.int32)
+        position[keep] = n_new + np.arange(len(keep), dtype=np.int32)
+        old_ids = self.ids[keep]
+        ids = position[old_ids]
+        scores = np.where(ids >= 0, self.scores[keep], -np.inf).astype(np.float32)
+        lost = np.flatnonzero(((ids < 0) & (old_ids >= 0)).any(axis=1))
+
+        # The new calls' lists, and the new calls each kept call is now closer to than to its current neighbors
+        new_ids = np.empty((n_new, self.k), dtype=np.int32)
+        new_scores = np.empty((n_new, self.k), dtype=np.float32)
+        columns = np.arange(len(index), dtype=np.int32)
+        for start, similarity in self._blocks(index, np.arange(n_new)):
+            stop = start + len(similarity)
+            new_ids[start:stop], new_scores[start:stop] = self._best(np.broadcast_to(columns, similarity.shape),
+                                                                     similarity)
+            candidates = np.broadcast_to(np.arange(start, stop, dtype=np.int32), (len(keep), len(similarity)))
+            ids, scores = self._best(np.hstack([ids, candidates]),
+                                     np.hstack([scores, similarity[:, n_new:].T]))
+
+        # A call that lost a neighbor may have had others just out of its list, so its list is computed again
+        if len(lost):
+            ids[lost], scores[lost] = self._lists(index, n_new + lost)
+
+        self.ids = np.vstack([new_ids, ids])
+        self.scores = np.vstack([new_scores, scores])
+        self.version = index.version
+
+    def neighbors(self, row):
+        """Returns the neighbors of the call at row, best first, and their cosine similarity with it."""
+
+        ids = self.ids[row]
+        found = ids >= 0
+
+        return ids[found].astype(np.intp), self.scores[row][found].astype(np.float64)
+
+    def pairs(self, threshold=0.9):
+        """Returns every pair of calls whose cosine similarity is at least threshold, most similar first.
+
+        Each pair is given once, as the rows (i, j) of its calls with i < j.  Only pairs in the lists are found, which
+        is every such pair as long as no call has more than k neighbors above threshold.
+
+        Returns
+        -------
+        first, second : numpy.ndarray of int
+            the rows of the calls of each pair
+
+        similarity : numpy.ndarray of float
+            the cosine similarity of each pair
+        """
+
+        rows, columns = np.nonzero(self.scores >= threshold)
+        first = np.minimum(rows, self.ids[rows, columns])
+        second = np.maximum(rows, self.ids[rows, columns])
+        unique, at = np.unique(first.astype(np.int64) * max(len(self), 1) + second, return_index=True)
+        similarity = self.scores[rows, columns][at].astype(np.float64)
+        order = np.argsort(-similarity, kind="stable")
+
+        return first[at][order].astype(np.intp), second[at][order].astype(np.intp), similarity[order]
+
+    def save(self, path):
+        """Writes the lists to the directory path as neighbor_ids.npy and neighbor_scores.npy, k in neighbors.json."""
+
+        with open(os.path.join(path, "neighbors.json"), "w", encoding="utf-8") as fh:
+            json.dump(dict(k=self.k, block_bytes=self.block_bytes), fh)
+
+        np.save(os.path.join(path, "neighbor_ids.npy"), self.ids)
+        np.save(os.path.join(path, "neighbor_scores.npy"), self.scores)
+
+    @classmethod
+    def load(cls, path, version=None):
+        """Reads lists written by save from the directory path, as computed from the index at version."""
+
+        with open(os.path.join(path, "neighbors.json"), encoding="utf-8") as fh:
+            neighbors = cls(**json.load(fh))
+
+        neighbors.ids = np.load(os.path.join(path, "neighbor_ids.npy"))
+        neighbors.scores = np.load(os.path.join(path, "neighbor_scores.npy"))
+        neighbors.version = version
+
+        return neighbors
+
+
+class QueryCache:
+    """A bounded cache of query results computed from a TfidfIndex, least recently used results are dropped first.
+
+    Every result is stored along with the version of the index it was computed from, and the whole cache is emptied
+    as soon as it is asked about a newer version, so results never outlive a refit or an update of the index.  Cached
+    arrays are made read-only, since they are handed out to every caller asking for the same query.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        the maximum number of results kept, 0 disables the cache
+
+    hits : int
+        the number of lookups answered from the cache
+
+    misses : int
+        the number of lookups that were not
+
+    Methods
+    -------
+    get : tuple or None
+        the result cached for a key and index version
+
+    put : None
+        stores a result
+
+    info : CacheInfo
+        hit and miss counts along with the size of the cache
+
+    clear : None
+        drops every result
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._version = None
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled or copied, and a copy starts with no results since it may outlive the index
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_version"] = None
+        state["_results"] = collections.OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def _check(self, version):
+        """Empties the cache if version is not the one its results were computed from, the caller holds the lock."""
+
+        if version != self._version:
+            self._results.clear()
+            self._version = version
+
+    def get(self, key, version):
+        """Returns the result stored for key if it was computed from the index at version, None otherwise."""
+
+        with self._lock:
+            self._check(version)
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, version, result):
+        """Stores result, a tuple of arrays (or None), for key as computed from the index at version."""
+
+        if not self.maxsize:
+            return
+
+        for array in result:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+
+        with self._lock:
+            self._check(version)
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def info(self):
+        """Returns the hit and miss counts of the cache along with its size, as a CacheInfo."""
+
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._results))
+
+    def clear(self):
+        """Drops every result, the hit and miss counts are kept."""
+
+        with self._lock:
+            self._results.clear()
@@ -0,0 +1,153 @@
+import lxml.etree
+import lxml.html
+
+
+def _has_class(name):
+    """Returns an XPath predicate matching elements with name among their classes, as BeautifulSoup's class_ does."""
+
+    return "contains(concat(' ', normalize-space(@class), ' '), ' " + name + " ')"
+
+
+def _field(name, path):
+    """Returns an XPath to the element at path within the first field of class name below the context element."""
+
+    return lxml.etree.XPath("(.//*[" + _has_class(name) + "])[1]" + path, smart_strings=False)
+
+
+# Text of an element as BeautifulSoup's get_text returns it, which leaves out scripts, styles, templates and ruby text
+TEXT = lxml.etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template or ancestor::rt or "
+                        "ancestor::rp)]", smart_strings=False)
+
+# Articles of a listing page, one per call
+LISTING_ARTICLES = lxml.etree.XPath("//div[" + _has_class("views-row") + "]/descendant::article[1]")
+
+# Fields of an article on a listing page, each one the equivalent of the chain of finds Call used to make
+SOURCE_LINK = lxml.etree.XPath("(((.//header)[1]//h2)[1]//a)[1]")
+UPDATED = _field("field-name-field-cfp-updated", "/descendant::*[" + _has_class("field-items") + "][1]/"
+                                                 "descendant::div[1]/descendant::span[1]")
+CONTACT = _field("field-name-field-cfp-contact-name", "/descendant::*[" + _has_class("field-items") + "][1]/"
+                                                      "descendant::div[1]")
+DEADLINE = _field("field-name-field-cfp-due-date", "/descendant::*[" + _has_class("field-items") + "][1]/"
+                                                   "descendant::div[1]/descendant::span[1]")
+DESCRIPTION = _field("field-name-field-cfp-content", "/descendant::*[" + _has_class("field-items") + "][1]/"
+                                                     "descendant::div[1]")
+
+# Fields of a call's individual page
+LONG_DESC = _field("field-name-field-cfp-content", "")
+CATEGORIES = _field("field-name-field-cfp-categories", "/descendant::div[1]//div")
+CONTACT_EMAIL = _field("field-type-email", "/descendant::a[1]/@href")
+
+
+class ParseError(RuntimeError):
+    """Raised when a page cannot be parsed, or does not have the markup of the call for papers site."""
+
+
+def _document(html):
+    """Returns the parsed document of html.
+
+    Raises
+    ------
+    ParseError
+        If lxml cannot parse html, e.g. because it is empty
+    """
+
+    try:
+        return lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError) as error:
+        raise ParseError("Page could not be parsed: " + str(error) + ".") from error
+
+
+def text(element):
+    """Returns the text of element, as BeautifulSoup's get_text would."""
+
+    return "".join(TEXT(element))
+
+
+def _first(xpath, element):
+    """Returns the first match of xpath below element.
+
+    Raises
+    ------
+    ParseError
+        If nothing matches, which means the page does not have the markup of the call for papers site
+    """
+
+    matches = xpath(element)
+    if not matches:
+        raise ParseError("Page is missing the element at " + xpath.path + ".")
+    return matches[0]
+
+
+def listing_articles(html):
+    """Returns the article element of each call on a listing page, in the order they are listed.
+
+    Parameters
+    ----------
+    html : str
+        the html of a listing page
+
+    Returns
+    -------
+    articles : list of lxml.html.HtmlElement
+        one article per call, to be passed on to Call
+    """
+
+    if not html.strip():
+        return []
+
+    return LISTING_ARTICLES(_document(html))
+
+
+def listing_fields(article):
+    """Returns the fields of a call found in its article on a listing page.
+
+    Only the elements holding the fields are visited, through precompiled XPath expressions, instead of searching the
+    whole article once per field.
+
+    Parameters
+    ----------
+    article : lxml.html.HtmlElement
+        an article returned by listing_articles
+
+    Returns
+    -------
+    fields : dict
+        the source, href (relative to the listing page), updated, contact, deadline and description of the call
+    """
+
+    link = _first(SOURCE_LINK, article)
+
+    return dict(source=text(link), href=link.get("href"), updated=text(_first(UPDATED, article)),
+                contact=text(_first(CONTACT, article)), deadline=text(_first(DEADLINE, article)),
+                description=text(_first(DESCRIPTION, article)))
+
+
+def detail_fields(html):
+    """Returns the fields of a call found on its individual page.
+
+    Parameters
+    ----------
+    html : str
+        the html of the page found at a call's source_link
+
+    Returns
+    -------
+    fields : dict
+        the long_desc, categories (a list of str) and contact_email of the call
+
+    Raises
+    ------
+    ParseError
+        If the page cannot be parsed or is missing one of the fields
+    """
+
+    page = _document(html)
+
+    return dict(long_desc=text(_first(LONG_DESC, page)), categories=[text(div) for div in CATEGORIES(page)],
+                contact_email=_first(CONTACT_EMAIL, page))
+
+
+def to_html(article):
+    """Returns the markup of article as a str."""
+
+    return lxml.html.tostring(article, encoding=str, with_tail=False)
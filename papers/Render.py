@@ -0,0 +1,196 @@
+import collections
+import threading
+from html import escape
+
+# Formats a RecList can be rendered to, see render
+FORMATS = ("markdown", "html", "records")
+
+# Maximum number of rendered calls kept by the shared FragmentCache
+FRAGMENT_CACHE_SIZE = 2 ** 15
+
+
+def truncated(text, length):
+    """Returns text cut to at most length characters at a word boundary, followed by "..." if anything was cut."""
+
+    if length is None or len(text) <= length:
+        return text
+
+    cut = text[:length]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+
+    return cut.rstrip() + "..."
+
+
+class FragmentCache:
+    """A bounded cache of rendered calls, shared by every RecList.
+
+    Everything about a recommendation except its relevancy depends only on the call, so each call is rendered once per
+    set of options and kept as the text before and after the relevancy.  A call is identified by its source_link and
+    updated time, so a call that was updated on the site is rendered anew.  The least recently used fragments are
+    dropped once maxsize is reached.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        the maximum number of fragments kept
+
+    hits : int
+        the number of fragments found in the cache
+
+    misses : int
+        the number of fragments that had to be rendered
+
+    Methods
+    -------
+    get : tuple of str
+        the text before and after the relevancy of a rendered call
+
+    clear : None
+        drops every fragment
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._fragments = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def get(self, call, fmt="markdown", show_full_desc=True, truncate=None):
+        """Returns the text before and after the relevancy of call rendered to fmt, rendering it if necessary.
+
+        Parameters
+        ----------
+        call : Call
+            the call to render
+
+        fmt : str
+            "markdown" or "html"
+
+        show_full_desc : bool
+            if False, the description is left out
+
+        truncate : int, optional
+            the maximum number of characters of the description shown, all of them if not provided
+        """
+
+        key = (call.source_link, call.updated, fmt, show_full_desc, truncate)
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+
+        fragment = (markdown_fragment if fmt == "markdown" else html_fragment)(call, show_full_desc, truncate)
+
+        with self._lock:
+            self.misses += 1
+            self._fragments[key] = fragment
+            if len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+
+        return fragment
+
+    def clear(self):
+        """Drops every fragment."""
+
+        with self._lock:
+            self._fragments.clear()
+
+
+def markdown_fragment(call, show_full_desc=True, truncate=None):
+    """Returns the markdown before and after the relevancy of a recommendation of call, see FragmentCache.get."""
+
+    head = "### " + call.source + "\n" + "relevancy: "
+    tail = " | deadline: " + call.deadline + " | updated: " + call.updated + "\n\n"
+    if show_full_desc:
+        tail += truncated(call.description, truncate) + "\n\n"
+    tail += "\n\n" + "[contact email](" + call.contact_email + ") | " + "[call page](" + call.source_link + ")" + "\n\n"
+
+    return head, tail
+
+
+def html_fragment(call, show_full_desc=True, truncate=None):
+    """Returns the html before and after the relevancy of a recommendation of call, see FragmentCache.get."""
+
+    head = '<div class="call">\n<h3>' + escape(call.source) + "</h3>\n<p>relevancy: "
+    tail = " | deadline: " + escape(call.deadline) + " | updated: " + escape(call.updated) + "</p>\n"
+    if show_full_desc:
+        tail += "<p>" + escape(truncated(call.description, truncate)) + "</p>\n"
+    tail += ('<p><a href="' + escape(call.contact_email) + '">contact email</a> | <a href="' +
+             escape(call.source_link) + '">call page</a></p>\n</div>\n')
+
+    return head, tail
+
+
+def record(rec, show_full_desc=True, truncate=None):
+    """Returns a recommendation as a json-serializable dict of plain values."""
+
+    call = rec.call
+    description = truncated(call.description, truncate) if show_full_desc else None
+
+    return dict(source=call.source, source_link=call.source_link, relevancy=float(rec.relevancy),
+                deadline=call.deadline, due_date=call.due_date.isoformat() if call.due_date else None,
+                updated=call.updated, description=description, contact_email=call.contact_email,
+                categories=list(call.categories or ()), rec_type=rec.rec_type, rec_info=rec.rec_info)
+
+
+# Shared by every RecList, so that a call appearing in several lists is only rendered once
+fragments = FragmentCache()
+
+
+def render(recs, fmt="markdown", show_full_desc=True, truncate=None, cache=None):
+    """Renders a sequence of recommendations, joining the rendered calls once.
+
+    Parameters
+    ----------
+    recs : iterable of CallRec
+        the recommendations to render, in order
+
+    fmt : str
+        * markdown : a str of markdown, as RecList.show displays
+        * html     : a str of html
+        * records  : a list of dicts, see record
+
+    show_full_desc : bool
+        if False, descriptions are left out
+
+    truncate : int, optional
+        the maximum number of characters of each description shown, all of them if not provided
+
+    cache : FragmentCache, optional
+        where rendered calls are looked up and stored, the shared fragments if not provided
+
+    Returns
+    -------
+    rendered : str or list of dict
+        the rendered recommendations
+
+    Raises
+    ------
+    RuntimeError
+        If fmt is not one of FORMATS
+    """
+
+    if fmt not in FORMATS:
+        raise RuntimeError("Fmt expects one of " + ", ".join(FORMATS) + " but " + str(fmt) + " was found.")
+
+    if fmt == "records":
+        return [record(rec, show_full_desc, truncate) for rec in recs]
+
+    if cache is None:
+        cache = fragments
+    parts = []
+    for rec in recs:
+        head, tail = cache.get(rec.call, fmt, show_full_desc, truncate)
+        parts += (head, str(float(rec.relevancy))[:4], tail)
+
+    return "".join(parts)
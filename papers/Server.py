@@ -0,0 +1,372 @@
+import collections
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .Calls import CallInstance
+
+# Recommender used by each kind of query, see CallInstance.REC_TYPES
+RECOMMENDERS = dict(keyword="keyword_recommend", title="title_recommend", abstract="abstract_recommend")
+
+# Largest request body accepted, an abstract is a few kilobytes
+MAX_BODY_BYTES = 2 ** 20
+
+# Filters a query may set, passed on to the recommender as they are
+FILTERS = ("open_only", "categories", "category_match", "exclude_categories")
+
+# An instance along with when and in which order it was swapped in, read as one object by each query
+Generation = collections.namedtuple("Generation", ["instance", "number", "loaded"])
+
+
+class QueryError(RuntimeError):
+    """Raised when a query sent to the server cannot be answered, answered with 400 Bad Request."""
+
+
+class RecommendationServer:
+    """Answers recommendation queries over a local HTTP JSON API, from a snapshot written by CallInstance.save.
+
+    The snapshot is loaded once and queries are answered from it by a thread per connection, without any lock around
+    scoring.  Each query reads the current generation once and uses its instance throughout, so a refresh or reload
+    never changes calls and the tfidf model under a query: a refresh loads a private copy of the snapshot, refreshes
+    it, saves it and only then swaps it in, and queries still running on the old instance finish on it.
+
+    The API is:
+
+        GET  /health                      the number of calls, generation and index of the current instance
+        GET  /stats                       the stages and counters of the server's instrumentation, see Stats
+        POST /recommend/<kind>            recommendations for a query, kind being keyword, title or abstract
+        POST /refresh                     starts a refresh in the background, see refresh
+
+    A query is a json object holding "query" (a list of keywords or a str) and optionally "top_k", "offset",
+    "min_relevancy", "show_full_desc", "truncate", "open_only", "due_after", "due_before" (ISO dates), "categories",
+    "category_match" and "exclude_categories", see CallInstance.keyword_recommend.  The recommendations are returned
+    as records, see Render.record.  Errors are returned as {"error": message}.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        the snapshot directory queries are answered from, and refreshes are saved to
+
+    current : Generation
+        the instance queries are answered from, its generation number and when it was swapped in
+
+    address : tuple
+        the host and port the server listens on
+
+    stats : Stats.Instrumentation or None
+        shared by every instance the server loads, if provided
+
+    last_error : str or None
+        the error that ended the last refresh or reload, None if it succeeded
+
+    Methods
+    -------
+    recommend : dict
+        answers a query as the API does
+
+    swap : Generation
+        makes an instance current
+
+    reload : Generation
+        loads the snapshot again, e.g. once another process has saved it
+
+    refresh : Generation
+        adds new calls to a copy of the current instance and swaps it in
+
+    serve_forever : None
+        handles requests until shutdown is called
+
+    start : RecommendationServer
+        handles requests in a background thread
+
+    shutdown : None
+        stops handling requests and refreshing
+    """
+
+    def __init__(self, path, host="127.0.0.1", port=8000, refresh_interval=None, fetcher=None, normalizer=None,
+                 stats=None):
+        """
+        Parameters
+        ----------
+        path : str
+            a snapshot directory written by CallInstance.save
+
+        host : str
+            the address to listen on, only the local machine by default
+
+        port : int
+            the port to listen on, any free port if 0
+
+        refresh_interval : float, optional
+            seconds between background refreshes, none are made if not provided
+
+        fetcher : Fetcher, optional
+            used to request the site's pages when refreshing, a Fetcher with the default politeness policy is created
+            for each refresh if not provided
+
+        normalizer : Normalizer, optional
+            used by every instance loaded, see CallInstance
+
+        stats : Stats.Instrumentation, optional
+            where the stages of loading, refreshing and querying every instance are timed and counted
+        """
+
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.fetcher = fetcher
+        self.normalizer = normalizer
+        self.stats = stats
+        self.last_error = None
+
+        # Refreshes and reloads are made one at a time, queries never wait for them
+        self._swap_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.current = None
+        self.swap(self._load())
+
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._httpd.server_address[:2]
+
+    def _load(self):
+        """Returns the instance in the snapshot at path, using the server's normalizer and stats."""
+
+        instance = CallInstance.load(self.path)
+        if self.normalizer is not None:
+            instance.normalizer = self.normalizer
+        if self.stats is not None:
+            instance.stats = self.stats
+
+        return instance
+
+    def swap(self, instance):
+        """Makes instance the one new queries are answered from and returns its generation.
+
+        Queries already running keep the instance they started with.
+        """
+
+        number = self.current.number + 1 if self.current else 1
+        self.current = Generation(instance, number, datetime.datetime.now().isoformat(timespec="seconds"))
+
+        return self.current
+
+    def reload(self):
+        """Loads the snapshot at path again and swaps it in, returning its generation."""
+
+        with self._swap_lock:
+            return self.swap(self._load())
+
+    def refresh(self, drop_overdue=False, max_pages=None):
+        """Adds the calls posted since the snapshot was taken and swaps in the refreshed instance.
+
+        The refresh is made on a fresh copy of the snapshot, which is saved back to path before being swapped in, so
+        the instance being queried is never modified and the snapshot always matches the current instance.
+
+        Parameters
+        ----------
+        drop_overdue, max_pages : optional
+            see CallInstance.refresh
+
+        Returns
+        -------
+        generation : Generation
+            the generation of the refreshed instance
+        """
+
+        with self._swap_lock:
+            instance = self._load()
+            instance.refresh(drop_overdue, self.fetcher, max_pages)
+            instance.save(self.path)
+
+            return self.swap(instance)
+
+    def _refresh_quietly(self):
+        """Refreshes, keeping the error that ended the refresh in last_error rather than raising it."""
+
+        try:
+            self.refresh()
+        except Exception as e:
+            self.last_error = type(e).__name__ + ": " + str(e)
+        else:
+            self.last_error = None
+
+    def _refresh_periodically(self):
+        while not self._stopped.wait(self.refresh_interval):
+            self._refresh_quietly()
+
+    def recommend(self, kind, query):
+        """Returns the recommendations for a query as the API does, see the class docstring for its fields.
+
+        Raises
+        ------
+        QueryError
+            If kind is not a recommender, or query is missing or has a field of the wrong type
+        """
+
+        if kind not in RECOMMENDERS:
+            raise QueryError("Kind expects one of " + ", ".join(RECOMMENDERS) + " but " + str(kind) + " was found.")
+        if not isinstance(query, dict) or "query" not in query:
+            raise QueryError("Recommend expects a json object with a query but " + repr(query)[:100] + " was found.")
+
+        text = query["query"]
+        if kind == "keyword" and not (isinstance(text, list) and all(isinstance(word, str) for word in text)):
+            raise QueryError("Keyword queries expect a list of str but " + repr(text)[:100] + " was found.")
+        if kind != "keyword" and not isinstance(text, str):
+            raise QueryError(kind.capitalize() + " queries expect a str but " + repr(text)[:100] + " was found.")
+
+        kwargs = {name: query[name] for name in FILTERS if name in query}
+        for name in ("due_after", "due_before"):
+            if query.get(name) is not None:
+                try:
+                    kwargs[name] = datetime.date.fromisoformat(query[name])
+                except (TypeError, ValueError):
+                    raise QueryError(name.capitalize() + " expects an ISO date but " + repr(query[name])[:100] +
+                                     " was found.")
+
+        if query.get("category_match", "any") not in ("any", "all"):
+            raise QueryError("Category_match expects any or all but " + repr(query["category_match"])[:100] +
+                             " was found.")
+
+        for name in ("categories", "exclude_categories"):
+            value = query.get(name)
+            if not (value is None or isinstance(value, str) or
+                    isinstance(value, list) and all(isinstance(category, str) for category in value)):
+                raise QueryError(name.capitalize() + " expects a str or a list of str but " + repr(value)[:100] +
+                                 " was found.")
+
+        min_relevancy = query.get("min_relevancy", 0.3)
+        if isinstance(min_relevancy, bool) or not isinstance(min_relevancy, (int, float)):
+            raise QueryError("Min_relevancy expects a number but " + repr(min_relevancy)[:100] + " was found.")
+
+        for name in ("open_only", "show_full_desc"):
+            if not isinstance(query.get(name, False), bool):
+                raise QueryError(name.capitalize() + " expects a bool but " + repr(query[name])[:100] + " was found.")
+
+        truncate = query.get("truncate")
+        if truncate is not None and (isinstance(truncate, bool) or not isinstance(truncate, int) or truncate < 0):
+            raise QueryError("Truncate expects a non-negative int but " + repr(truncate)[:100] + " was found.")
+
+        top_k = query.get("top_k", 10)
+        offset = query.get("offset", 0)
+        if any(isinstance(value, bool) or not isinstance(value, int) or value < 0 for value in (top_k, offset)):
+            raise QueryError("Top_k and offset expect non-negative int but " + repr(top_k) + " and " + repr(offset) +
+                             " were found.")
+
+        # Everything below uses this generation, whatever is swapped in meanwhile
+        generation = self.current
+        recommender = getattr(generation.instance, RECOMMENDERS[kind])
+        rec_list = recommender(text, min_relevancy=min_relevancy, top_k=top_k + offset, **kwargs)
+        results = rec_list.render(show_only_open=False, show_full_desc=query.get("show_full_desc", True), limit=top_k,
+                                  offset=offset, truncate=truncate, fmt="records")
+
+        return dict(generation=generation.number, total=rec_list.total, results=results)
+
+    def health(self):
+        """Returns the number of calls, generation and index of the current instance, and the last refresh error."""
+
+        generation = self.current
+        return dict(status="ok", calls=len(generation.instance.calls), generation=generation.number,
+                    loaded=generation.loaded, index=type(generation.instance._index).__name__,
+                    last_error=self.last_error)
+
+    def serve_forever(self):
+        """Handles requests, and refreshes every refresh_interval seconds if set, until shutdown is called."""
+
+        if self.refresh_interval:
+            self._background(self._refresh_periodically)
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Handles requests in a background thread, returning the server; see serve_forever."""
+
+        self._background(self.serve_forever)
+        return self
+
+    def _background(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+
+        return thread
+
+    def shutdown(self):
+        """Stops handling requests and refreshing, and closes the socket."""
+
+        self._stopped.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _handler(server):
+    """Returns the request handler class of server, see RecommendationServer for the API."""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Lets clients keep connections alive between queries, answering each at once rather than after a delayed ack
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            route = urlsplit(self.path).path
+            if route == "/health":
+                self._reply(200, server.health())
+            elif route == "/stats":
+                self._reply(200, server.stats.as_dict() if server.stats is not None else {})
+            else:
+                self._reply(404, dict(error="No route for GET " + route + "."))
+
+        def do_POST(self):
+            route = urlsplit(self.path).path
+            try:
+                query = self._body()
+                if route.startswith("/recommend/"):
+                    self._reply(200, server.recommend(route[len("/recommend/"):], query))
+                elif route == "/refresh":
+                    server._background(server._refresh_quietly)
+                    self._reply(202, dict(status="refreshing", generation=server.current.number))
+                else:
+                    self._reply(404, dict(error="No route for POST " + route + "."))
+            except QueryError as e:
+                self._reply(400, dict(error=str(e)))
+            except Exception as e:
+                self._reply(500, dict(error=type(e).__name__ + ": " + str(e)))
+
+        def _body(self):
+            value = self.headers.get("Content-Length") or "0"
+            try:
+                length = int(value)
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY_BYTES:
+                # The body is left unread, so the connection cannot be used for another request
+                self.close_connection = True
+                raise QueryError("Queries expect a Content-Length from 0 to " + str(MAX_BODY_BYTES) + " bytes but " +
+                                 repr(value)[:100] + " was found.")
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                raise QueryError("Queries expect a json body but malformed json was found.")
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
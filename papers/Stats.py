@@ -0,0 +1,194 @@
+import contextlib
+import math
+import threading
+import time
+
+# Number of latency buckets kept by each stage, bucket i counts durations under 2 ** (i + 1) microseconds
+HISTOGRAM_BUCKETS = 28
+
+# Handed out by stage when instrumentation is disabled, so that timing a stage costs a method call and nothing else
+_NOT_TIMED = contextlib.nullcontext()
+
+
+class Instrumentation:
+    """Timers and counters for the stages of scraping, fitting and querying a CallInstance.
+
+    Stages are timed with stage, as a context manager, and events are counted with count.  Each stage keeps its count,
+    total and maximum duration along with a histogram of durations in power of two buckets, which is how query
+    latencies are reported.  Callbacks added with subscribe are called as each stage ends and each count is made,
+    with "stage" or "count" as their kind, e.g. to forward them to a metrics system.
+
+    A disabled instance records nothing and its stage and count return at once, so instrumented code costs next to
+    nothing until it is enabled.  Stages may be timed from several threads at once.
+
+    ...
+
+    Attributes
+    ----------
+    enabled : bool
+        whether stages and counts are recorded
+
+    stages : dict of str to dict
+        count, total_seconds, max_seconds and histogram of each stage timed so far
+
+    counters : dict of str to int
+        the value of each counter
+
+    Methods
+    -------
+    stage : context manager
+        times a stage
+
+    record : None
+        records the duration of a stage timed elsewhere
+
+    count : None
+        adds to a counter
+
+    subscribe : None
+        adds a callback called with each stage and count
+
+    profile : context manager
+        captures a cProfile profile of the code it wraps
+
+    as_dict : dict
+        every stage and counter, json-serializable
+
+    reset : None
+        drops everything recorded so far
+    """
+
+    def __init__(self, enabled=True):
+        """
+        Parameters
+        ----------
+        enabled : bool
+            whether stages and counts are recorded, can be changed later
+        """
+
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled or copied, the copy gets a lock of its own; callbacks are kept, so they must be
+        # picklable for the instance to be
+        with self._lock:
+            state = self.__dict__.copy()
+            state["stages"] = {name: dict(stage, histogram=list(stage["histogram"]))
+                               for name, stage in self.stages.items()}
+            state["counters"] = dict(self.counters)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Returns a context manager timing the code it wraps as stage name."""
+
+        if not self.enabled:
+            return _NOT_TIMED
+
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """Records that stage name took seconds, for stages timed outside of stage."""
+
+        if not self.enabled:
+            return
+
+        bucket = min(HISTOGRAM_BUCKETS - 1, max(0, int(math.log2(max(seconds, 1e-9) * 1e6))))
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = dict(count=0, total_seconds=0.0, max_seconds=0.0,
+                                                 histogram=[0] * HISTOGRAM_BUCKETS)
+            stage["count"] += 1
+            stage["total_seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            stage["histogram"][bucket] += 1
+
+        for callback in self._callbacks:
+            callback("stage", name, seconds)
+
+    def count(self, name, n=1):
+        """Adds n to counter name."""
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+        for callback in self._callbacks:
+            callback("count", name, n)
+
+    def subscribe(self, callback):
+        """Adds callback, called as callback(kind, name, value) with each stage and count.
+
+        Stages are passed as ("stage", name, seconds) and counts as ("count", name, n).  Callbacks are called from the
+        thread that timed the stage or made the count.
+        """
+
+        self._callbacks.append(callback)
+
+    @contextlib.contextmanager
+    def profile(self, path=None):
+        """Captures a cProfile profile of the code it wraps, such as a single build or query.
+
+        Yields the cProfile.Profile, which can be printed with pstats once the block is over, and writes it to path for
+        tools such as snakeviz if path is provided.  Profiling slows the code down and works whether or not the
+        instrumentation is enabled.
+        """
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            if path:
+                profiler.dump_stats(path)
+
+    def as_dict(self):
+        """Returns every stage and counter recorded so far as a json-serializable dict.
+
+        The histogram of each stage is given as a dict from the upper bound of each nonempty bucket, in seconds, to the
+        number of durations in it.
+        """
+
+        with self._lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                histogram = {str(2 ** (i + 1) / 1e6): n for i, n in enumerate(stage["histogram"]) if n}
+                stages[name] = dict(count=stage["count"], total_seconds=stage["total_seconds"],
+                                    mean_seconds=stage["total_seconds"] / stage["count"],
+                                    max_seconds=stage["max_seconds"], histogram=histogram)
+
+            return dict(stages=stages, counters=dict(self.counters))
+
+    def reset(self):
+        """Drops every stage and counter recorded so far, callbacks are kept."""
+
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+
+
+# Used where no Instrumentation is provided, never enable it
+disabled = Instrumentation(enabled=False)
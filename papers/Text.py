@@ -0,0 +1,229 @@
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+# nltk data used by the default lemmatizer, by download id and the path nltk.data.find looks it up with
+NLTK_RESOURCES = {"wordnet": "corpora/wordnet"}
+
+# Setting custom stopwords for nltk processes
+NLTK_STOPWORDS = ["i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself",
+                  "yourselves", "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself",
+                  "they", "them", "their", "theirs", "themselves", "what", "which", "who", "whom", "this", "that",
+                  "these", "those", "am", "is", "are", "was", "were", "be", "been", "being", "have", "has", "had",
+                  "having", "do", "does", "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because", "as",
+                  "until", "while", "of", "at", "by", "for", "with", "about", "against", "between", "into", "through",
+                  "during", "before", "after", "above", "below", "to", "from", "up", "down", "in", "out", "on", "off",
+                  "over", "under", "again", "further", "then", "once", "here", "there", "when", "where", "why", "how",
+                  "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not",
+                  "only", "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should",
+                  "now"]
+
+# Determined somewhat un-scientifically
+CUSTOM_STOPWORDS = ["journal", "publish", "deadline", "open", "access", "submission", "scope", "article", "papers",
+                    "please", "abstract", "submit", "word", "literature", "new", "ha", "study", "panel", "question",
+                    "work", "include", "also", "proposal", "submitted", "topic", "welcome", "limited", "various",
+                    "theme", "send", "address", "author", "conference"]
+
+STOPWORDS = NLTK_STOPWORDS + CUSTOM_STOPWORDS
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_resources(download=False):
+    """Checks that the nltk data needed for lemmatization is installed, downloading what is missing if asked to.
+
+    papers never touches the network for nltk data on its own: this is called without download the first time a
+    Normalizer needs its default lemmatizer, and fails if the data is missing.  Call ensure_resources(download=True)
+    once, as a setup step, to download it.  Once the check succeeds it is not repeated.
+
+    Parameters
+    ----------
+    download : bool
+        if True, missing data is downloaded with nltk.download
+
+    Raises
+    ------
+    RuntimeError
+        If data is missing and download is False, or it could not be downloaded
+    """
+
+    import nltk
+
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if not download:
+                raise RuntimeError("nltk data '" + name + "' is not installed, download it once with "
+                                   "papers.Text.ensure_resources(download=True) where network access is available.")
+            if not nltk.download(name, quiet=True):
+                raise RuntimeError("nltk data '" + name + "' is not installed and could not be downloaded, install "
+                                   "it with nltk.download('" + name + "') where network access is available.")
+
+
+class Normalizer:
+    """Turns text into the keyword lists used to index calls and to query them.
+
+    A single Normalizer is meant to be shared by every Call and CallInstance, since it memoizes the normalization of
+    each distinct token: most tokens in a corpus of calls are repeats, so the lemmatizer only runs once per token.
+
+    ...
+
+    Attributes
+    ----------
+    tokenizer : nltk tokenizer
+        used to split text into tokens
+
+    lemmatizer : nltk lemmatizer
+        used to reduce tokens to stems
+
+    stopwords : frozenset of str
+        words left out of keyword lists
+
+    cache_size : int
+        the maximum number of distinct tokens memoized, for each of the lemmatized and unlemmatized modes
+
+    processes : int or None
+        the number of processes batch spreads its work over, batch runs in the calling process if None
+
+    Methods
+    -------
+    keywords : list of str
+        the keywords of a text
+
+    batch : list of list of str
+        the keywords of many texts
+
+    cache_info : tuple
+        memoization statistics, useful for sizing cache_size
+    """
+
+    def __init__(self, stopwords=STOPWORDS, cache_size=2 ** 16, processes=None, tokenizer=None, lemmatizer=None):
+        """
+        Parameters
+        ----------
+        stopwords : iterable of str
+            words left out of keyword lists
+
+        cache_size : int
+            the maximum number of distinct tokens memoized, for each of the lemmatized and unlemmatized modes
+
+        processes : int, optional
+            the number of processes batch spreads its work over, batch runs in the calling process if not provided
+
+        tokenizer : nltk tokenizer, optional
+            must have a tokenize() method, used to split text into tokens; nltk's ToktokTokenizer if not provided
+
+        lemmatizer : nltk lemmatizer, optional
+            must have a lemmatize() method, used to reduce tokens to stems; nltk's WordNetLemmatizer if not provided
+
+        The default tokenizer and lemmatizer are only made, and nltk only imported, once they are first needed.
+        """
+
+        self.stopwords = frozenset(stopwords)
+        self.cache_size = cache_size
+        self.processes = processes
+
+        self._tokenizer = tokenizer
+        self._lemmatizer = lemmatizer
+        self._make_caches()
+
+    def _make_caches(self):
+        self._stem = functools.lru_cache(maxsize=self.cache_size)(self._stem_uncached)
+        self._word = functools.lru_cache(maxsize=self.cache_size)(self._word_uncached)
+
+    def __getstate__(self):
+        # The memoized functions cannot be pickled, so worker processes start with empty caches of their own
+        state = self.__dict__.copy()
+        del state["_stem"], state["_word"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._make_caches()
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from nltk.tokenize.toktok import ToktokTokenizer
+
+            self._tokenizer = ToktokTokenizer()
+        return self._tokenizer
+
+    @property
+    def lemmatizer(self):
+        if self._lemmatizer is None:
+            from nltk.stem import WordNetLemmatizer
+
+            ensure_resources()
+            self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+
+    def _stem_uncached(self, token):
+        """Returns the lowercased, lemmatized token, or None if it is not a keyword."""
+
+        stem = self.lemmatizer.lemmatize(token.lower())
+        return stem if stem not in self.stopwords and stem.isalpha() else None
+
+    def _word_uncached(self, token):
+        """Returns token as it is, or None if it is not a keyword."""
+
+        return token if token not in self.stopwords and token.isalpha() else None
+
+    def keywords(self, text, lemmatize=True):
+        """Returns the keywords of text, in the order they first appear.
+
+        Parameters
+        ----------
+        text : str
+            the text to take keywords from
+
+        lemmatize : bool
+            if True, tokens are lowercased and lemmatized; if False they are kept as they are
+
+        Returns
+        -------
+        words : list of str
+            tokens of text filtered through stopwords and without duplicates
+        """
+
+        return self._keywords(text, lemmatize)[0]
+
+    def _keywords(self, text, lemmatize=True):
+        """Returns the keywords of text, see keywords, and the number of tokens they were taken from."""
+
+        normalize = self._stem if lemmatize else self._word
+
+        words = []
+        seen = set()
+        n_tokens = 0
+        for n_tokens, token in enumerate(self.tokenizer.tokenize(text), 1):
+            word = normalize(token)
+            if word is not None and word not in seen:
+                seen.add(word)
+                words.append(word)
+
+        return words, n_tokens
+
+    def batch(self, texts, lemmatize=True, chunksize=64, stats=None):
+        """Returns the keywords of each of texts, see keywords.
+
+        If processes is set, texts are split into chunks of chunksize and spread over a pool of that many processes,
+        each with its own memoized tokens.  If stats is provided, the number of tokens normalized is added to its
+        "tokens.lemmatized" counter, or "tokens.kept" if lemmatize is False.
+        """
+
+        if not self.processes or self.processes < 2 or len(texts) <= chunksize:
+            results = [self._keywords(text, lemmatize) for text in texts]
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                results = list(pool.map(functools.partial(self._keywords, lemmatize=lemmatize), texts,
+                                        chunksize=chunksize))
+
+        if stats is not None:
+            stats.count("tokens.lemmatized" if lemmatize else "tokens.kept", sum(n for _, n in results))
+
+        return [words for words, _ in results]
+
+    def cache_info(self):
+        """Returns the memoization statistics of the lemmatized and unlemmatized modes, in that order."""
+
+        return self._stem.cache_info(), self._word.cache_info()
@@ -1,3 +1,10 @@
-from . import Calls
+import importlib
 
-__all__ = ['Calls']
+# Submodules are imported when first accessed, so that importing papers stays fast
+__all__ = ['Calls', 'Cache', 'Fetch', 'Index', 'Parse', 'Render', 'Server', 'Stats', 'Text']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
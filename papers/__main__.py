@@ -0,0 +1,39 @@
+import argparse
+import sys
+
+
+def main(argv=None):
+    """Runs the papers command line, see python -m papers --help."""
+
+    parser = argparse.ArgumentParser(prog="python -m papers", description="Tools for the papers package.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="answer recommendation queries over HTTP from a saved snapshot, see "
+                                              "papers.Server.RecommendationServer")
+    serve.add_argument("snapshot", help="directory written by CallInstance.save")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on, only the local machine by default")
+    serve.add_argument("--port", type=int, default=8000, help="port to listen on")
+    serve.add_argument("--refresh-interval", type=float, metavar="SECONDS",
+                       help="refresh the snapshot from the site in the background this often")
+    serve.add_argument("--stats", action="store_true", help="time and count every stage, reported at GET /stats")
+    args = parser.parse_args(argv)
+
+    from . import Server, Stats
+
+    stats = Stats.Instrumentation() if args.stats else None
+    server = Server.RecommendationServer(args.snapshot, args.host, args.port, args.refresh_interval, stats=stats)
+    host, port = server.address
+    print("Serving " + str(len(server.current.instance.calls)) + " calls on http://" + host + ":" + str(port),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
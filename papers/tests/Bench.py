@@ -0,0 +1,686 @@
+import argparse
+import datetime
+import gc
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .Fixtures import FixtureServer, FixtureSite
+
+# Directory containing the papers package, put on the path of the interpreters started by the benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import-time budgets in seconds; a query-only worker imports papers.Calls and loads a snapshot, so neither may pull in
+# scikit-learn, nltk, BeautifulSoup, requests or IPython
+IMPORT_BUDGETS = {"papers": 0.05, "papers.Calls": 0.5}
+
+# Corpus sizes run by --sizes all, from a quick check to a corpus far larger than the site
+SIZES = (100, 1000, 10000, 100000)
+
+# Host and listing url the calls of fixture pages are parsed as coming from
+FIXTURE_HOST = "http://127.0.0.1"
+FIXTURE_URL = FIXTURE_HOST + "/category/all&page="
+
+
+def import_time(module, runs=5):
+    """Returns the median time taken to import module in a fresh interpreter, in seconds.
+
+    Parameters
+    ----------
+    module : str
+        the module to import
+
+    runs : int
+        the number of fresh interpreters to time the import in
+    """
+
+    code = "import time; start = time.perf_counter(); import " + module + "; print(time.perf_counter() - start)"
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        times.append(float(result.stdout))
+
+    return statistics.median(times)
+
+
+def bench_imports(runs=5):
+    """Times the import of each module in IMPORT_BUDGETS, returning a dict of results by module."""
+
+    results = {}
+    for module, budget in IMPORT_BUDGETS.items():
+        seconds = import_time(module, runs)
+        results[module] = dict(seconds=seconds, budget=budget, within_budget=seconds <= budget)
+
+    return results
+
+
+def fixture_pages(site):
+    """Returns the listing pages of site and a dict of its individual pages by path, saved once to be parsed later."""
+
+    listings = [site.listing_page(page) for page in range((len(site.calls) + site.per_page - 1) // site.per_page)]
+    details = {call["path"]: site.detail_page(call["path"]) for call in site.calls}
+
+    return listings, details
+
+
+def soup_detail_fields(html):
+    """Returns the fields of a call's individual page, found with a full BeautifulSoup tree as Call used to."""
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml')
+
+    return dict(long_desc=soup.find(class_="field-name-field-cfp-content").get_text(),
+                categories=[div.get_text() for div in soup.find(class_="field-name-field-cfp-categories")
+                            .div.find_all('div')],
+                contact_email=soup.find(class_="field-type-email").a.get('href'))
+
+
+def parse_calls(listings, details, parser="lxml", keep_html=False, keep_articles=None):
+    """Returns the Call objects of every call in saved pages, without any requests.
+
+    Parameters
+    ----------
+    listings : list of str
+        the listing pages, see fixture_pages
+
+    details : dict of str to str
+        the individual pages by path, see fixture_pages
+
+    parser : str
+        * lxml : pages are parsed with the Parse module, as CallInstance does
+        * soup : pages are parsed into full BeautifulSoup trees and searched, as Call used to
+
+    keep_html : bool
+        passed on to Call
+
+    keep_articles : list, optional
+        if provided, the article element of each call is appended to it, which keeps the parse trees alive the way
+        Call used to
+    """
+
+    from papers import Parse
+    from papers.Calls import Call
+
+    calls = []
+    for page, html in enumerate(listings):
+        if parser == "soup":
+            from bs4 import BeautifulSoup
+
+            articles = [div.article for div in BeautifulSoup(html, 'lxml')('div')
+                        if 'views-row' in div.get('class', [])]
+        else:
+            articles = Parse.listing_articles(html)
+
+        for article in articles:
+            call = Call(article, base_url=FIXTURE_URL + str(page), fetch=False, keep_html=keep_html)
+            detail = details[call.source_link[len(FIXTURE_HOST):]]
+            if parser == "soup":
+                for field, value in soup_detail_fields(detail).items():
+                    setattr(call, field, value)
+                # Stores the description as a prefix of long_desc, as parse_page does
+                call.description = call.description
+            else:
+                call.parse_page(detail)
+
+            calls.append(call)
+            if keep_articles is not None:
+                keep_articles.append(article)
+
+    return calls
+
+
+def build_calls(site, keep_html=False, keep_articles=None):
+    """Returns the Call objects of every call on site, see parse_calls."""
+
+    listings, details = fixture_pages(site)
+    parser = "lxml" if keep_articles is None else "soup"
+
+    return parse_calls(listings, details, parser, keep_html, keep_articles)
+
+
+class PlainLemmatizer:
+    """Stands in for nltk's WordNetLemmatizer, so that benchmarks do not need the WordNet data."""
+
+    def lemmatize(self, word):
+        return word
+
+
+def fixture_calls(site):
+    """Returns the Call objects of every call on site, made from its fields without parsing any pages."""
+
+    from papers.Calls import Call
+
+    return [Call.from_record(dict(source=call["source"], source_link=FIXTURE_HOST + call["path"],
+                                  updated=call["updated"], contact=call["contact"], deadline=call["deadline"],
+                                  description=call["description"], long_desc=call["long_desc"],
+                                  categories=call["categories"], contact_email="mailto:" + call["email"]))
+            for call in site.calls]
+
+
+def fixture_instance(site, **kwargs):
+    """Returns a CallInstance made of the calls of site, see fixture_calls, with keyword arguments for from_calls."""
+
+    from papers.Calls import CallInstance
+    from papers.Text import Normalizer
+
+    return CallInstance.from_calls(fixture_calls(site), normalizer=Normalizer(lemmatizer=PlainLemmatizer()), **kwargs)
+
+
+def median_time(function, *args, runs=5):
+    """Returns the median time taken by function(*args) over runs calls, in seconds."""
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def latencies(times):
+    """Returns the median, 99th percentile and mean of a list of times in seconds, as a dict."""
+
+    return dict(p50_seconds=float(np.percentile(times, 50)), p99_seconds=float(np.percentile(times, 99)),
+                mean_seconds=statistics.mean(times))
+
+
+def retained_bytes(build):
+    """Returns the result of build() and the bytes still allocated once it returns, measured with tracemalloc."""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = build()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    return result, sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def bench_memory(n_calls=1000):
+    """Measures the memory held per Call on a fixture corpus.
+
+    Compares compact calls with calls made with keep_html, and with calls whose BeautifulSoup articles are kept alive
+    alongside them, which is what every Call used to hold on to.
+    """
+
+    site = FixtureSite(n_calls=n_calls, per_page=50)
+
+    # Imports and parser caches are warmed up first so they are not counted against the calls
+    build_calls(FixtureSite(n_calls=50, per_page=50))
+
+    results = {}
+    for name, keep_html, articles in (("compact", False, None), ("keep_html", True, None), ("soup_trees", False, [])):
+        calls, size = retained_bytes(lambda: build_calls(site, keep_html, articles))
+        results[name] = dict(calls=len(calls), bytes_per_call=size / len(calls))
+        del calls, articles
+
+    return results
+
+
+def bench_scrape(n_calls=1000, max_in_flight=8):
+    """Measures how fast calls are scraped from a FixtureServer, listing and individual pages over local HTTP.
+
+    No politeness delay is applied, so this measures the scraper itself: fetching, parsing and the overlap between
+    listing pages and individual pages.
+    """
+
+    from papers.Calls import iter_calls
+    from papers.Fetch import Fetcher, Politeness
+
+    site = FixtureSite(n_calls=n_calls, per_page=50)
+    with FixtureServer(site) as server:
+        with Fetcher(Politeness(rate=None, max_in_flight=max_in_flight)) as fetcher:
+            start = time.perf_counter()
+            calls = list(iter_calls("calls", n_calls, fetcher, server.base_url))
+            seconds = time.perf_counter() - start
+
+        stats = fetcher.stats.as_dict()
+
+    return dict(calls=len(calls), seconds=seconds, calls_per_second=len(calls) / seconds, requests=stats["requests"],
+                bytes=stats["bytes"], retries=stats["retries"], failed=len(stats["failed"]),
+                connections=server.connections)
+
+
+def bench_fit(n_calls=1000):
+    """Measures the two stages of fitting an instance to a fixture corpus.
+
+    First each call's long description is turned into keywords (see Call.get_long_desc_keywords), then the tfidf index
+    is fit to them.  Lemmatization uses PlainLemmatizer, so WordNet lookups are not part of the keyword time.
+    """
+
+    from papers.Index import TfidfIndex
+    from papers.Text import Normalizer
+
+    calls = fixture_calls(FixtureSite(n_calls=n_calls, per_page=50))
+    normalizer = Normalizer(lemmatizer=PlainLemmatizer())
+
+    start = time.perf_counter()
+    keywords = [call.get_long_desc_keywords(normalizer=normalizer) for call in calls]
+    keywords_seconds = time.perf_counter() - start
+    tokens = sum(len(words) for words in keywords)
+
+    docs = [" ".join(words) for words in keywords]
+    start = time.perf_counter()
+    TfidfIndex().fit(docs)
+    fit_seconds = time.perf_counter() - start
+
+    return dict(calls=len(calls), keywords_seconds=keywords_seconds, tokens=tokens,
+                tokens_per_second=tokens / keywords_seconds, fit_seconds=fit_seconds)
+
+
+def bench_query(n_calls=1000, n_queries=100, batch_size=256, top_k=10):
+    """Measures recommendation latency on a fixture corpus.
+
+    Single keyword, title and abstract queries are timed one at a time with the query cache disabled, so that every
+    query is scored, and batch_recommend is timed on batch_size abstracts.
+    """
+
+    site = FixtureSite(n_calls=n_calls, per_page=50)
+    instance = fixture_instance(site)
+    instance.query_cache.maxsize = 0
+
+    sampled = [site.calls[i % len(site.calls)] for i in range(max(n_queries, batch_size))]
+    titles = [call["source"].split(": ", 1)[1] for call in sampled]
+    queries = dict(keyword=[title.lower().split() for title in titles[:n_queries]], title=titles[:n_queries],
+                   abstract=[call["long_desc"][:400] for call in sampled[:n_queries]])
+    recommenders = dict(keyword=instance.keyword_recommend, title=instance.title_recommend,
+                        abstract=instance.abstract_recommend)
+
+    results = {}
+    for kind, recommend in recommenders.items():
+        times = []
+        for query in queries[kind]:
+            start = time.perf_counter()
+            recommend(query, top_k=top_k).recs
+            times.append(time.perf_counter() - start)
+        results[kind] = latencies(times)
+
+    abstracts = [call["long_desc"][:400] for call in sampled[:batch_size]]
+    start = time.perf_counter()
+    for rec_list in instance.batch_recommend(abstracts, kind="abstract", top_k=top_k):
+        rec_list.recs
+    seconds = time.perf_counter() - start
+    results["batch"] = dict(queries=batch_size, seconds=seconds, seconds_per_query=seconds / batch_size)
+
+    return results
+
+
+def bench_peak(n_calls=1000):
+    """Measures the peak memory allocated while building an instance from fixture calls, and the memory it keeps.
+
+    Measured with tracemalloc, so only allocations made through Python's allocators (numpy and scipy included) count.
+    """
+
+    from papers.Calls import CallInstance
+    from papers.Text import Normalizer
+
+    calls = fixture_calls(FixtureSite(n_calls=n_calls, per_page=50))
+    normalizer = Normalizer(lemmatizer=PlainLemmatizer())
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        instance = CallInstance.from_calls(calls, normalizer=normalizer)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(calls=len(instance.calls), peak_bytes=peak, retained_bytes=retained,
+                peak_bytes_per_call=peak / len(instance.calls))
+
+
+def bench_parse(n_calls=500, runs=3):
+    """Measures how fast saved fixture pages are parsed into calls, with lxml and with full BeautifulSoup trees.
+
+    Both parsers must give every call identical attributes.
+    """
+
+    listings, details = fixture_pages(FixtureSite(n_calls=n_calls, per_page=50))
+    pages = len(listings) + len(details)
+
+    results = {}
+    records = {}
+    for parser in ("soup", "lxml"):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            calls = parse_calls(listings, details, parser)
+            times.append(time.perf_counter() - start)
+
+        records[parser] = [call.to_record() for call in calls]
+        results[parser] = dict(seconds=min(times), pages_per_second=pages / min(times))
+
+    results["lxml"]["speedup"] = results["soup"]["seconds"] / results["lxml"]["seconds"]
+    results["lxml"]["identical"] = records["lxml"] == records["soup"]
+
+    return results
+
+
+def bench_keywords(n_calls=50000, top_k=10):
+    """Measures keyword_recommend on a fixture corpus with a long tail of rare words.
+
+    Compares the time taken to build the top_k recommendations of a query, which only scores the calls in the postings
+    of its keywords, with the time taken to score every call (see CallInstance.relevance).  The query cache is
+    disabled, so that each repetition of a query is scored.
+    """
+
+    site = FixtureSite(n_calls=n_calls, per_page=50, rare_words=20000)
+    instance = fixture_instance(site)
+    instance.query_cache.maxsize = 0
+    rare = site.rare_words
+
+    def recommend(query):
+        return instance.keyword_recommend(query, top_k=top_k).recs
+
+    results = {}
+    for query in ([rare[20], rare[200]], [rare[100], rare[1000]], [rare[2000], rare[5000]], ["war", "law"]):
+        candidates = len(instance._index.match(" ".join(query))[0])
+        results[" ".join(query)] = dict(candidates=candidates, recommend_seconds=median_time(recommend, query),
+                                        score_all_seconds=median_time(instance.relevance, query))
+
+    return results
+
+
+def concat_markdown(recs):
+    """Returns the markdown of the open calls among recs, built the way RecList.show used to."""
+
+    import datetime
+
+    markdown = ""
+    for rec in [rec for rec in recs if rec.call.parse_due_date() > datetime.date.today()]:
+        item = rec.call
+        markdown += "### " + item.source + "\n" \
+                    + "relevancy: " + str(float(rec.relevancy))[:4] \
+                    + " | deadline: " + item.deadline + " | updated: " + item.updated \
+                    + "\n\n" + item.description + "\n\n" \
+                    + "\n\n" + "[contact email](" + item.contact_email + ") | " \
+                    + "[call page](" + item.source_link + ")" + "\n\n"
+
+    return markdown
+
+
+def bench_render(n_calls=20000):
+    """Measures how long a long recommendation list takes to render as markdown.
+
+    Compares the old string concatenation with the first render of a list, a first render of another list whose calls
+    were already rendered, and rendering the same list again.  All must give identical markdown.
+    """
+
+    from papers import Render
+
+    instance = fixture_instance(FixtureSite(n_calls=n_calls, per_page=50))
+    Render.fragments.clear()
+
+    # Recommendations are built before timing, so that only rendering is measured
+    rec_list = instance.title_recommend("war law poetry", min_relevancy=0)
+    recs = rec_list.recs
+    concat = median_time(concat_markdown, recs, runs=3)
+    expected = concat_markdown(recs)
+
+    start = time.perf_counter()
+    first = rec_list.render()
+    first_seconds = time.perf_counter() - start
+
+    # A different query over the same calls, whose fragments are now cached
+    rec_list = instance.title_recommend("war law", min_relevancy=0)
+    rec_list.recs
+    start = time.perf_counter()
+    rec_list.render()
+    cached_seconds = time.perf_counter() - start
+
+    return dict(recommendations=len(recs), concat_seconds=concat,
+                render=dict(first_seconds=first_seconds, cached_fragments_seconds=cached_seconds,
+                            repeat_seconds=median_time(rec_list.render), identical=first == expected))
+
+
+def matrix_bytes(matrix):
+    """Returns the bytes held by the arrays of a dense or sparse matrix."""
+
+    if isinstance(matrix, np.ndarray):
+        return matrix.nbytes
+
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def bench_lsa(n_calls=20000, n_components=256, top_k=10, n_queries=50):
+    """Measures the LSA index mode (see Index.LsaIndex) against exact tfidf scoring on a fixture corpus.
+
+    Compares the time taken to fit each index and to score a short query against every call, the memory held by the
+    tfidf matrix and by the embeddings and projection, and the recall of the LSA top_k among the exact top_k.
+    """
+
+    site = FixtureSite(n_calls=n_calls, per_page=50, rare_words=5000)
+    queries = [" ".join(call["source"].split(": ", 1)[1].lower().split()) for call in site.calls[:n_queries]]
+
+    results = {}
+    scores = {}
+    for name, kwargs in (("exact", {}), ("lsa", dict(n_components=n_components))):
+        start = time.perf_counter()
+        index = fixture_instance(site, **kwargs)._index
+        fit_seconds = time.perf_counter() - start
+
+        def score_all():
+            return [index.similarity([query])[0] for query in queries]
+
+        scores[name] = score_all()
+        memory = (index.embeddings.nbytes + index.components.nbytes if name == "lsa" else matrix_bytes(index.matrix))
+        results[name] = dict(fit_seconds=fit_seconds, seconds_per_query=median_time(score_all, runs=3) / len(queries),
+                             bytes=memory)
+
+    def top(similarity):
+        return set(np.argpartition(-similarity, top_k)[:top_k].tolist())
+
+    recall = [len(top(exact) & top(lsa)) / top_k for exact, lsa in zip(scores["exact"], scores["lsa"])]
+    results["lsa"].update(n_components=n_components, recall_at_k=statistics.mean(recall), top_k=top_k)
+
+    return results
+
+
+def bench_neighbors(n_calls=10000, k=20, n_queries=100, new_fraction=0.01):
+    """Measures the neighbor lists behind similar_calls (see Index.NeighborIndex) on a fixture corpus.
+
+    Times computing the lists of every call, a similar_calls query against an abstract_recommend of the same call's
+    description (what finding similar calls took before), and adding new_fraction of the corpus to the lists against
+    computing them again, along with the share of neighbors the update agrees on with the recomputed lists.
+    """
+
+    from papers.Calls import CallInstance
+    from papers.Index import NeighborIndex
+    from papers.Text import Normalizer
+
+    calls = fixture_calls(FixtureSite(n_calls=n_calls, per_page=50))
+    n_new = max(1, int(n_calls * new_fraction))
+    instance = CallInstance.from_calls(calls[n_new:], normalizer=Normalizer(lemmatizer=PlainLemmatizer()))
+    instance.query_cache.maxsize = 0
+
+    start = time.perf_counter()
+    neighbors = instance._neighbor_index(k)
+    build_seconds = time.perf_counter() - start
+
+    rows = [i * len(instance.calls) // n_queries for i in range(n_queries)]
+    times = dict(similar=[], abstract=[])
+    for row in rows:
+        start = time.perf_counter()
+        instance.similar_calls(row, top_k=10).recs
+        times["similar"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        instance.abstract_recommend(instance.calls[row].long_desc, top_k=10).recs
+        times["abstract"].append(time.perf_counter() - start)
+
+    # Adds the newest calls the way refresh does
+    index = instance._index
+    index.update(list(range(len(instance.calls))), instance._desc_lists(calls[:n_new]))
+    start = time.perf_counter()
+    neighbors.update(index, list(range(len(instance.calls))), n_new)
+    update_seconds = time.perf_counter() - start
+
+    rebuilt = NeighborIndex(k)
+    start = time.perf_counter()
+    rebuilt.build(index)
+    rebuild_seconds = time.perf_counter() - start
+    agreement = statistics.mean(len(set(a.tolist()) & set(b.tolist())) / k for a, b in zip(neighbors.ids, rebuilt.ids))
+
+    return dict(calls=n_calls, k=k, build_seconds=build_seconds, bytes=neighbors.ids.nbytes + neighbors.scores.nbytes,
+                similar=latencies(times["similar"]), abstract=latencies(times["abstract"]), new_calls=n_new,
+                update_seconds=update_seconds, rebuild_seconds=rebuild_seconds, update_agreement=agreement)
+
+
+def bench_serve(n_calls=1000, concurrency=8, n_requests=2000, top_k=10, swap_interval=0.1):
+    """Measures the latency of queries answered by a RecommendationServer under load, see Load.run.
+
+    The server answers from a snapshot of a fixture corpus, which is reloaded and swapped in every swap_interval
+    seconds while the queries are sent; no query may fail because of it.
+    """
+
+    import tempfile
+    import threading
+
+    from papers.Server import RecommendationServer
+    from papers.Text import Normalizer
+
+    from .Load import fixture_queries, run as load
+
+    instance = fixture_instance(FixtureSite(n_calls=n_calls, per_page=50))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        instance.save(path)
+
+        server = RecommendationServer(path, port=0, normalizer=Normalizer(lemmatizer=PlainLemmatizer()))
+        stopped = threading.Event()
+
+        def swap():
+            while not stopped.wait(swap_interval):
+                server.reload()
+
+        with server:
+            swapper = threading.Thread(target=swap)
+            swapper.start()
+            host, port = server.address
+            try:
+                result = load("http://" + host + ":" + str(port), fixture_queries(), concurrency, n_requests, top_k)
+            finally:
+                stopped.set()
+                swapper.join()
+
+    result["swaps"] = server.current.number - 1
+
+    return result
+
+
+BENCHMARKS = {"fit": bench_fit, "imports": bench_imports, "keywords": bench_keywords, "lsa": bench_lsa,
+              "memory": bench_memory, "neighbors": bench_neighbors, "parse": bench_parse, "peak": bench_peak,
+              "query": bench_query, "render": bench_render, "scrape": bench_scrape, "serve": bench_serve}
+
+
+def environment():
+    """Returns what a run of the benchmarks depends on besides the code: versions, machine and commit."""
+
+    import scipy
+    import sklearn
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return dict(created=datetime.datetime.now().isoformat(timespec="seconds"), commit=commit,
+                python=platform.python_version(), numpy=np.__version__, scipy=scipy.__version__,
+                sklearn=sklearn.__version__, machine=platform.machine(), processor=platform.processor(),
+                cpus=os.cpu_count())
+
+
+def run(names, sizes=None):
+    """Runs the benchmarks in names, each once per corpus size in sizes if it takes n_calls, at its default otherwise.
+
+    Returns a dict of results by benchmark; results of benchmarks run at several sizes are dicts by size.
+    """
+
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name]
+        if sizes and "n_calls" in inspect.signature(benchmark).parameters:
+            results[name] = {str(size): benchmark(n_calls=size) for size in sizes}
+        else:
+            results[name] = benchmark()
+
+    return results
+
+
+def _failures(result):
+    """Yields every dict in result that is over its budget, differs from what it is checked against or had errors."""
+
+    if isinstance(result, dict):
+        if not result.get("within_budget", True) or not result.get("identical", True) or result.get("errors"):
+            yield result
+        for item in result.values():
+            yield from _failures(item)
+
+
+def compare(old, new, path=""):
+    """Returns the ratio new / old of every timing found in both results, by dotted path, > 1 meaning slower."""
+
+    ratios = {}
+    for key, value in new.items():
+        if key not in old:
+            continue
+        name = path + "." + key if path else key
+        if isinstance(value, dict) and isinstance(old[key], dict):
+            ratios.update(compare(old[key], value, name))
+        elif key.endswith("seconds") and isinstance(value, (int, float)) and old[key]:
+            ratios[name] = value / old[key]
+
+    return ratios
+
+
+def main(argv=None):
+    """Runs the benchmarks named on the command line and prints their results as json.
+
+    Exits with status 1 if any result is over its budget or differs from what it is checked against.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks for the papers package.")
+    parser.add_argument("benchmarks", nargs="*", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", metavar="N",
+                        help="corpus sizes to run benchmarks taking n_calls at, or 'all' for " +
+                             ", ".join(map(str, SIZES)) + "; each benchmark's default if not provided")
+    parser.add_argument("--output", help="file to write the results to as well as printing them")
+    parser.add_argument("--compare", metavar="RESULTS", help="results of an earlier run to compare timings with")
+    args = parser.parse_args(argv)
+
+    sizes = list(SIZES) if args.sizes == ["all"] else [int(size) for size in args.sizes or ()]
+    report = dict(environment=environment(), sizes=sizes or None, results=run(args.benchmarks, sizes))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            report["compared_to"] = args.compare
+            report["ratios"] = compare(json.load(fh)["results"], report["results"])
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+
+    return 1 if any(_failures(report["results"])) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
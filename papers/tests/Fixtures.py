@@ -0,0 +1,377 @@
+import datetime
+import gzip
+import hashlib
+import random
+import re
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words used to fill in synthetic descriptions, titles and categories
+WORDS = ["modernism", "race", "gender", "sexuality", "marx", "foucault", "empire", "colonial", "novel", "poetry",
+         "drama", "film", "media", "digital", "archive", "memory", "trauma", "ecology", "environment", "animal",
+         "body", "disability", "labor", "capital", "class", "nation", "migration", "diaspora", "translation",
+         "language", "rhetoric", "pedagogy", "medieval", "renaissance", "romantic", "victorian", "american",
+         "african", "caribbean", "irish", "queer", "feminist", "theory", "history", "religion", "science",
+         "technology", "music", "visual", "culture", "print", "periodical", "narrative", "genre", "comics", "game",
+         "space", "place", "city", "landscape", "war", "violence", "justice", "law", "politics", "ethics"]
+
+CATEGORIES = ["american", "british", "cultural studies and historical approaches", "ecocriticism and environmental "
+              "studies", "gender studies and sexuality", "interdisciplinary", "medieval", "modernist studies",
+              "poetry", "postcolonial", "rhetoric and composition", "theory", "twentieth century and beyond"]
+
+SOURCES = ["Conference", "Journal", "Special Issue", "Panel", "Edited Collection", "Symposium", "Workshop"]
+
+LISTING_PAGE = """<!DOCTYPE html>
+<html><head><title>Call for Papers</title></head>
+<body><div class="view-content">
+{rows}
+</div></body></html>
+"""
+
+LISTING_ROW = """<div class="views-row views-row-{number}">
+<article class="node node-cfp">
+<header><h2><a href="{href}">{source}</a></h2></header>
+<div class="field field-name-field-cfp-updated"><div class="field-items"><div class="field-item even">
+<span class="date-display-single">{updated}</span></div></div></div>
+<div class="field field-name-field-cfp-contact-name"><div class="field-items"><div class="field-item even">{contact}\
+</div></div></div>
+<div class="field field-name-field-cfp-due-date"><div class="field-items"><div class="field-item even">
+<span class="date-display-single">{deadline}</span></div></div></div>
+<div class="field field-name-field-cfp-content"><div class="field-items"><div class="field-item even">{description}\
+</div></div></div>
+</article>
+</div>"""
+
+DETAIL_PAGE = """<!DOCTYPE html>
+<html><head><title>{source}</title></head>
+<body><article class="node node-cfp">
+<div class="field field-name-field-cfp-content"><div class="field-items"><div class="field-item even">{long_desc}\
+</div></div></div>
+<div class="field field-name-field-cfp-categories"><div class="field-items">{categories}</div></div>
+<div class="field field-name-field-cfp-contact-email field-type-email"><div class="field-items">\
+<div class="field-item even"><a href="mailto:{email}">{email}</a></div></div></div>
+</article></body></html>
+"""
+
+
+def format_date(date):
+    """Returns date in the form used for deadlines on the site, "Weekday, Month DD, YYYY"."""
+
+    return date.strftime("%A, %B ") + str(date.day) + date.strftime(", %Y")
+
+
+def format_updated(moment):
+    """Returns moment in the form used for update times on the site, "Weekday, Month DD, YYYY - HH:MM"."""
+
+    return format_date(moment) + moment.strftime(" - %I:%M%p").lower().replace(" - 0", " - ")
+
+
+def rare_word(number):
+    """Returns a made up word for number, spelled with letters only so that it survives keyword normalization."""
+
+    letters = ""
+    while True:
+        number, digit = divmod(number, 20)
+        letters += "bcdfghjklmnpqrstvwxz"[digit] + "aeiou"[number % 5]
+        if not number:
+            break
+
+    return "zy" + letters
+
+
+class FixtureSite:
+    """A synthetic copy of the call for papers site, with the markup expected by Call and CallInstance.
+
+    Calls are generated from a seed, so two sites built with the same arguments serve identical pages.  Listings are
+    ordered newest update first, like the real site.
+
+    ...
+
+    Attributes
+    ----------
+    calls : list of dict
+        the fields of each synthetic call, in listing order
+
+    per_page : int
+        the number of calls shown on each listing page
+
+    rare_words : list of str
+        the long tail of made up words used in descriptions, see constructor
+
+    Methods
+    -------
+    post : list of dict
+        adds new calls to the top of the listings
+
+    touch : dict
+        marks a call as updated, moving it to the top of the listings
+
+    listing_page : str
+        html of a listing page
+
+    detail_page : str
+        html of a call's individual page, or None if there is no call at that path
+    """
+
+    def __init__(self, n_calls=90, per_page=30, overdue_fraction=0.3, desc_words=150, seed=0, today=None, rare_words=0):
+        """
+        Parameters
+        ----------
+        n_calls : int
+            the number of calls on the site
+
+        per_page : int
+            the number of calls shown on each listing page
+
+        overdue_fraction : float
+            the fraction of calls whose deadline has already passed
+
+        desc_words : int
+            the average number of words in a call's long description
+
+        seed : int
+            seed for the random generator used to make the calls
+
+        today : datetime.date, optional
+            the date deadlines are relative to, defaults to the current date
+
+        rare_words : int
+            the size of a long tail of made up words mixed into descriptions, most of them used by only a few calls the
+            way most terms of a real corpus are; descriptions only use WORDS if 0
+        """
+
+        self._rng = random.Random(seed)
+        self._today = today or datetime.date.today()
+        self._overdue_fraction = overdue_fraction
+        self._desc_words = desc_words
+        self.rare_words = [rare_word(number) for number in range(rare_words)]
+
+        self.per_page = per_page
+        self.calls = []
+        self._by_path = {}
+
+        now = datetime.datetime.combine(self._today, datetime.time(12))
+        for number in range(n_calls):
+            self.calls.append(self._make_call(number, now - datetime.timedelta(minutes=37 * number +
+                                                                               self._rng.randint(0, 30))))
+
+    def _make_call(self, number, updated):
+        """Returns the fields of a new synthetic call, registering its individual page."""
+
+        rng = self._rng
+        if rng.random() < self._overdue_fraction:
+            deadline = self._today - datetime.timedelta(days=rng.randint(1, 200))
+        else:
+            deadline = self._today + datetime.timedelta(days=rng.randint(1, 200))
+
+        topic = rng.sample(WORDS, 12)
+        long_desc = " ".join(self._word(topic)
+                             for _ in range(max(10, int(rng.gauss(self._desc_words, self._desc_words / 4)))))
+        source = rng.choice(SOURCES) + ": " + " ".join(word.title() for word in topic[:3])
+        path = updated.strftime("/cfp/%Y/%m/%d/") + "-".join(topic[:3]) + "-" + str(number)
+
+        call = dict(number=number, path=path, source=source, contact="Contact " + str(number),
+                    email="contact" + str(number) + "@example.edu", updated=format_updated(updated),
+                    deadline=format_date(deadline), description=long_desc[:200].rsplit(" ", 1)[0], long_desc=long_desc,
+                    categories=sorted(rng.sample(CATEGORIES, rng.randint(1, 3))), _updated=updated)
+        self._by_path[path] = call
+
+        return call
+
+    def _word(self, topic):
+        """Returns a random word of a description, from topic, WORDS or the long tail of rare words."""
+
+        rng = self._rng
+        if self.rare_words and rng.random() < 0.1:
+            # Heavy tailed, so that the first rare words are fairly common and the rest are seldom used
+            return self.rare_words[(int(rng.paretovariate(0.5)) - 1) % len(self.rare_words)]
+
+        return rng.choice(topic if rng.random() < 0.6 else WORDS)
+
+    def post(self, count=1):
+        """Adds count new calls to the top of the listings, returning their fields."""
+
+        newest = max(call["_updated"] for call in self.calls) if self.calls else datetime.datetime.now()
+        number = max(call["number"] for call in self.calls) + 1 if self.calls else 0
+        posted = [self._make_call(number + i, newest + datetime.timedelta(minutes=5 * (count - i)))
+                  for i in range(count)]
+        self.calls[:0] = posted
+
+        return posted
+
+    def touch(self, index, long_desc=None):
+        """Marks the call at index in the listings as updated, moving it to the top and optionally changing its text."""
+
+        call = self.calls.pop(index)
+        call["_updated"] = max(other["_updated"] for other in self.calls + [call]) + datetime.timedelta(minutes=1)
+        call["updated"] = format_updated(call["_updated"])
+        if long_desc is not None:
+            call["long_desc"] = long_desc
+        self.calls.insert(0, call)
+
+        return call
+
+    def listing_page(self, page):
+        """Returns the html of listing page number page (starting at 0), pages past the last call are empty."""
+
+        calls = self.calls[page * self.per_page:(page + 1) * self.per_page]
+        rows = [LISTING_ROW.format(number=call["number"] + 1, href=call["path"], source=escape(call["source"]),
+                                   updated=call["updated"], contact=escape(call["contact"]), deadline=call["deadline"],
+                                   description="<p>" + escape(call["description"]) + "</p>")
+                for call in calls]
+
+        return LISTING_PAGE.format(rows="\n".join(rows))
+
+    def detail_page(self, path):
+        """Returns the html of the individual page found at path, or None if there is no call there."""
+
+        call = self._by_path.get(path)
+        if call is None:
+            return None
+
+        categories = "".join('<div class="field-item"><a href="/category/' + escape(category) + '">' +
+                             escape(category) + "</a></div>" for category in call["categories"])
+
+        return DETAIL_PAGE.format(source=escape(call["source"]), long_desc="<p>" + escape(call["long_desc"]) + "</p>",
+                                  categories=categories, email=call["email"])
+
+
+class FixtureServer:
+    """Serves a FixtureSite over HTTP on localhost, in a background thread.
+
+    Intended as a context manager, use base_url as the base_url of a CallInstance to scrape the fixture instead of the
+    real site:
+
+        with FixtureServer(FixtureSite(n_calls=60)) as server:
+            instance = CallInstance(scope="pages", n=2, base_url=server.base_url)
+
+    ...
+
+    Attributes
+    ----------
+    site : FixtureSite
+        the site being served
+
+    base_url : str
+        the equivalent of CallInstance.BASE_URL for the served site
+
+    requests : int
+        the number of requests handled so far
+
+    connections : int
+        the number of connections opened so far, fewer than requests when clients keep connections alive
+
+    not_modified : int
+        the number of conditional requests answered with 304 Not Modified
+
+    errors : dict of str to list of int
+        statuses to answer the next requests for a path with before serving it, e.g. {path: [503, 503]} makes the
+        next two requests for path fail; each error is sent with "Retry-After: 0"
+
+    corrupt : dict of str to str
+        paths answered with a broken 200 response instead of their page: "empty" sends no body and "gzip" sends a body
+        marked as gzip that is not
+    """
+
+    def __init__(self, site, delay=0.0):
+        """
+        Parameters
+        ----------
+        site : FixtureSite
+            the site to serve
+
+        delay : float
+            seconds to wait before answering each request, to imitate network latency
+        """
+
+        self.site = site
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+        self.not_modified = 0
+        self.errors = {}
+        self.corrupt = {}
+        errors_lock = threading.Lock()
+
+        server = self
+        listing = re.compile(r"^/category/all&page=(\d+)$")
+
+        class Handler(BaseHTTPRequestHandler):
+            # Lets clients keep connections alive between requests
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):
+                server.requests += 1
+                if server.delay:
+                    threading.Event().wait(server.delay)
+
+                with errors_lock:
+                    queued = server.errors.get(self.path)
+                    status = queued.pop(0) if queued else None
+                if status is not None:
+                    self.send_response(status)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                broken = server.corrupt.get(self.path)
+                if broken is not None:
+                    data = b"" if broken == "empty" else b"this is not gzip"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    if broken == "gzip":
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                match = listing.match(self.path)
+                body = server.site.listing_page(int(match.group(1))) if match else server.site.detail_page(self.path)
+
+                if body is None:
+                    self.send_error(404)
+                    return
+
+                data = body.encode("utf-8")
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("ETag", etag)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    data = gzip.compress(data)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:" + str(self._httpd.server_address[1]) + "/category/all&page="
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,141 @@
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .Fixtures import WORDS
+
+# Kinds of query sent by default, in turn, and the number of words in each
+KINDS = ("keyword", "title", "abstract")
+QUERY_WORDS = dict(keyword=2, title=6, abstract=40)
+
+
+def fixture_queries(n=200, seed=0):
+    """Returns n (kind, query) pairs made of the words of fixture descriptions, cycling through KINDS."""
+
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        kind = KINDS[i % len(KINDS)]
+        words = rng.sample(WORDS, min(QUERY_WORDS[kind], len(WORDS)))
+        queries.append((kind, words if kind == "keyword" else " ".join(words).capitalize()))
+
+    return queries
+
+
+def run(url, queries, concurrency=8, n_requests=1000, top_k=10):
+    """Sends n_requests queries to a RecommendationServer from concurrency threads and reports their latencies.
+
+    Each thread keeps one connection alive and sends queries taken in turn from queries, as soon as the previous one is
+    answered.
+
+    Parameters
+    ----------
+    url : str
+        the server's url, e.g. http://127.0.0.1:8000
+
+    queries : list of tuple
+        (kind, query) pairs, kind being keyword, title or abstract, see fixture_queries
+
+    concurrency : int
+        the number of queries in flight at once
+
+    n_requests : int
+        the number of queries sent in all
+
+    top_k : int
+        the number of recommendations asked for by each query
+
+    Returns
+    -------
+    result : dict
+        p50, p99 and mean latency in seconds, queries per second, the number of errors and of generations answering
+    """
+
+    from .Bench import latencies
+
+    parts = urlsplit(url)
+    times = []
+    errors = []
+    generations = set()
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker():
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+        try:
+            for i in counter:
+                kind, query = queries[i % len(queries)]
+                # Bytes, so that http.client sends the headers and body in one packet
+                body = json.dumps(dict(query=query, top_k=top_k)).encode("utf-8")
+                start = time.perf_counter()
+                try:
+                    connection.request("POST", "/recommend/" + kind, body, {"Content-Type": "application/json"})
+                    response = connection.getresponse()
+                    payload = json.loads(response.read())
+                except (OSError, http.client.HTTPException, ValueError) as e:
+                    connection.close()
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                seconds = time.perf_counter() - start
+
+                with lock:
+                    if response.status == 200:
+                        times.append(seconds)
+                        generations.add(payload["generation"])
+                    else:
+                        errors.append(payload.get("error", str(response.status)))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = dict(latencies(times)) if times else {}
+    result.update(concurrency=concurrency, requests=n_requests, queries_per_second=len(times) / elapsed,
+                  errors=len(errors), generations=len(generations))
+    if errors:
+        result["first_error"] = errors[0]
+
+    return result
+
+
+def main(argv=None):
+    """Load-tests a running server, printing p50 and p99 latency and throughput as json.
+
+    Exits with status 1 if any query failed.
+    """
+
+    parser = argparse.ArgumentParser(description="Load test for python -m papers serve.")
+    parser.add_argument("url", nargs="?", default="http://127.0.0.1:8000", help="url of the server")
+    parser.add_argument("--concurrency", type=int, default=8, help="queries in flight at once")
+    parser.add_argument("--requests", type=int, default=1000, help="queries sent in all")
+    parser.add_argument("--top-k", type=int, default=10, help="recommendations asked for by each query")
+    parser.add_argument("--queries", metavar="FILE",
+                        help="json lines of [kind, query] to send, queries made of fixture words if not provided")
+    args = parser.parse_args(argv)
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as fh:
+            queries = [tuple(json.loads(line)) for line in fh if line.strip()]
+    else:
+        queries = fixture_queries()
+
+    result = run(args.url, queries, args.concurrency, args.requests, args.top_k)
+    print(json.dumps(result, indent=2))
+
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,848 @@
+import datetime
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from papers import Calls, Fetch, Render
+from papers.Calls import CallInstance, iter_calls
+from papers.Fetch import FetchError, Fetcher, Politeness
+from papers.Index import NeighborIndex, QueryCache
+from papers.Text import STOPWORDS, Normalizer
+
+from .Bench import PlainLemmatizer, fixture_calls, fixture_instance, fixture_pages, parse_calls
+from .Fixtures import FixtureServer, FixtureSite
+
+# Queries asked of every pair of instances expected to agree
+KEYWORDS = (["war", "law"], ["poetry", "empire", "nonexistentword"], ["film"])
+TITLE = "war and law in poetry"
+ABSTRACT = "the novel, empire and colonial archives of the war"
+
+
+def fetcher():
+    """Returns a Fetcher without a rate limit, so that tests against a FixtureServer do not wait."""
+
+    return Fetcher(Politeness(rate=None))
+
+
+def normalizer():
+    """Returns a Normalizer that does not need the WordNet data."""
+
+    return Normalizer(lemmatizer=PlainLemmatizer())
+
+
+def host(server):
+    return server.base_url.split("/category/")[0]
+
+
+def ranking(rec_list):
+    """Returns the link, relevancy and shared keywords of every recommendation in rec_list, in order."""
+
+    recs = rec_list.page(0, rec_list.total)
+    return [rec.call.source_link for rec in recs], [rec.relevancy for rec in recs], [rec.rec_info for rec in recs]
+
+
+def assert_same_recommendations(a, b, **kwargs):
+    """Asserts that instances a and b make the same recommendations for every kind of query."""
+
+    pairs = [(a.keyword_recommend(words, **kwargs), b.keyword_recommend(words, **kwargs)) for words in KEYWORDS]
+    pairs.append((a.title_recommend(TITLE, **kwargs), b.title_recommend(TITLE, **kwargs)))
+    pairs.append((a.abstract_recommend(ABSTRACT, **kwargs), b.abstract_recommend(ABSTRACT, **kwargs)))
+
+    for x, y in pairs:
+        (links_x, relevancies_x, info_x), (links_y, relevancies_y, info_y) = ranking(x), ranking(y)
+        assert links_x == links_y
+        assert np.allclose(relevancies_x, relevancies_y)
+        assert info_x == info_y
+
+
+@pytest.mark.parametrize("broken", ["empty", "gzip"])
+def test_crawl_skips_broken_page(broken):
+    site = FixtureSite(n_calls=40, per_page=20)
+    with FixtureServer(site) as server:
+        server.corrupt[site.calls[3]["path"]] = broken
+        with fetcher() as f:
+            calls = list(iter_calls("pages", 2, f, server.base_url))
+
+    assert len(calls) == 39
+    assert list(f.stats.failed) == [host(server) + site.calls[3]["path"]]
+
+
+def test_refresh_skips_broken_pages():
+    site = FixtureSite(n_calls=40, per_page=20)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            calls = list(iter_calls("pages", 2, f, server.base_url))
+        instance = CallInstance.from_calls(calls, base_url=server.base_url, normalizer=normalizer())
+
+        site.post(3)
+        server.corrupt[site.calls[0]["path"]] = "empty"
+        server.corrupt[site.calls[1]["path"]] = "gzip"
+        with fetcher() as f:
+            new_calls = instance.refresh(fetcher=f)
+
+    assert len(new_calls) == 1
+    assert len(instance.calls) == 41
+    assert sorted(instance.crawl_stats.failed) == sorted(host(server) + call["path"] for call in site.calls[:2])
+
+
+def test_crawl_retries_transient_errors():
+    site = FixtureSite(n_calls=20, per_page=20)
+    with FixtureServer(site) as server:
+        server.errors[site.calls[0]["path"]] = [503, 429]
+        with fetcher() as f:
+            calls = list(iter_calls("pages", 1, f, server.base_url))
+
+    assert len(calls) == 20
+    assert f.stats.retries == 2 and not f.stats.failed
+
+
+def test_invalid_url_raises_fetch_error():
+    with fetcher() as f, pytest.raises(FetchError):
+        f.get("http://127.0.0.1:1:bad/")
+
+
+def test_refresh_matches_refit():
+    site = FixtureSite(n_calls=60, per_page=20)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            instance = CallInstance.from_calls(iter_calls("pages", 3, f, server.base_url), base_url=server.base_url,
+                                               normalizer=normalizer())
+
+        site.post(4)
+        site.touch(10, long_desc="Entirely new words about zebra and giraffe modernism.")
+        with fetcher() as f:
+            new_calls = instance.refresh(fetcher=f)
+        with fetcher() as f:
+            refit = CallInstance.from_calls(iter_calls("calls", len(instance.calls), f, server.base_url),
+                                            base_url=server.base_url, normalizer=normalizer())
+
+    assert len(new_calls) == 5 and len(instance.calls) == 64
+    assert [call.source_link for call in instance.calls] == [call.source_link for call in refit.calls]
+    for words in KEYWORDS + (["zebra", "modernism"],):
+        assert np.allclose(instance.relevance(words), refit.relevance(words))
+    assert_same_recommendations(instance, refit, min_relevancy=-1)
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(n_features=2 ** 18), dict(n_components=16)])
+def test_save_load_round_trip(tmp_path, kwargs):
+    instance = fixture_instance(FixtureSite(n_calls=80, seed=1), **kwargs)
+    instance.save(str(tmp_path / "snapshot"))
+    loaded = CallInstance.load(str(tmp_path / "snapshot"))
+    loaded.normalizer = instance.normalizer
+
+    assert [call.to_record() for call in loaded.calls] == [call.to_record() for call in instance.calls]
+    assert type(loaded._index) is type(instance._index)
+    assert_same_recommendations(instance, loaded, min_relevancy=-1)
+
+
+def test_lxml_and_soup_parse_the_same_calls():
+    listings, details = fixture_pages(FixtureSite(n_calls=50, per_page=20, seed=2))
+    lxml_calls = parse_calls(listings, details, parser="lxml")
+    soup_calls = parse_calls(listings, details, parser="soup")
+
+    assert [call.to_record() for call in lxml_calls] == [call.to_record() for call in soup_calls]
+
+
+def test_sparse_and_dense_indexes_agree():
+    site = FixtureSite(n_calls=80, seed=3)
+    assert_same_recommendations(fixture_instance(site), fixture_instance(site, dense=True), min_relevancy=-1)
+
+
+def test_hashed_index_matches_vocabulary():
+    site = FixtureSite(n_calls=120, seed=5, rare_words=200)
+    vocabulary = fixture_instance(site)
+    hashed = CallInstance.from_calls(iter(fixture_calls(site)), normalizer=normalizer(), n_features=2 ** 20,
+                                     chunk_size=32)
+
+    assert_same_recommendations(vocabulary, hashed)
+    assert_same_recommendations(vocabulary, hashed, min_relevancy=-1)
+    words = [site.rare_words[3], "war", "nonexistentword"]
+    assert np.allclose(vocabulary.relevance(words), hashed.relevance(words))
+
+
+def test_normalizer_keeps_keyword_lists():
+    texts = [call["long_desc"] for call in FixtureSite(n_calls=40, seed=4).calls]
+    norm = normalizer()
+
+    def keywords(text):
+        # The loop get_long_desc_keywords used to run for each call
+        words = []
+        for word in norm.tokenizer.tokenize(text):
+            stem = word.lower()
+            if stem not in words and stem not in STOPWORDS and stem.isalpha():
+                words.append(stem)
+        return words
+
+    assert norm.batch(texts) == [keywords(text) for text in texts]
+
+
+def test_filters_match_call_attributes():
+    instance = fixture_instance(FixtureSite(n_calls=150, seed=7))
+    today = datetime.date.today()
+    categories = ["poetry", "theory"]
+    cases = [(dict(open_only=True), lambda call: not call.is_overdue(today)),
+             (dict(categories=categories), lambda call: bool(set(call.categories) & set(categories))),
+             (dict(categories=categories, category_match="all"), lambda call: set(categories) <= set(call.categories)),
+             (dict(exclude_categories="poetry"), lambda call: "poetry" not in call.categories),
+             (dict(due_after=today), lambda call: call.due_date is not None and call.due_date >= today)]
+
+    everything = instance.title_recommend(TITLE, min_relevancy=-1)
+    for kwargs, keep in cases:
+        links, relevancies, info = ranking(instance.title_recommend(TITLE, min_relevancy=-1, **kwargs))
+        expected = [rec for rec in everything.page(0, everything.total) if keep(rec.call)]
+
+        assert links == [rec.call.source_link for rec in expected]
+        assert np.allclose(relevancies, [rec.relevancy for rec in expected])
+
+    open_calls = {call.source_link for call in instance.calls_due(open_only=True)}
+    assert open_calls == {call.source_link for call in instance.calls
+                          if call.due_date is not None and not call.is_overdue(today)}
+
+
+def test_stats_count_tokens_and_tell_stages_from_counts():
+    from papers.Stats import Instrumentation
+
+    stats = Instrumentation()
+    events = []
+    stats.subscribe(lambda kind, name, value: events.append((kind, name)))
+    site = FixtureSite(n_calls=20)
+    fixture_instance(site, stats=stats)
+
+    texts = [call["long_desc"] for call in site.calls]
+    assert stats.counters["tokens.lemmatized"] == sum(len(normalizer().tokenizer.tokenize(text)) for text in texts)
+    assert ("stage", "fit") in events and ("count", "tokens.lemmatized") in events
+
+
+@pytest.mark.parametrize("field", [dict(min_relevancy="high"), dict(min_relevancy=True), dict(categories=[1, 2]),
+                                   dict(categories={"poetry": 1}), dict(exclude_categories=3), dict(open_only="yes"),
+                                   dict(truncate=-1), dict(top_k=True), dict(offset=-1), dict(category_match="most")])
+def test_server_rejects_malformed_queries(tmp_path, field):
+    from papers.Server import QueryError, RecommendationServer
+
+    fixture_instance(FixtureSite(n_calls=20)).save(str(tmp_path / "snapshot"))
+    with RecommendationServer(str(tmp_path / "snapshot"), port=0, normalizer=normalizer()) as server:
+        assert server.recommend("keyword", dict(query=["war"], categories="poetry", min_relevancy=0))["total"] >= 0
+        with pytest.raises(QueryError):
+            server.recommend("keyword", dict(query=["war"], **field))
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(n_features=2 ** 18), dict(n_components=16)])
+def test_neighbors_are_only_computed_when_asked_for(tmp_path, kwargs):
+    from papers.Stats import Instrumentation
+
+    site = FixtureSite(n_calls=60, seed=6)
+    assert fixture_instance(site, **kwargs).neighbors is None
+    instance = fixture_instance(site, n_neighbors=10, **kwargs)
+    assert instance.neighbors is not None and instance.neighbors.k == 10
+
+    # Loading reads the lists a snapshot holds, and never computes missing ones
+    instance.save(str(tmp_path / "with"))
+    loaded = CallInstance.load(str(tmp_path / "with"))
+    assert np.array_equal(loaded.neighbors.ids, instance.neighbors.ids)
+
+    fixture_instance(site, **kwargs).save(str(tmp_path / "without"))
+    loaded = CallInstance.load(str(tmp_path / "without"))
+    loaded.stats = Instrumentation()
+    assert loaded.neighbors is None
+    loaded.similar_calls(3)
+    assert loaded.neighbors.k == CallInstance.N_NEIGHBORS and loaded.stats.stages["neighbors"]["count"] == 1
+
+
+@pytest.mark.parametrize("length", [str(2 ** 21), "-1", "many"])
+def test_server_rejects_bad_content_length_and_closes(tmp_path, length):
+    import socket
+
+    from papers.Server import RecommendationServer
+
+    fixture_instance(FixtureSite(n_calls=20)).save(str(tmp_path / "snapshot"))
+    with RecommendationServer(str(tmp_path / "snapshot"), port=0, normalizer=normalizer()) as server:
+        with socket.create_connection(server.address, timeout=10) as connection:
+            connection.sendall(b"POST /recommend/keyword HTTP/1.1\r\nHost: x\r\nContent-Length: " + length.encode() +
+                               b"\r\n\r\n" + b"x" * 1000 + b"POST /recommend/keyword HTTP/1.1\r\n\r\n")
+            received = b""
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                received += data
+
+    assert received.startswith(b"HTTP/1.1 400")
+    assert received.count(b"HTTP/1.1") == 1
+
+
+def test_server_answers_internal_errors_with_500(tmp_path, monkeypatch):
+    import json
+    import urllib.error
+    import urllib.request
+
+    from papers.Server import RecommendationServer
+
+    fixture_instance(FixtureSite(n_calls=20)).save(str(tmp_path / "snapshot"))
+    with RecommendationServer(str(tmp_path / "snapshot"), port=0, normalizer=normalizer()) as server:
+        def fail(*args, **kwargs):
+            raise FetchError("http://example.org", "ConnectionError")
+
+        monkeypatch.setattr(server.current.instance, "keyword_recommend", fail)
+        host_name, port = server.address
+        request = urllib.request.Request("http://" + host_name + ":" + str(port) + "/recommend/keyword",
+                                         json.dumps(dict(query=["war"])).encode("utf-8"))
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request, timeout=10)
+
+    assert error.value.code == 500
+
+
+def test_snapshot_is_never_read_half_written(tmp_path):
+    import threading
+
+    path = str(tmp_path / "snapshot")
+    instances = [fixture_instance(FixtureSite(n_calls=n_calls, seed=n_calls)) for n_calls in (30, 50)]
+    instances[0].save(path)
+    stopped = threading.Event()
+
+    def save():
+        while not stopped.is_set():
+            for instance in instances:
+                instance.save(path)
+
+    saver = threading.Thread(target=save)
+    saver.start()
+    try:
+        for _ in range(50):
+            loaded = CallInstance.load(path, mmap=False)
+            assert len(loaded.calls) in (30, 50)
+            assert loaded.instance_tfidf.shape[0] == len(loaded.calls)
+    finally:
+        stopped.set()
+        saver.join()
+
+    # The current version and the previous one are kept
+    assert len([name for name in (tmp_path / "snapshot").iterdir() if name.name.startswith("v-")]) == 2
+
+
+def test_snapshot_without_versions_is_loaded_and_replaced(tmp_path):
+    import os
+    import shutil
+
+    instance = fixture_instance(FixtureSite(n_calls=30))
+    instance.save(str(tmp_path / "new"))
+    current = (tmp_path / "new" / "CURRENT").read_text()
+    shutil.copytree(str(tmp_path / "new" / current), str(tmp_path / "old"))
+
+    assert len(CallInstance.load(str(tmp_path / "old")).calls) == 30
+    instance.save(str(tmp_path / "old"))
+    assert sorted(name for name in os.listdir(str(tmp_path / "old")) if not name.startswith("v-")) == ["CURRENT"]
+    assert len(CallInstance.load(str(tmp_path / "old")).calls) == 30
+
+
+def test_instances_can_be_pickled_and_copied():
+    import copy
+    import pickle
+
+    from papers.Stats import Instrumentation
+
+    site = FixtureSite(n_calls=20, per_page=20)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            instance = CallInstance("pages", 1, fetcher=f, base_url=server.base_url, normalizer=normalizer(),
+                                    stats=Instrumentation())
+    instance.title_recommend(TITLE)
+    stats = instance.stats.as_dict()
+
+    for copied in (pickle.loads(pickle.dumps(instance)), copy.deepcopy(instance)):
+        assert copied.crawl_stats.as_dict() == instance.crawl_stats.as_dict()
+        assert copied.stats.as_dict() == stats
+        assert len(copied.query_cache) == 0
+        assert_same_recommendations(instance, copied, min_relevancy=-1)
+
+
+def test_stats_count_network_activity():
+    from papers.Stats import Instrumentation
+
+    stats = Instrumentation()
+    counts = {}
+    stats.subscribe(lambda kind, name, value: counts.__setitem__(name, counts.get(name, 0) + value)
+                    if kind == "count" else None)
+    site = FixtureSite(n_calls=20, per_page=20)
+    with FixtureServer(site) as server:
+        server.errors[site.calls[0]["path"]] = [503]
+        with Fetcher(Politeness(rate=None), stats=stats) as f:
+            CallInstance("pages", 1, fetcher=f, base_url=server.base_url, normalizer=normalizer(), stats=stats)
+
+    assert counts["requests"] == f.stats.requests == 22
+    assert counts["retries"] == f.stats.retries == 1
+    assert counts["bytes"] == f.stats.bytes > 0
+    assert stats.as_dict()["counters"]["requests"] == 22
+
+
+def test_crawl_skips_malformed_listing_article():
+    site = FixtureSite(n_calls=40, per_page=20)
+    listing_page = site.listing_page
+    # The first article of the second page loses its deadline
+    site.listing_page = lambda page: (listing_page(page).replace("field-name-field-cfp-due-date", "field-name-lost", 1)
+                                      if page == 1 else listing_page(page))
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            calls = list(iter_calls("pages", 2, f, server.base_url))
+
+    assert len(calls) == 39
+    assert site.calls[20]["path"] not in [call.source_link[len(host(server)):] for call in calls]
+    assert list(f.stats.failed) == [server.base_url + "1#1"]
+
+
+def test_refresh_without_changes_keeps_the_model():
+    site = FixtureSite(n_calls=40, per_page=20)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            instance = CallInstance.from_calls(iter_calls("pages", 2, f, server.base_url), base_url=server.base_url,
+                                               normalizer=normalizer())
+        instance.title_recommend(TITLE)
+        version = instance._index.version
+
+        with fetcher() as f:
+            assert instance.refresh(fetcher=f) == []
+
+    assert instance._index.version == version
+    assert len(instance.query_cache) == 1
+
+
+def records(calls):
+    return [call.to_record() for call in calls]
+
+
+def test_cache_revalidates_with_conditional_requests(tmp_path):
+    from papers.Cache import ResponseCache
+
+    site = FixtureSite(n_calls=40, per_page=20)
+    cache = ResponseCache(str(tmp_path / "cache"), max_age=0)
+    with FixtureServer(site) as server:
+        with Fetcher(Politeness(rate=None), cache=cache) as f:
+            first = list(iter_calls("pages", 2, f, server.base_url))
+        with Fetcher(Politeness(rate=None), cache=cache) as f:
+            second = list(iter_calls("pages", 2, f, server.base_url))
+
+    assert records(second) == records(first)
+    assert server.not_modified == f.stats.cached == 42
+
+
+def test_cache_replays_a_crawl_offline(tmp_path):
+    from papers.Cache import ResponseCache
+
+    site = FixtureSite(n_calls=40, per_page=20)
+    with FixtureServer(site) as server:
+        with Fetcher(Politeness(rate=None), cache=ResponseCache(str(tmp_path / "cache"))) as f:
+            online = list(iter_calls("pages", 2, f, server.base_url))
+        base_url = server.base_url
+
+    # The server is gone, every page comes from the cache
+    with Fetcher(Politeness(rate=None), cache=ResponseCache(str(tmp_path / "cache"), offline=True)) as f:
+        assert records(iter_calls("pages", 2, f, base_url)) == records(online)
+        assert f.stats.requests == 0 and f.stats.cached == 42
+        with pytest.raises(FetchError):
+            f.get(base_url + "2")
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    import itertools
+
+    from papers import Cache
+
+    clock = itertools.count()
+    monkeypatch.setattr(Cache.time, "time", lambda: float(next(clock)))
+    cache = Cache.ResponseCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put("a", "x" * 100)
+    cache.put("b", "x" * 100)
+    cache.get("a")
+    cache.put("c", "x" * 100)
+
+    assert "a" in cache and "b" not in cache and "c" in cache
+    assert cache.size == 200 and len(cache) == 2
+
+
+def test_cache_resumes_a_crawl_that_stopped_halfway(tmp_path):
+    import itertools
+
+    from papers.Cache import ResponseCache
+
+    site = FixtureSite(n_calls=60, per_page=20)
+    with FixtureServer(site) as server:
+        with Fetcher(Politeness(rate=None), cache=ResponseCache(str(tmp_path / "cache"))) as f:
+            calls = iter_calls("pages", 3, f, server.base_url)
+            list(itertools.islice(calls, 25))
+            calls.close()
+
+        requests = server.requests
+        with Fetcher(Politeness(rate=None), cache=ResponseCache(str(tmp_path / "cache"))) as f:
+            resumed = list(iter_calls("pages", 3, f, server.base_url))
+
+        # Only the pages the first crawl never got to are requested again
+        assert f.stats.cached >= 25 + 2
+        assert server.requests - requests == f.stats.requests == 63 - f.stats.cached
+        with fetcher() as f:
+            assert records(resumed) == records(iter_calls("pages", 3, f, server.base_url))
+
+
+@pytest.mark.parametrize("kind, queries", [("keyword", list(KEYWORDS)), ("title", [TITLE, "war", "modern film"]),
+                                           ("abstract", [ABSTRACT, TITLE, "poetry"])])
+def test_batch_recommend_matches_single_queries(kind, queries):
+    instance = fixture_instance(FixtureSite(n_calls=120, seed=8))
+    recommend = getattr(instance, kind + "_recommend")
+    kwargs = dict(top_k=7, categories=["poetry", "theory"])
+
+    for n_jobs in (1, 2):
+        batch = instance.batch_recommend(queries, kind=kind, n_jobs=n_jobs, chunk_size=2, **kwargs)
+        assert [ranking(rec_list) for rec_list in batch] == [ranking(recommend(query, **kwargs)) for query in queries]
+        assert [len(rec_list.recs) for rec_list in batch] == [len(recommend(query, **kwargs).recs) for query in queries]
+
+
+def test_pages_are_slices_of_the_full_ranking():
+    instance = fixture_instance(FixtureSite(n_calls=150, seed=9))
+    full = instance.title_recommend(TITLE, min_relevancy=-1).page(0, 150)
+    links = [rec.call.source_link for rec in full]
+
+    rec_list = instance.title_recommend(TITLE, min_relevancy=-1, top_k=5)
+    assert rec_list.total == len(full) == 150
+    assert rec_list._built == {}
+    assert [rec.call.source_link for rec in rec_list.recs] == links[:5]
+    assert len(rec_list._built) == 5
+
+    for start, stop in ((5, 12), (0, 3), (140, 200), (30, 30)):
+        assert [rec.call.source_link for rec in rec_list.page(start, stop)] == links[start:stop]
+    assert [rec.relevancy for rec in full] == sorted((rec.relevancy for rec in full), reverse=True)
+
+    # Shown before recs is built, a list holds the same top_k recommendations as after
+    rec_list = instance.title_recommend(TITLE, min_relevancy=-1, top_k=40)
+    records_before = rec_list.render(show_only_open=False, fmt="records")
+    assert len(records_before) == 40
+    assert records_before == Render.render(rec_list.recs, "records")
+
+
+@pytest.mark.parametrize("fmt", ["markdown", "html"])
+def test_cached_renders_match_uncached_and_follow_the_date(monkeypatch, fmt):
+    instance = fixture_instance(FixtureSite(n_calls=60, seed=10))
+    rec_list = instance.title_recommend(TITLE, min_relevancy=-1, top_k=40)
+    Render.fragments.clear()
+
+    # Rendered from scratch, then again with every call found in the shared cache
+    shown = [rec for rec in rec_list.recs if not rec.call.is_overdue()]
+    uncached = Render.render(shown, fmt, truncate=80, cache=Render.FragmentCache())
+    rendered = rec_list.render(fmt=fmt, truncate=80)
+    misses = Render.fragments.misses
+    assert rendered == uncached
+    assert Render.render(shown, fmt, truncate=80) == uncached
+    assert Render.fragments.misses == misses and Render.fragments.hits >= len(shown)
+    assert rec_list.render(fmt=fmt, truncate=80) is rendered
+    assert rec_list.show(fmt=fmt, truncate=80).data == rendered
+
+    # Calls that fall overdue the next time the list is rendered are left out of it
+    due = sorted(rec.call.due_date for rec in shown if rec.call.due_date)
+    later = due[len(due) // 2]
+
+    class Later(datetime.date):
+        @classmethod
+        def today(cls):
+            return later
+
+    monkeypatch.setattr(Calls, "datetime", types.SimpleNamespace(**dict(vars(datetime), date=Later)))
+    shown_later = [rec for rec in shown if not rec.call.is_overdue(later)]
+    assert 0 < len(shown_later) < len(shown)
+    assert rec_list.render(fmt=fmt, truncate=80) == Render.render(shown_later, fmt, truncate=80,
+                                                                    cache=Render.FragmentCache()) != rendered
+
+
+def test_query_cache_hits_and_is_emptied_by_refresh():
+    site = FixtureSite(n_calls=40, per_page=20)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            instance = CallInstance.from_calls(iter_calls("pages", 2, f, server.base_url), base_url=server.base_url,
+                                               normalizer=normalizer())
+        uncached = CallInstance.from_calls(instance.calls, normalizer=normalizer())
+        uncached.query_cache = QueryCache(0)
+
+        first = instance.relevance(["war", "law"])
+        assert instance.query_cache.info() == (0, 1, instance.QUERY_CACHE_SIZE, 1)
+        assert instance.relevance(["war", "law"]) is first
+        instance.title_recommend(TITLE)
+        instance.title_recommend(TITLE)
+        assert instance.query_cache.info() == (2, 2, instance.QUERY_CACHE_SIZE, 2)
+        assert not first.flags.writeable
+        assert np.array_equal(first, uncached.relevance(["war", "law"]))
+
+        # Results computed before a refresh are never handed out after it
+        site.post(2)
+        site.touch(5, long_desc="Entirely new words about war and zebra modernism.")
+        with fetcher() as f:
+            instance.refresh(fetcher=f)
+        refreshed = instance.relevance(["war", "law"])
+        assert instance.query_cache.info() == (2, 3, instance.QUERY_CACHE_SIZE, 1)
+        assert len(refreshed) == len(first) + 2
+        with fetcher() as f:
+            refit = CallInstance.from_calls(iter_calls("calls", 42, f, server.base_url), normalizer=normalizer())
+        assert np.allclose(refreshed, refit.relevance(["war", "law"]))
+
+    # Only the maxsize most recently used results are kept
+    instance.query_cache = QueryCache(2)
+    for words in KEYWORDS + (["war", "law"],):
+        instance.relevance(words)
+    assert len(instance.query_cache) == 2
+    instance.relevance(["film"])
+    assert instance.query_cache.info() == (1, 4, 2, 2)
+    instance.relevance(KEYWORDS[0])
+    assert instance.query_cache.info() == (2, 4, 2, 2)
+    instance.relevance(KEYWORDS[1])
+    assert instance.query_cache.info() == (2, 5, 2, 2)
+
+
+@pytest.mark.parametrize("text, date", [("Monday, April 19, 2027", datetime.date(2027, 4, 19)),
+                                        ("April 19, 2027", datetime.date(2027, 4, 19)),
+                                        ("  Monday,\n  April   19,  2027 ", datetime.date(2027, 4, 19)),
+                                        ("Mon, Apr. 19th, 2027", datetime.date(2027, 4, 19)),
+                                        ("19 April 2027", datetime.date(2027, 4, 19)),
+                                        ("Deadline: 2027-04-19 (extended)", datetime.date(2027, 4, 19)),
+                                        ("February 30, 2027 or 2027-03-01", datetime.date(2027, 3, 1)),
+                                        ("February 30, 2027", None),
+                                        ("Smarch 3, 2027", None),
+                                        ("19/04/2027", None),
+                                        ("TBA", None),
+                                        ("", None),
+                                        (None, None)])
+def test_parse_date_finds_dates_in_any_form(text, date):
+    assert Calls.parse_date(text) == date
+
+
+@pytest.mark.parametrize("deadline", ["TBA", "", None, "February 30, 2027", "Rolling deadline"])
+def test_filters_leave_out_calls_without_a_due_date(deadline):
+    calls = fixture_calls(FixtureSite(n_calls=60, seed=11))
+    for i in (0, 7, 30):
+        calls[i] = Calls.Call.from_record(dict(calls[i].to_record(), deadline=deadline))
+    instance = CallInstance.from_calls(calls, normalizer=normalizer())
+    undated = {calls[i].source_link for i in (0, 7, 30)}
+    today = datetime.date.today()
+
+    assert {call.source_link for call in instance.calls if call.due_date is None} == undated
+    assert not any(call.is_overdue(today) for call in instance.calls if call.source_link in undated)
+
+    # An unknown deadline is open, but neither after nor before any date
+    cases = [(dict(open_only=True), lambda call: not call.is_overdue(today)),
+             (dict(due_after=today), lambda call: call.due_date is not None and call.due_date >= today),
+             (dict(due_before=today), lambda call: call.due_date is not None and call.due_date <= today),
+             (dict(open_only=True, due_before=today + datetime.timedelta(days=90)),
+              lambda call: call.due_date is not None and today <= call.due_date <= today + datetime.timedelta(days=90))]
+    everything = instance.title_recommend(TITLE, min_relevancy=-1)
+    for kwargs, keep in cases:
+        links = ranking(instance.title_recommend(TITLE, min_relevancy=-1, **kwargs))[0]
+        assert links == [rec.call.source_link for rec in everything.page(0, everything.total) if keep(rec.call)]
+
+        due = instance.calls_due(**kwargs)
+        assert [call.source_link for call in due] == \
+            [call.source_link for call in sorted((call for call in instance.calls if keep(call) and call.due_date),
+                                                 key=lambda call: call.due_date)]
+    assert {call.source_link for call in instance.calls_due()} == \
+        {call.source_link for call in instance.calls} - undated
+
+
+def brute_force_similarity(instance):
+    """Returns the cosine similarity of every call of instance with every other call, -inf with itself."""
+
+    similarity = np.asarray(instance._index.row_similarity(np.arange(len(instance.calls))), dtype=np.float64)
+    np.fill_diagonal(similarity, -np.inf)
+    return similarity
+
+
+@pytest.mark.parametrize("kwargs, agreement", [(dict(), 0.95), (dict(n_features=2 ** 18), 0.95),
+                                               (dict(n_components=16), 0.8)])
+def test_neighbors_and_duplicates_match_brute_force(kwargs, agreement):
+    site = FixtureSite(n_calls=80, per_page=20, seed=12)
+    with FixtureServer(site) as server:
+        with fetcher() as f:
+            instance = CallInstance.from_calls(iter_calls("pages", 4, f, server.base_url), base_url=server.base_url,
+                                               normalizer=normalizer(), n_neighbors=10, **kwargs)
+
+        # Each list holds the calls most similar to its own, with their similarity
+        similarity = brute_force_similarity(instance)
+        rows = np.arange(len(instance.calls))[:, None]
+        best = -np.sort(-similarity, axis=1)
+        assert np.allclose(instance.neighbors.scores, best[:, :10], atol=1e-6)
+        assert np.allclose(instance.neighbors.scores, similarity[rows, instance.neighbors.ids], atol=1e-6)
+
+        # Every pair is found above a threshold no call has more than k neighbors above
+        threshold = np.nextafter(np.float32(best[:, 10].max()), np.float32(1))
+        positions = {call.source_link: i for i, call in enumerate(instance.calls)}
+        pairs = {(positions[call.source_link], positions[other.source_link]): score
+                 for call, other, score in instance.duplicate_calls(threshold)}
+        expected = {(i, j): similarity[i, j] for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, 1)))}
+        assert len(expected) >= 3 and pairs.keys() == expected.keys()
+        assert np.allclose([pairs[pair] for pair in expected], list(expected.values()), atol=1e-6)
+
+        site.post(6)
+        site.touch(10, long_desc="Entirely new words about zebra and giraffe modernism.")
+        with fetcher() as f:
+            new_calls = instance.refresh(fetcher=f)
+
+    # The lists of new calls are computed anew, those of kept calls only merge in the new calls, so they may drift
+    # from the lists a rebuild gives as the idf weights (or the semantic space) change
+    rebuilt = NeighborIndex(10)
+    rebuilt.build(instance._index)
+    n_new = len(new_calls)
+    assert instance.neighbors.version == instance._index.version and len(instance.neighbors) == len(instance.calls)
+    assert np.allclose(instance.neighbors.scores[:n_new], rebuilt.scores[:n_new], atol=1e-6)
+    shared = [len(set(ids) & set(other)) / 10 for ids, other in zip(instance.neighbors.ids, rebuilt.ids)]
+    assert np.mean(shared) >= agreement
+
+
+class SuffixLemmatizer:
+    """Stands in for nltk's WordNetLemmatizer with one that changes words, plurals lose their "s"."""
+
+    def lemmatize(self, word):
+        return word[:-1] if len(word) > 2 and word.endswith("s") and not word.endswith("ss") else word
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_batched_keywords_match_per_call_keywords(processes):
+    calls = fixture_calls(FixtureSite(n_calls=40, seed=13))
+    for i, call in enumerate(calls):
+        call.long_desc += " Its wars, its laws and classes: others' archives." if i % 2 else " The war's archive."
+    norm = Normalizer(lemmatizer=SuffixLemmatizer(), processes=processes)
+
+    def keywords(text):
+        # The loop get_long_desc_keywords used to run for each call
+        words = []
+        for word in norm.tokenizer.tokenize(text):
+            stem = norm.lemmatizer.lemmatize(word.lower())
+            if stem not in words and stem not in STOPWORDS and stem.isalpha():
+                words.append(stem)
+        return words
+
+    expected = [keywords(call.long_desc) for call in calls]
+    assert "war" in expected[1] and "wars" not in expected[1] and "class" in expected[1] and "it" not in expected[1]
+
+    assert norm.batch([call.long_desc for call in calls], chunksize=8) == expected
+    assert [norm.keywords(call.long_desc) for call in calls] == expected
+    assert [call.get_long_desc_keywords(normalizer=norm) for call in calls] == expected
+    assert [call.get_long_desc_keywords(lemmatizer=SuffixLemmatizer()) for call in calls] == expected
+
+    instance = CallInstance.from_calls(calls, normalizer=norm)
+    assert [call.long_desc_keywords for call in instance.calls] == expected
+
+
+class FakeClock:
+    """Stands in for the time module of Fetch, so that waiting on the politeness policy or a retry takes no time."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSession:
+    """Stands in for a requests.Session, answering each url with the (status, headers) it was given, 200 otherwise."""
+
+    def __init__(self, answers=None, delay=0.0):
+        self.answers = answers or {}
+        self.delay = delay
+        self.urls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self._lock:
+            self.urls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            threading.Event().wait(self.delay)
+            answers = self.answers.get(url)
+            status, headers = answers.pop(0) if answers else (200, {})
+            return types.SimpleNamespace(status_code=status, headers=headers, content=b"page", text="page")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(Fetch, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_then_spaces_requests(clock):
+    bucket = Fetch.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.5] * 4
+
+    # Tokens build up while the bucket is idle, but never beyond burst
+    clock.now += 60
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.5] * 5
+
+
+def test_fetcher_waits_on_each_host_at_the_crawl_rate(clock):
+    with Fetcher(Politeness(), session=FakeSession()) as f:
+        for _ in range(3):
+            f.get("http://first.test/page")
+        f.get("http://second.test/page")
+
+    assert clock.sleeps == pytest.approx([1 / Fetch.CRAWL_RATE] * 2)
+    assert f.stats.wait_seconds == pytest.approx(2 / Fetch.CRAWL_RATE)
+
+
+def test_fetcher_keeps_at_most_max_in_flight_requests():
+    session = FakeSession(delay=0.02)
+    with Fetcher(Politeness(rate=None, max_in_flight=2), workers=6, session=session) as f:
+        futures = [f.submit("http://first.test/" + str(i)) for i in range(12)]
+        assert [future.result() for future in futures] == ["page"] * 12
+
+    assert session.max_in_flight == 2 and len(session.urls) == 12
+
+
+@pytest.mark.parametrize("value, seconds", [("5", 5.0), (" 12 ", 12.0), ("0", 0.0),
+                                            ("Thu, 01 Jan 1970 00:17:10 GMT", 30.0),
+                                            ("Thu, 01 Jan 1970 00:10:00 GMT", 0.0),
+                                            ("-3", None), ("soon", None), ("", None), (None, None)])
+def test_retry_after_reads_seconds_and_dates(clock, value, seconds):
+    assert Fetch.retry_after(value) == seconds
+
+
+def test_fetcher_honours_retry_after(clock):
+    url = "http://first.test/page"
+    answers = {url: [(503, {"Retry-After": "7"}), (429, {"Retry-After": "Thu, 01 Jan 1970 00:17:10 GMT"})]}
+    with Fetcher(Politeness(rate=None), session=FakeSession(answers)) as f:
+        assert f.get(url) == "page"
+    assert clock.sleeps == [7.0, 30.0 - 7.0] and f.stats.retries == 2
+
+    # Without a Retry-After, delays are drawn under the exponential backoff, until retries run out
+    retry = Fetch.RetryPolicy(retries=3, backoff=0.5)
+    with Fetcher(Politeness(rate=None), retry=retry, session=FakeSession({url: [(503, {})] * 5})) as f, \
+            pytest.raises(FetchError) as error:
+        f.get(url)
+    assert error.value.status == 503 and f.stats.requests == 4
+    assert len(clock.sleeps) == 5 and all(0 <= delay <= 0.5 * 2 ** attempt
+                                          for attempt, delay in enumerate(clock.sleeps[2:]))
+
+    # A site asking to wait longer than max_backoff is given up on at once
+    session = FakeSession({url: [(503, {"Retry-After": "120"})]})
+    with Fetcher(Politeness(rate=None), session=session) as f, pytest.raises(FetchError):
+        f.get(url)
+    assert len(session.urls) == 1 and len(clock.sleeps) == 5
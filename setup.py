@@ -27,6 +27,7 @@ setuptools.setup(
         "lxml",
         "sklearn",
         "scipy",
+        "numpy",
         "IPython"
     ],
     python_requires=">=3"